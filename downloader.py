@@ -2,11 +2,10 @@
 # -*- coding: utf-8 -*-
 """
 Scalable Capital PDF Downloader
-löscht Session Ordner bei Startproblemen
-optionaler INI Eintrag download_directory_mailbox hinzu für extra Download-Ordner für Mailbox-Dokumente
+Mitschnitt (--record) und Offline-Wiedergabe (--replay) eines Laufs als bereinigtes HAR mit Laufzeit-Vergleich je Version
 """
 
-__version__ = "2.13"
+__version__ = "2.38"
 
 import os
 import sys
@@ -18,10 +17,25 @@ import subprocess
 import tempfile
 import getpass
 import shutil
+import threading
+import json
+import base64
+import multiprocessing
+import argparse
+import atexit
+import csv
+import bisect
+import hashlib
+import sqlite3
+import importlib.util
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, TimeoutError as FutureTimeout
 
 from datetime import datetime
+from typing import NamedTuple
 from playwright.sync_api import sync_playwright
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse, unquote, quote, parse_qsl
 
 # Plattformspezifische imports
 if platform.system() == "Windows":
@@ -36,6 +50,8 @@ TARGET_URL2 = "https://de.scalable.capital/cockpit/mailbox"
 DOWNLOAD_DIR = None          # NEU V2.04b Global
 DOWNLOAD_DIR_MAILBOX = None  # NEU V2.13 separates Mailbox-Verzeichnis
 SERVICE_NAME = "scalable_login" # NEU V2.08
+NON_INTERACTIVE = False      # NEU V2.21 keine Eingabe-Abfragen (geplante Aufgaben)
+EVENT_LOG = None             # NEU V2.21 strukturiertes Event-Log
 
 DEFAULT_CONFIG = {
     'max_transactions': '20',
@@ -48,6 +64,45 @@ DEFAULT_CONFIG = {
     'get_documents': 'True',
     'only_new_docs': 'True',
     'only_executed': 'True',
+    'http_download': 'False',
+    'http_pool_size': '4',
+    'try_headless': 'False',
+    'parallel_mailbox': 'False',
+    'backfill_workers': '0',
+    'resume_interrupted_runs': 'True',
+    'retry_attempts': '2',
+    'retry_backoff': '5',
+    'retry_failed_only': 'False',
+    'diagnostics_directory': 'Scalable_Diagnostics',
+    'error_capture_mode': 'clip',
+    'error_capture_max': '20',
+    'console_mode': 'normal',
+    'non_interactive': 'False',
+    'event_log': 'True',
+    'wkn_mapping_file': '',
+    'wkn_learn': 'False',
+    'restore_filter_state': 'False',
+    'inventory_mode': 'False',
+    'inventory_file': 'Scalable_Inventory.csv',
+    'inventory_max': '10000',
+    'from_date': '',
+    'to_date': '',
+    'adaptive_rate': 'True',
+    'verify_remote': 'False',
+    'archive_layout': 'flat',
+    'dedup_mode': 'off',
+    'metadata_index': 'False',
+    'session_budget_mb': '300',
+    'run_deadline': '0',
+    'phase_budgets': '',
+    'circuit_breaker': '5',
+    's3_bucket': '',
+    's3_prefix': '',
+    's3_endpoint': '',
+    's3_region': '',
+    's3_workers': '4',
+    's3_keep_local': 'True',
+    'flight_recorder': '300',
     'slow_mo': '100',
     'transaction_types': 'Ausschüttung, Kauf, Verkauf, Sparplan, Steuern',
     'pdf_button_names': 'Wertpapierabrechnung, Wertpapierereignisse, Vorabpauschale',
@@ -70,6 +125,7 @@ else:
 #HIER INI Name anpassen
 CONFIG_PATH = os.path.join(BASE_DIR, "SC-Downloader.ini")
 SESSION_DIR = os.path.join(BASE_DIR, "scalable_session")
+STATE_DIR = os.path.join(BASE_DIR, "scalable_state")  # NEU V2.15 Laufzeit-Daten (Metriken)
 
 def ensure_browser():
     print(f"=== Scalable Capital PDF Downloader v{__version__} ===")
@@ -81,9 +137,207 @@ def ensure_browser():
         print("  ✓ Browser bereit.")
     except Exception as e:
         print(f"  ✗ FEHLER: Browser nicht gefunden: {e}")
-        input("\nDrücke Enter zum Beenden...")
+        wait_for_enter("\nDrücke Enter zum Beenden...")
         sys.exit(1)
 
+# ========== NEU V2.21: Konsole, Event-Log und Kommandozeile ==========
+def wait_for_enter(prompt):
+    """Wartet auf Enter, im nicht-interaktiven Modus wird nur die Meldung ausgegeben"""
+    if NON_INTERACTIVE:
+        print(prompt.strip())
+        return
+    input(prompt)
+
+class EventLog:
+    """
+    Strukturiertes Event-Log im JSON-Lines Format (ein JSON-Objekt je Zeile).
+    Die Events werden im Speicher gepuffert und blockweise angehängt; jeder
+    Schreibvorgang enthält nur vollständige Zeilen, damit sich parallele
+    Prozesse (Backfill) nicht gegenseitig Zeilen zerschneiden.
+    """
+
+    FLUSH_BYTES = 64 * 1024
+    ROTATE_BYTES = 20 * 1024 * 1024
+
+    def __init__(self, path, run_id=None):
+        self.path = path
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            if os.path.getsize(path) > self.ROTATE_BYTES:
+                os.replace(path, path + ".1")
+        except OSError:
+            pass
+
+    def emit(self, event, **fields):
+        record = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'run': self.run_id,
+                  'pid': os.getpid(), 'event': event}
+        record.update(fields)
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode('utf-8')
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered_bytes += len(line)
+            if self.buffered_bytes >= self.FLUSH_BYTES:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        data = b"".join(self.buffer)
+        self.buffer = []
+        self.buffered_bytes = 0
+        try:
+            with open(self.path, 'ab', buffering=0) as f:
+                f.write(data)
+        except Exception as e:
+            print(f"  ⚠ Event-Log konnte nicht geschrieben werden: {e}")
+
+    def close(self):
+        with self.lock:
+            self._flush()
+
+def log_event(event, **fields):
+    """Schreibt ein Event ins Event-Log (falls aktiv)"""
+    if EVENT_LOG is not None:
+        EVENT_LOG.emit(event, **fields)
+
+class QuietConsole:
+    """
+    Filter für sys.stdout bei console_mode = quiet: Es werden nur der
+    Fortschritt (als überschriebene Zeile), Fehler, Warnungen, Login-Hinweise
+    und das Ergebnis ausgegeben. Alle Details stehen im Event-Log.
+    """
+
+    PROGRESS = re.compile(r'^\s*\[(\d+/\d+|Dokument \d+/\d+)\]')
+    KEEP = ('✗', '⚠', 'FEHLER', 'ERROR', 'Login', '2FA', 'Enter', '===')
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.pending = ""
+        self.progress_shown = False
+        self.show_all = False
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            self.pending += text
+            while "\n" in self.pending:
+                line, self.pending = self.pending.split("\n", 1)
+                self._line(line)
+        return len(text)
+
+    def _line(self, line):
+        if "*** Ergebnis ***" in line:
+            self.show_all = True
+        match = self.PROGRESS.match(line)
+        if match and not self.show_all:
+            self.stream.write(f"\r  {match.group(0).strip()} ")
+            self.stream.flush()
+            self.progress_shown = True
+        elif self.show_all or any(marker in line for marker in self.KEEP):
+            if self.progress_shown:
+                self.stream.write("\n")
+                self.progress_shown = False
+            self.stream.write(line + "\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def _iso_date_arg(value):
+    """argparse-Typ für Datumsangaben JJJJ-MM-TT"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ungültiges Datum '{value}', erwartet JJJJ-MM-TT")
+
+def parse_args(argv=None):
+    """Kommandozeilen-Optionen; sie überschreiben die Werte aus der INI"""
+    parser = argparse.ArgumentParser(description=f"Scalable Capital PDF Downloader v{__version__}")
+    parser.add_argument('--quiet', action='store_true',
+                        help="nur Fortschritt und Fehler ausgeben (console_mode = quiet)")
+    parser.add_argument('--non-interactive', action='store_true',
+                        help="keine Eingabe-Abfragen, z.B. für die Aufgabenplanung")
+    parser.add_argument('--event-log', metavar='DATEI',
+                        help="Pfad für das Event-Log im JSON-Lines Format")
+    parser.add_argument('--inventory', action='store_true',
+                        help="nur die Transaktionsliste exportieren, keine Downloads (NEU V2.24)")
+    parser.add_argument('--from', dest='from_date', metavar='JJJJ-MM-TT', type=_iso_date_arg,
+                        help="nur Transaktionen und Dokumente ab diesem Datum (NEU V2.25)")
+    parser.add_argument('--to', dest='to_date', metavar='JJJJ-MM-TT', type=_iso_date_arg,
+                        help="nur Transaktionen und Dokumente bis zu diesem Datum (NEU V2.25)")
+    parser.add_argument('--verify-remote', action='store_true',
+                        help="vorhandene PDFs beim Server auf neue Fassungen prüfen (NEU V2.27)")
+    parser.add_argument('--migrate-layout', action='store_true',
+                        help="vorhandene PDFs in die Ablage nach archive_layout verschieben und beenden (NEU V2.29)")
+    parser.add_argument('--verify', action='store_true',
+                        help="PDF-Struktur der Ablage prüfen, beschädigte Dateien zum erneuten Laden vormerken (NEU V2.31)")
+    parser.add_argument('--index', action='store_true',
+                        help="Metadaten-Index der PDFs aktualisieren und beenden (NEU V2.32)")
+    parser.add_argument('--search', metavar='SUCHE',
+                        help="im Metadaten-Index suchen (Volltext, ISIN, Typ) und beenden (NEU V2.32)")
+    parser.add_argument('--compact-session', action='store_true',
+                        help="Cache-Daten der Browser-Session löschen (Anmeldung bleibt) und beenden (NEU V2.34)")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument('--record', metavar='DATEI.har',
+                     help="Netzwerkverkehr des Laufs bereinigt als HAR mitschneiden, in Sandbox (NEU V2.38)")
+    har.add_argument('--replay', metavar='DATEI.har',
+                     help="Lauf offline aus einem Mitschnitt wiedergeben und Laufzeit vergleichen (NEU V2.38)")
+    return parser.parse_args(argv)
+
+def apply_cli_overrides(settings, args):
+    """Übernimmt die Kommandozeilen-Optionen in die Einstellungen"""
+    if args is None:
+        return settings
+    if args.quiet:
+        settings['console_mode'] = 'quiet'
+    if args.non_interactive:
+        settings['non_interactive'] = True
+    if args.event_log:
+        settings['event_log'] = os.path.abspath(args.event_log)
+    if args.inventory:
+        settings['inventory_mode'] = True
+    if args.from_date:
+        settings['from_date'] = args.from_date
+    if args.to_date:
+        settings['to_date'] = args.to_date
+    if args.verify_remote:
+        settings['verify_remote'] = True
+    if args.migrate_layout:
+        settings['migrate_layout'] = True
+    if args.verify:
+        settings['verify_archive'] = True
+    if args.index:
+        settings['index_only'] = True
+    if args.search:
+        settings['search'] = args.search
+    if args.compact_session:
+        settings['compact_session'] = True
+    if args.record:
+        settings['har_record'] = args.record
+    if args.replay:
+        settings['har_replay'] = args.replay
+    return settings
+
+def setup_console_and_log(settings):
+    """Aktiviert ruhige Konsole und Event-Log gemäß den Einstellungen"""
+    global NON_INTERACTIVE, EVENT_LOG
+    NON_INTERACTIVE = NON_INTERACTIVE or settings['non_interactive']
+    if settings['console_mode'] == 'quiet' and not isinstance(sys.stdout, QuietConsole):
+        sys.stdout = QuietConsole(sys.stdout)
+    if settings['event_log'] and EVENT_LOG is None:
+        try:
+            EVENT_LOG = EventLog(settings['event_log'])
+            atexit.register(EVENT_LOG.close)  # auch bei sys.exit() nichts verlieren
+        except Exception as e:
+            print(f"  ⚠ Event-Log nicht verfügbar: {e}")
+# ========== ENDE NEU V2.21 ==========
+
 # ========== NEU V2.08: Zugangsdaten speichern ======
 def ensure_credentials(use_saved_credentials):
     """
@@ -120,6 +374,11 @@ def ensure_credentials(use_saved_credentials):
             print(f"  ✓ Zugangsdaten aus Windows Credential Manager geladen")
             return username, password
         
+        # NEU V2.21 ohne Konsole kann nicht abgefragt werden
+        if NON_INTERACTIVE:
+            print("  ⚠ Keine gespeicherten Zugangsdaten (nicht-interaktiver Modus, keine Abfrage)")
+            return None, None
+
         # Credentials nicht vorhanden - erstmalig abfragen
         print("\n" + "="*60)
         print("ERSTMALIGE EINRICHTUNG - Zugangsdaten speichern")
@@ -179,10 +438,1024 @@ def convert_isin_to_wkn(isin_str, wkn_mapping):
     Returns:
         WKN wenn gefunden, sonst die ursprüngliche ISIN
     """
-    isin_upper = isin_str.upper()
-    if isin_upper in wkn_mapping:
-        return wkn_mapping[isin_upper]
-    return isin_str
+    # NEU V2.22 wkn_mapping kann auch ein WknMapping sein
+    wkn = wkn_mapping.get(isin_str.upper())
+    return wkn if wkn else isin_str
+
+# ========== NEU V2.22: WKN-Zuordnung aus Datei mit Index ==========
+ISIN_PATTERN = re.compile(r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$')
+
+class _KeyView:
+    """Sortierte Index-Einträge als Sequenz der ISINs für bisect"""
+
+    def __init__(self, blob, width):
+        self.blob = blob
+        self.width = width
+
+    def __len__(self):
+        return len(self.blob) // self.width
+
+    def __getitem__(self, i):
+        start = i * self.width
+        return self.blob[start:start + 12]
+
+class WknMapping:
+    """
+    ISIN->WKN Zuordnung aus drei Quellen, in dieser Reihenfolge:
+    [WKN] Sektion der INI, externe Mapping-Datei (wkn_mapping_file) und
+    gelernte Zuordnungen (wkn_learn).
+
+    Die externe Datei (CSV: ISIN;WKN je Zeile) wird erst beim ersten
+    Nachschlagen geladen. Dazu wird sie einmalig in einen kompakten Index in
+    STATE_DIR übersetzt: sortierte Einträge fester Breite, die per binärer
+    Suche durchsucht werden. Der Index wird nur neu erstellt, wenn sich die
+    Datei ändert.
+    """
+
+    INDEX_MAGIC = b"SCWKN1"
+
+    def __init__(self, ini_mapping, mapping_file=None, learned_file=None):
+        self.ini_mapping = ini_mapping
+        self.mapping_file = mapping_file
+        self.learned_file = learned_file
+        self._index = None
+        self._learned = None
+
+    def __getstate__(self):
+        # Für Backfill-Prozesse: Index wird im Prozess bei Bedarf neu geladen
+        state = self.__dict__.copy()
+        state['_index'] = None
+        state['_learned'] = None
+        return state
+
+    def get(self, isin, default=None):
+        isin = isin.upper()
+        if isin in self.ini_mapping:
+            return self.ini_mapping[isin]
+        if self.mapping_file:
+            wkn = self._lookup_index(isin)
+            if wkn:
+                return wkn
+        if self.learned_file:
+            if self._learned is None:
+                self._learned = read_mapping_csv(self.learned_file)
+            if isin in self._learned:
+                return self._learned[isin]
+        return default
+
+    def __contains__(self, isin):
+        return self.get(isin) is not None
+
+    def add_learned(self, isin, wkn):
+        """Hängt eine gelernte Zuordnung an die Datei an"""
+        if self._learned is None:
+            self._learned = read_mapping_csv(self.learned_file)
+        self._learned[isin] = wkn
+        os.makedirs(os.path.dirname(self.learned_file), exist_ok=True)
+        with open(self.learned_file, 'a', encoding='utf-8', newline='') as f:
+            f.write(f"{isin};{wkn}\n")
+
+    def _lookup_index(self, isin):
+        if self._index is None:
+            self._index = self._load_index()
+        blob, width = self._index
+        if not blob:
+            return None
+        keys = _KeyView(blob, width)
+        key = isin.encode('ascii', 'ignore')
+        pos = bisect.bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            start = pos * width + 12
+            return blob[start:start + width - 12].rstrip(b" ").decode('utf-8')
+        return None
+
+    def _load_index(self):
+        """Lädt den Index oder erstellt ihn aus der Mapping-Datei. Returns: (blob, Eintragsbreite)"""
+        try:
+            stat = os.stat(self.mapping_file)
+        except OSError as e:
+            print(f"  ⚠ WKN-Datei nicht gefunden: {e}")
+            return b"", 1
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}".encode('ascii')
+        index_path = os.path.join(STATE_DIR, "wkn_" + os.path.basename(self.mapping_file) + ".idx")
+
+        try:
+            with open(index_path, 'rb') as f:
+                header = f.readline().split()
+                if len(header) == 3 and header[0] == self.INDEX_MAGIC and header[1] == stamp:
+                    return f.read(), int(header[2])
+        except (OSError, ValueError):
+            pass
+
+        # Index neu erstellen
+        mapping = read_mapping_csv(self.mapping_file)
+        width = 12 + max((len(w.encode('utf-8')) for w in mapping.values()), default=1)
+        blob = b"".join(isin.encode('ascii') + wkn.encode('utf-8').ljust(width - 12)
+                        for isin, wkn in sorted(mapping.items()))
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            with open(index_path + ".tmp", 'wb') as f:
+                f.write(self.INDEX_MAGIC + b" " + stamp + b" " + str(width).encode('ascii') + b"\n")
+                f.write(blob)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError as e:
+            print(f"  ⚠ WKN-Index konnte nicht gespeichert werden: {e}")
+        print(f"[v{__version__}] WKN-Index erstellt: {len(mapping)} Zuordnung(en) aus {self.mapping_file}")
+        return blob, width
+
+def read_mapping_csv(path):
+    """
+    Liest eine Zuordnungs-Datei ISIN;WKN (Trenner ; , oder Tab, Kommentare mit #).
+    Zeilen ohne gültige ISIN (z.B. Überschrift) werden übersprungen.
+    """
+    mapping = {}
+    try:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.reader(f, delimiter=';'):
+                if len(row) == 1:
+                    row = re.split(r'[,\t]', row[0])
+                if len(row) < 2 or row[0].lstrip().startswith('#'):
+                    continue
+                isin = row[0].strip().upper()
+                wkn = row[1].split('#')[0].strip()
+                if ISIN_PATTERN.match(isin) and wkn:
+                    mapping[isin] = wkn
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"  ⚠ Zuordnungs-Datei {path} nicht lesbar: {e}")
+    return mapping
+
+_PDF_TEXT_WARNED = False
+
+def extract_pdf_text(path, max_pages=None):
+    """
+    Extrahiert den Text eines PDFs (benötigt das optionale Modul pypdf).
+    Returns: Text oder None, wenn pypdf fehlt oder die Datei nicht lesbar ist
+    """
+    global _PDF_TEXT_WARNED
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        if not _PDF_TEXT_WARNED:
+            print("  ✗ FEHLER: 'pypdf' Modul nicht installiert!")
+            print("  → Bitte ausführen: pip install pypdf")
+            _PDF_TEXT_WARNED = True
+        return None
+    try:
+        reader = PdfReader(path)
+        pages = reader.pages if max_pages is None else reader.pages[:max_pages]
+        return "\n".join(page.extract_text() or "" for page in pages)
+    except Exception:
+        return None
+
+WKN_PAIR_PATTERNS = [
+    re.compile(r'\b([A-Z]{2}[A-Z0-9]{9}[0-9])\s*/\s*([A-Z0-9]{6})\b'),
+    re.compile(r'ISIN[\s:]*([A-Z]{2}[A-Z0-9]{9}[0-9]).{0,80}?WKN[\s:]*([A-Z0-9]{6})\b', re.S),
+    re.compile(r'WKN[\s:]*([A-Z0-9]{6})\b.{0,80}?ISIN[\s:]*([A-Z]{2}[A-Z0-9]{9}[0-9])', re.S),
+]
+
+def find_isin_wkn_pairs(text):
+    """Sucht eindeutige ISIN/WKN Paare im Text eines Dokuments"""
+    pairs = {}
+    for i, pattern in enumerate(WKN_PAIR_PATTERNS):
+        for match in pattern.finditer(text):
+            isin, wkn = match.groups() if i < 2 else reversed(match.groups())
+            pairs.setdefault(isin, set()).add(wkn)
+    # Nur eindeutige Zuordnungen übernehmen
+    return {isin: wkns.pop() for isin, wkns in pairs.items() if len(wkns) == 1}
+
+def learn_wkn_mappings(directories, wkn_mapping):
+    """
+    Lernt ISIN->WKN Zuordnungen aus den PDFs, die seit dem letzten Durchlauf
+    in den Download-Ordnern hinzugekommen sind.
+    """
+    state_path = os.path.join(STATE_DIR, "wkn_learn_state.json")
+    state = _read_json(state_path, {})
+    last_mtime = state.get('last_mtime', 0)
+    newest = last_mtime
+    learned = 0
+
+    for directory in dict.fromkeys(directories):
+        for entry in iter_archive_files(directory):  # NEU V2.29 inkl. Jahr/Typ-Ordner
+            if not entry.name.lower().endswith('.pdf'):
+                continue
+            mtime = entry.stat().st_mtime
+            if mtime <= last_mtime:
+                continue
+            newest = max(newest, mtime)
+            text = extract_pdf_text(entry.path, max_pages=2)
+            if text is None:
+                if _PDF_TEXT_WARNED:
+                    return
+                continue
+            for isin, wkn in find_isin_wkn_pairs(text).items():
+                if wkn_mapping.get(isin) is None:
+                    wkn_mapping.add_learned(isin, wkn)
+                    learned += 1
+
+    try:
+        _write_json_atomic(state_path, {'last_mtime': newest})
+    except OSError:
+        pass
+    if learned:
+        print(f"[v{__version__}] {learned} neue WKN-Zuordnung(en) aus Dokumenten gelernt")
+# ========== ENDE NEU V2.22 ==========
+
+# ========== NEU V2.29: Ablage nach Jahr/Typ und Verzeichnis-Index ==========
+def iter_archive_files(root):
+    """
+    Dateien der Ablage: direkt in root und in den Jahresordnern (JJJJ, darin
+    ggf. Typ-Ordner). Andere Unterordner, z.B. eigene Ordner des Users oder
+    eine darin liegende Mailbox-Ablage, gehören nicht dazu (os.scandir je Ordner,
+    versteckte Ordner wie .scalable_downloads ausgenommen).
+    """
+    excluded = {os.path.normcase(os.path.abspath(d)) for d in (DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX) if d}
+    excluded.discard(os.path.normcase(os.path.abspath(root)))
+    yield from _iter_archive_dir(root, excluded, top=True)
+
+def _iter_archive_dir(directory, excluded, top):
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            if top and not re.fullmatch(r'\d{4}', entry.name):
+                continue
+            if os.path.normcase(os.path.abspath(entry.path)) in excluded:
+                continue
+            yield from _iter_archive_dir(entry.path, excluded, top=False)
+        elif entry.is_file():
+            yield entry
+
+class ArchiveIndex:
+    """
+    Dateinamen eines Ablage-Ordners inkl. aller Unterordner, einmal beim Start
+    geladen. Existenz- und Kollisionsprüfungen sind danach Nachschlagen im
+    Speicher. Geprüft wird der Dateiname unabhängig vom Unterordner, damit
+    Dateien auch nach einem Wechsel von archive_layout erkannt werden.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.paths = {}
+        start = time.perf_counter()
+        for entry in iter_archive_files(root):
+            self.paths[os.path.normcase(entry.name)] = entry.path
+        self.load_seconds = time.perf_counter() - start
+
+    def find(self, file_name):
+        """Pfad einer vorhandenen Datei mit diesem Namen oder None"""
+        with self.lock:
+            return self.paths.get(os.path.normcase(os.path.basename(file_name)))
+
+    def contains(self, file_name):
+        """
+        True, wenn das Dokument vorliegt - als Datei oder (NEU V2.30) als
+        Duplikat übersprungen, weil eine andere Datei den gleichen Inhalt hat.
+        Nur zur Existenzprüfung, die andere Datei ist kein Zielpfad.
+        """
+        return self.find(file_name) is not None or (CONTENT_INDEX is not None and CONTENT_INDEX.has_alias(file_name))
+
+    def add(self, path):
+        with self.lock:
+            self.paths[os.path.normcase(os.path.basename(path))] = path
+
+    def discard(self, path):
+        with self.lock:
+            self.paths.pop(os.path.normcase(os.path.basename(path)), None)
+
+ARCHIVE_INDEXES = {}
+
+def archive_index(root):
+    """Index eines Ablage-Ordners, wird je Prozess beim ersten Zugriff geladen"""
+    key = os.path.normcase(os.path.abspath(root))
+    if key not in ARCHIVE_INDEXES:
+        ARCHIVE_INDEXES[key] = ArchiveIndex(root)
+    return ARCHIVE_INDEXES[key]
+
+def note_archived(path):
+    """Trägt eine neu gespeicherte Datei in den passenden Index ein"""
+    path_key = os.path.normcase(os.path.abspath(path))
+    for root_key, index in list(ARCHIVE_INDEXES.items()):
+        if path_key.startswith(root_key + os.sep):
+            index.add(path)
+    if REDOWNLOAD_QUEUE is not None:
+        REDOWNLOAD_QUEUE.resolve(path)  # NEU V2.31
+    if S3_SINK is not None:
+        S3_SINK.submit(path)  # NEU V2.36
+
+def archive_path(root, file_name, keyword, layout):
+    """
+    Zielpfad einer Datei gemäß archive_layout. Bei year_type kommt die Datei
+    nach Jahr (aus dem Datum am Anfang des Dateinamens) und Transaktionstyp
+    sortiert in Unterordner, z.B. 2025/Kauf/. Ohne Typ (Mailbox) nur nach Jahr.
+    """
+    if layout != 'year_type':
+        return os.path.join(root, file_name)
+    year_match = re.match(r'(\d{4})-?\d{2}', file_name)
+    parts = [root, year_match.group(1) if year_match else str(datetime.now().year)]
+    if keyword:
+        parts.append(sanitize_filename(keyword))
+    return os.path.join(*parts, file_name)
+
+def _keyword_from_file_name(file_name, keywords):
+    """Transaktionstyp aus einem Dateinamen JJJJ-MM-TT-Typ-... (Typ = erste 4 Buchstaben)"""
+    match = re.match(r'\d{4}-\d{2}-\d{2}-([^-]+)-', file_name)
+    if not match:
+        return None
+    return next((k for k in keywords if k[:4] == match.group(1)), None)
+
+def migrate_archive_layout(settings):
+    """
+    Verschiebt vorhandene PDFs in die Ordnerstruktur von archive_layout
+    (per Umbenennen, ohne Kopieren) und entfernt leer gewordene Jahresordner.
+    """
+    layout = settings['archive_layout']
+    print(f"[v{__version__}] Migriere Ablage nach '{layout}'...")
+    roots = [(DOWNLOAD_DIR, True)]
+    if os.path.normcase(DOWNLOAD_DIR_MAILBOX) != os.path.normcase(DOWNLOAD_DIR):
+        roots.append((DOWNLOAD_DIR_MAILBOX, False))
+
+    for root, with_type in roots:
+        moved = conflicts = failed = 0
+        for entry in list(iter_archive_files(root)):
+            # Dateien ohne Datum im Namen bleiben, wo sie sind
+            if not entry.name.lower().endswith('.pdf') or not re.match(r'\d{4}-?\d{2}', entry.name):
+                continue
+            keyword = _keyword_from_file_name(entry.name, settings['keywords']) if with_type else None
+            target = archive_path(root, entry.name, keyword, layout)
+            if os.path.normcase(target) == os.path.normcase(entry.path):
+                continue
+            if os.path.exists(target):
+                print(f"  ⚠ Ziel existiert bereits, übersprungen: {target}")
+                conflicts += 1
+                continue
+            # gesperrte Datei (z.B. im PDF-Viewer geöffnet) -> melden und mit der nächsten weitermachen
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.rename(entry.path, target)
+            except OSError as e:
+                print(f"  ⚠ Nicht verschoben: {entry.name} ({e})")
+                failed += 1
+                continue
+            moved += 1
+
+        # leere Jahres-/Typ-Ordner entfernen
+        for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+            rel = os.path.relpath(dirpath, root)
+            if rel != '.' and re.match(r'\d{4}$', rel.split(os.sep)[0]) and not os.listdir(dirpath):
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+        print(f"  ✓ {root}: {moved} Datei(en) verschoben" + (f", {conflicts} Konflikt(e)" if conflicts else "")
+              + (f", {failed} fehlgeschlagen" if failed else ""))
+# ========== ENDE NEU V2.29 ==========
+
+# ========== NEU V2.30: Duplikate über Inhalts-Hash erkennen ==========
+class ContentIndex:
+    """
+    SHA-256 aller PDFs in Transaktions- und Mailbox-Ablage. Der Hash wird
+    je Datei nur neu berechnet, wenn sich Größe oder Änderungszeit geändert
+    haben (Cache in STATE_DIR). Kommt ein Dokument mit bereits vorhandenem
+    Inhalt unter anderem Namen noch einmal, wird es je nach dedup_mode als
+    Hardlink angelegt oder übersprungen (nur der Name wird gemerkt).
+    """
+
+    def __init__(self, mode, roots=(), scan=True):
+        self.mode = mode
+        self.path = os.path.join(STATE_DIR, "content_index.json")
+        self.lock = threading.Lock()
+        cached = _read_json(self.path, {})
+        self.files = cached.get('files', {})      # Pfad -> [Größe, mtime_ns, Hash]
+        self.aliases = cached.get('aliases', {})  # übersprungener Dateiname -> Pfad
+        self.by_hash = {}
+        self.bytes_saved = 0
+        self.duplicates = 0
+        if scan:
+            self._scan(roots)
+        for path, (size, mtime_ns, digest) in self.files.items():
+            self.by_hash.setdefault(digest, path)
+
+    @staticmethod
+    def _hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _scan(self, roots):
+        """Gleicht den Cache mit den Ordnern ab, neue/geänderte Dateien werden parallel gehasht"""
+        start = time.perf_counter()
+        current = {}
+        todo = []
+        for root in dict.fromkeys(roots):
+            for entry in iter_archive_files(root):
+                if not entry.name.lower().endswith('.pdf'):
+                    continue
+                stat = entry.stat()
+                cached = self.files.get(entry.path)
+                if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                    current[entry.path] = cached
+                else:
+                    todo.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for (path, size, mtime_ns), digest in zip(todo, pool.map(lambda t: self._hash_file(t[0]), todo)):
+                current[path] = [size, mtime_ns, digest]
+        self.files = current
+        self.aliases = {name: path for name, path in self.aliases.items() if path in current}
+
+        # bereits doppelt vorhandene Inhalte (getrennte Dateien, keine Hardlinks) melden
+        groups = {}
+        for path, (size, mtime_ns, digest) in current.items():
+            groups.setdefault(digest, []).append((path, size))
+        wasted = 0
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            inodes = {}
+            for path, size in members:
+                try:
+                    stat = os.stat(path)
+                    inodes.setdefault((stat.st_dev, stat.st_ino), size)
+                except OSError:
+                    pass
+            wasted += sum(list(inodes.values())[1:])
+        print(f"[v{__version__}] Inhalts-Index: {len(current)} PDF(s), {len(todo)} neu berechnet "
+              f"({time.perf_counter() - start:.1f}s)")
+        if wasted:
+            print(f"  ℹ Bereits doppelt gespeicherte Inhalte: {wasted / 1024 / 1024:.1f} MB")
+
+    def has_alias(self, file_name):
+        """True, wenn file_name als Duplikat einer noch vorhandenen Datei übersprungen wurde"""
+        with self.lock:
+            path = self.aliases.get(os.path.basename(file_name))
+        return bool(path) and os.path.exists(path)
+
+    def store_duplicate(self, target_path, digest, size):
+        """
+        Legt target_path als Hardlink auf eine vorhandene Datei gleichen Inhalts an
+        oder merkt sich im Modus skip nur den Namen.
+        Returns: True wenn erledigt, False wenn normal gespeichert werden muss
+        """
+        with self.lock:
+            existing = self.by_hash.get(digest)
+        if not existing or not os.path.exists(existing) or os.path.normcase(existing) == os.path.normcase(target_path):
+            return False
+        if self.mode == 'hardlink':
+            try:
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                os.link(existing, target_path)
+            except OSError:
+                return False  # z.B. anderes Laufwerk oder Datei existiert -> normaler Weg
+            action = "als Hardlink angelegt"
+            note_archived(target_path)
+        else:
+            with self.lock:
+                self.aliases[os.path.basename(target_path)] = existing
+            action = "übersprungen"
+        with self.lock:
+            self.duplicates += 1
+            self.bytes_saved += size
+        print(f"  -> Gleicher Inhalt wie {os.path.basename(existing)}, {action}")
+        log_event('duplicate', file_name=os.path.basename(target_path), same_as=existing, mode=self.mode, bytes=size)
+        return True
+
+    def add(self, path, digest, size):
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        with self.lock:
+            self.files[path] = [size, mtime_ns, digest]
+            self.by_hash.setdefault(digest, path)
+
+    def save(self):
+        """Speichert den Cache; Einträge anderer Prozesse (Backfill) werden übernommen"""
+        with self.lock:
+            merged = _read_json(self.path, {})
+            files = merged.get('files', {})
+            files.update(self.files)
+            aliases = merged.get('aliases', {})
+            aliases.update(self.aliases)
+        try:
+            _write_json_atomic(self.path, {'files': files, 'aliases': aliases})
+        except OSError as e:
+            print(f"  ⚠ Inhalts-Index konnte nicht gespeichert werden: {e}")
+
+CONTENT_INDEX = None  # wird in run_downloader bzw. je Backfill-Prozess gesetzt
+
+def store_pdf_deduplicated(target_path, data):
+    """
+    Prüft vor dem Speichern, ob der Inhalt schon in der Ablage liegt.
+    Returns: (erledigt, Hash) - erledigt=True wenn verlinkt oder übersprungen
+    """
+    if CONTENT_INDEX is None:
+        return False, None
+    digest = hashlib.sha256(data).hexdigest()
+    return CONTENT_INDEX.store_duplicate(target_path, digest, len(data)), digest
+# ========== ENDE NEU V2.30 ==========
+
+# ========== NEU V2.31: PDF-Struktur der Ablage prüfen ==========
+def check_pdf_structure(path):
+    """
+    Prüft die Grundstruktur eines PDFs: Header, %%EOF am Ende, startxref und
+    eine Cross-Reference-Tabelle (oder ein xref-Stream) an dieser Position.
+    Liest nur Anfang, Ende und die xref-Position der Datei.
+
+    Returns:
+        tuple: (True, None) oder (False, Grund)
+    """
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            head = f.read(1024)
+            header_pos = head.find(b'%PDF-')
+            if header_pos < 0:
+                return False, "header"
+            f.seek(max(0, size - 4096))
+            tail = f.read()
+            if b'%%EOF' not in tail:
+                return False, "eof"
+            offsets = re.findall(rb'startxref\s+(\d+)', tail)
+            if not offsets:
+                return False, "startxref"
+            offset = int(offsets[-1]) + header_pos
+            if offset >= size:
+                return False, "xref_offset"
+            f.seek(offset)
+            chunk = f.read(64).lstrip()
+            if not (chunk.startswith(b'xref') or re.match(rb'\d+\s+\d+\s+obj', chunk)):
+                return False, "xref"
+        return True, None
+    except OSError:
+        return False, "unreadable"
+
+def _verify_worker(paths):
+    """Prozess-Funktion: prüft einen Block von Dateien"""
+    return [(path,) + check_pdf_structure(path) for path in paths]
+
+class RedownloadQueue:
+    """
+    Dateinamen beschädigter PDFs, die erneut geladen werden sollen
+    (STATE_DIR/redownload.json). Ein Eintrag verschwindet, sobald eine Datei
+    mit diesem Namen wieder gespeichert wurde.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(STATE_DIR, "redownload.json")
+        self.lock = threading.Lock()
+        self.entries = _read_json(self.path, {})
+
+    def add(self, file_name, reason):
+        with self.lock:
+            self.entries[file_name] = {'reason': reason, 'since': datetime.now().isoformat(timespec='seconds')}
+
+    def resolve(self, path):
+        with self.lock:
+            self.entries.pop(os.path.basename(path), None)
+
+    def oldest_date(self):
+        """Frühestes Datum (JJJJ-MM-TT) im Namen der vorgemerkten Dateien oder None"""
+        dates = []
+        for name in self.entries:
+            match = re.match(r'(\d{4})-?(\d{2})-?(\d{2})', name)
+            if match:
+                dates.append("-".join(match.groups()))
+        return min(dates) if dates else None
+
+    def save(self):
+        with self.lock:
+            data = dict(self.entries)
+        try:
+            _write_json_atomic(self.path, data)
+        except OSError as e:
+            print(f"  ⚠ Liste zum erneuten Laden nicht speicherbar: {e}")
+
+REDOWNLOAD_QUEUE = None  # wird in run_downloader gesetzt
+
+def quarantine_file(path, reason, queue):
+    """
+    Verschiebt eine beschädigte Datei nach STATE_DIR/quarantine, ohne eine
+    früher dorthin verschobene gleichnamige Datei zu überschreiben, und merkt
+    sie in queue zum erneuten Laden vor.
+    Returns: True wenn verschoben
+    """
+    quarantine_dir = os.path.join(STATE_DIR, "quarantine")
+    os.makedirs(quarantine_dir, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    base = f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    target = os.path.join(quarantine_dir, base + ext)
+    counter = 1
+    while os.path.exists(target):
+        target = os.path.join(quarantine_dir, f"{base}_{counter}{ext}")
+        counter += 1
+    try:
+        shutil.move(path, target)
+    except OSError as e:
+        print(f"    ⚠ Verschieben fehlgeschlagen: {e}")
+        return False
+    for index in list(ARCHIVE_INDEXES.values()):
+        index.discard(path)
+    queue.add(os.path.basename(path), reason)
+    return True
+
+def verify_archive(settings):
+    """
+    Prüft alle PDFs der Ablage in einem Prozess-Pool. Ergebnisse werden je
+    Datei mit Größe und Änderungszeit gecacht, wiederholte Läufe prüfen nur
+    neue oder geänderte Dateien. Beschädigte Dateien werden nach
+    STATE_DIR/quarantine verschoben und zum erneuten Laden vorgemerkt.
+
+    Returns: Anzahl beschädigter Dateien
+    """
+    start = time.perf_counter()
+    cache_path = os.path.join(STATE_DIR, "verify_cache.json")
+    cache = _read_json(cache_path, {})
+    current = {}
+    todo = []
+    for root in dict.fromkeys([DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX]):
+        for entry in iter_archive_files(root):
+            if not entry.name.lower().endswith('.pdf'):
+                continue
+            stat = entry.stat()
+            cached = cache.get(entry.path)
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                current[entry.path] = cached
+            else:
+                todo.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    print(f"[v{__version__}] Prüfe Ablage: {len(current) + len(todo)} PDF(s), davon {len(todo)} neu oder geändert")
+
+    stats = {path: (size, mtime_ns) for path, size, mtime_ns in todo}
+    paths = [t[0] for t in todo]
+    chunks = [paths[i:i + 50] for i in range(0, len(paths), 50)]
+    if len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 2)) as pool:
+            results = [r for chunk_result in pool.map(_verify_worker, chunks) for r in chunk_result]
+    else:
+        results = _verify_worker(paths)
+    for path, valid, reason in results:
+        current[path] = [stats[path][0], stats[path][1], valid, reason]
+
+    corrupt = [(path, entry[3]) for path, entry in current.items() if not entry[2]]
+    if corrupt:
+        queue = RedownloadQueue()
+        for path, reason in corrupt:
+            print(f"  ✗ Beschädigt ({reason}): {path}")
+            if quarantine_file(path, reason, queue):
+                current.pop(path)
+        queue.save()
+        print(f"  → {len(corrupt)} Datei(en) nach {os.path.join(STATE_DIR, 'quarantine')} verschoben "
+              f"und zum erneuten Laden vorgemerkt")
+
+    try:
+        _write_json_atomic(cache_path, current)
+    except OSError as e:
+        print(f"  ⚠ Prüf-Cache konnte nicht gespeichert werden: {e}")
+    print(f"[v{__version__}] Prüfung beendet: {len(current)} in Ordnung, {len(corrupt)} beschädigt "
+          f"({time.perf_counter() - start:.1f}s)")
+    return len(corrupt)
+# ========== ENDE NEU V2.31 ==========
+
+# ========== NEU V2.32: Metadaten-Index der PDFs ==========
+DOC_TYPE_PATTERNS = [
+    ('Vorabpauschale', re.compile(r'Vorabpauschale', re.I)),
+    ('Ausschüttung', re.compile(r'Aussch[üu]ttung|Dividende|Ertragsgutschrift', re.I)),
+    ('Sparplan', re.compile(r'Sparplan', re.I)),
+    ('Verkauf', re.compile(r'\bVerkauf', re.I)),
+    ('Kauf', re.compile(r'\bKauf', re.I)),
+    ('Depotauszug', re.compile(r'Depotauszug|Depot[üu]bersicht', re.I)),
+    ('Kontoauszug', re.compile(r'Kontoauszug|Rechnungsabschluss', re.I)),
+    ('Steuer', re.compile(r'Steuerbescheinigung|Jahressteuer', re.I)),
+]
+AMOUNT_PATTERN = re.compile(
+    r'(?:Ausmachender Betrag|Endbetrag|Gesamtbetrag|Betrag|Summe)[^\d\n-]{0,40}(-?\d{1,3}(?:\.\d{3})*,\d{2})')
+DATE_PATTERN = re.compile(r'\b(\d{2})\.(\d{2})\.(\d{4})\b')
+ISIN_TEXT_PATTERN = re.compile(r'\b([A-Z]{2}[A-Z0-9]{9}[0-9])\b')
+
+def _extract_pdf_metadata(path):
+    """
+    Prozess-Funktion: Text und Kernfelder eines PDFs (Datum, ISIN, WKN,
+    Betrag, Dokumenttyp). Felder, die im Text fehlen, werden aus dem
+    Dateinamen ergänzt.
+    """
+    text = extract_pdf_text(path, max_pages=3) or ""
+    name = os.path.basename(path)
+
+    date_match = DATE_PATTERN.search(text)
+    name_date = re.match(r'(\d{4})-?(\d{2})-?(\d{2})', name)
+    if date_match:
+        doc_date = f"{date_match.group(3)}-{date_match.group(2)}-{date_match.group(1)}"
+    else:
+        doc_date = "-".join(name_date.groups()) if name_date else None
+
+    isin_match = ISIN_TEXT_PATTERN.search(text) or ISIN_TEXT_PATTERN.search(name)
+    isin = isin_match.group(1) if isin_match else None
+    wkn = find_isin_wkn_pairs(text).get(isin) if isin else None
+
+    amount_match = AMOUNT_PATTERN.search(text)
+    if amount_match:
+        amount = float(amount_match.group(1).replace('.', '').replace(',', '.'))
+    else:
+        name_amount = re.search(r'-(-?\d+)_(\d{2})\.pdf$', name)
+        amount = float(f"{name_amount.group(1)}.{name_amount.group(2)}") if name_amount else None
+
+    doc_type = next((label for label, pattern in DOC_TYPE_PATTERNS if pattern.search(text) or pattern.search(name)), None)
+    return {'path': path, 'file_name': name, 'doc_date': doc_date, 'isin': isin, 'wkn': wkn,
+            'amount': amount, 'doc_type': doc_type, 'text': text}
+
+def _metadata_worker(paths):
+    """Prozess-Funktion: wertet einen Block von PDFs aus"""
+    return [_extract_pdf_metadata(path) for path in paths]
+
+class MetadataIndex:
+    """
+    Lokaler Such-Index (SQLite mit FTS5-Volltextsuche) über Text und
+    Kernfelder aller PDFs. Aktualisiert wird inkrementell anhand von Größe
+    und Änderungszeit, die Auswertung neuer PDFs läuft im Prozess-Pool.
+    """
+
+    def __init__(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(STATE_DIR, "metadata.sqlite"))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY, file_name TEXT, size INTEGER, mtime_ns INTEGER,
+                doc_date TEXT, isin TEXT, wkn TEXT, amount REAL, doc_type TEXT);
+            CREATE INDEX IF NOT EXISTS documents_date ON documents(doc_date);
+            CREATE INDEX IF NOT EXISTS documents_isin ON documents(isin);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                path UNINDEXED, file_name, doc_type, isin, wkn, text);
+        """)
+
+    def update(self, roots):
+        """Wertet neue/geänderte PDFs aus und entfernt gelöschte. Returns: Anzahl neu ausgewerteter PDFs"""
+        start = time.perf_counter()
+        known = {row[0]: (row[1], row[2]) for row in self.db.execute("SELECT path, size, mtime_ns FROM documents")}
+        current = {}
+        for root in dict.fromkeys(roots):
+            for entry in iter_archive_files(root):
+                if entry.name.lower().endswith('.pdf'):
+                    stat = entry.stat()
+                    current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        todo = [path for path, stamp in current.items() if known.get(path) != stamp]
+        removed = [path for path in known if path not in current]
+
+        if todo:
+            chunks = [todo[i:i + 20] for i in range(0, len(todo), 20)]
+            if len(chunks) > 1:
+                with ProcessPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 2)) as pool:
+                    results = [r for chunk_result in pool.map(_metadata_worker, chunks) for r in chunk_result]
+            else:
+                results = _metadata_worker(todo)
+        else:
+            results = []
+
+        with self.db:
+            for path in removed + [r['path'] for r in results]:
+                self.db.execute("DELETE FROM documents WHERE path = ?", (path,))
+                self.db.execute("DELETE FROM documents_fts WHERE path = ?", (path,))
+            for r in results:
+                size, mtime_ns = current[r['path']]
+                self.db.execute(
+                    "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (r['path'], r['file_name'], size, mtime_ns, r['doc_date'], r['isin'], r['wkn'],
+                     r['amount'], r['doc_type']))
+                self.db.execute(
+                    "INSERT INTO documents_fts VALUES (?, ?, ?, ?, ?, ?)",
+                    (r['path'], r['file_name'], r['doc_type'] or "", r['isin'] or "", r['wkn'] or "", r['text']))
+        print(f"[v{__version__}] Metadaten-Index: {len(current)} PDF(s), {len(results)} neu ausgewertet, "
+              f"{len(removed)} entfernt ({time.perf_counter() - start:.1f}s)")
+        return len(results)
+
+    def search(self, query, limit=50):
+        """Volltextsuche (FTS5-Syntax), neueste Dokumente zuerst"""
+        return self.db.execute("""
+            SELECT d.doc_date, d.doc_type, d.isin, d.wkn, d.amount, d.path
+            FROM documents_fts f JOIN documents d ON d.path = f.path
+            WHERE documents_fts MATCH ? ORDER BY d.doc_date DESC LIMIT ?""", (query, limit)).fetchall()
+
+    def close(self):
+        self.db.close()
+
+def update_metadata_index(roots):
+    """Aktualisiert den Metadaten-Index, sofern pypdf installiert ist"""
+    if importlib.util.find_spec("pypdf") is None:  # ausgewertet wird in den Worker-Prozessen
+        print("  ✗ FEHLER: 'pypdf' Modul nicht installiert!")
+        print("  → Bitte ausführen: pip install pypdf")
+        return
+    index = MetadataIndex()
+    try:
+        index.update(roots)
+    finally:
+        index.close()
+
+def search_metadata_index(query):
+    """Gibt die Treffer einer Suche im Metadaten-Index aus"""
+    index = MetadataIndex()
+    try:
+        rows = index.search(query)
+    except sqlite3.OperationalError as e:
+        print(f"  ✗ Ungültige Suche: {e}")
+        return
+    finally:
+        index.close()
+    print(f"[v{__version__}] {len(rows)} Treffer für '{query}':")
+    for doc_date, doc_type, isin, wkn, amount, path in rows:
+        amount_str = f"{amount:>12.2f}" if amount is not None else " " * 12
+        print(f"  {doc_date or '----------'}  {(doc_type or ''):<14} {(wkn or isin or ''):<12} {amount_str}  {path}")
+# ========== ENDE NEU V2.32 ==========
+
+# ========== NEU V2.36: PDFs in einen S3-kompatiblen Bucket hochladen ==========
+class S3Sink:
+    """
+    Lädt jede neu gespeicherte PDF im Hintergrund in einen S3-kompatiblen Bucket
+    (AWS, MinIO, ...). Große Dateien gehen per Multipart-Upload in Teilen hoch.
+    Ob ein Objekt schon existiert, entscheidet die beim Start einmal geladene
+    Bucket-Liste, nicht ein HEAD-Request je Datei. Ohne keep_local werden die
+    lokalen Kopien nach erfolgreichem Upload am Ende des Laufs gelöscht.
+
+    client: boto3-S3-Client oder ein Objekt mit denselben Methoden
+    (list_objects_v2, put_object, create/complete/abort_multipart_upload,
+    upload_part), z.B. für Tests gegen eine Attrappe.
+    """
+
+    PART_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, client, bucket, prefix="", roots=None, workers=4, keep_local=True):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ""
+        # Ablage-Ordner -> Unterordner im Bucket (Mailbox getrennt, wenn eigener Ordner)
+        self.roots = {os.path.normcase(os.path.abspath(root)): sub for root, sub in (roots or {}).items()}
+        self.keep_local = keep_local
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="s3")
+        self.futures = []
+        self.pending = set()
+        self.uploaded = []
+        self.failed = 0
+        self.present = 0
+        self.bytes = 0
+        self.objects = {}  # Key -> Größe
+        start = time.perf_counter()
+        self._load_listing()
+        self.listing_seconds = time.perf_counter() - start
+
+    def _load_listing(self):
+        """Alle Objekte unter dem Präfix einmal auflisten (1000 je Anfrage)"""
+        kwargs = {'Bucket': self.bucket, 'Prefix': self.prefix}
+        while True:
+            response = self.client.list_objects_v2(**kwargs)
+            for obj in response.get('Contents', []):
+                self.objects[obj['Key']] = obj['Size']
+            if not response.get('IsTruncated'):
+                break
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+    def key_for(self, path):
+        """Objekt-Key einer Datei: Präfix + Unterordner + Pfad relativ zum Ablage-Ordner"""
+        path_key = os.path.normcase(os.path.abspath(path))
+        for root_key, sub in self.roots.items():
+            if path_key.startswith(root_key + os.sep):
+                relative = os.path.relpath(os.path.abspath(path), root_key).replace(os.sep, '/')
+                return self.prefix + sub + relative
+        return None
+
+    def exists(self, path):
+        """Liegt das Objekt zu diesem Zielpfad (key_for) im Bucket (laut Liste vom Start)?"""
+        key = self.key_for(path)
+        if key is None:
+            return False
+        with self.lock:
+            return key in self.objects
+
+    def submit(self, path):
+        """Datei zum Hochladen einreihen; schon vorhandene Objekte gleicher Größe werden übersprungen"""
+        key = self.key_for(path)
+        if key is None:
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self.lock:
+            if self.objects.get(key) == size:
+                self.present += 1
+                return
+            if key in self.pending:
+                return
+            self.pending.add(key)
+        self.futures.append(self.executor.submit(self._upload, path, key, size))
+
+    def _upload(self, path, key, size):
+        try:
+            with open(path, 'rb') as f:
+                if size <= self.PART_SIZE:
+                    self.client.put_object(Bucket=self.bucket, Key=key, Body=f.read(),
+                                           ContentType='application/pdf')
+                else:
+                    self._upload_multipart(f, key)
+        except Exception as e:
+            print(f"  ⚠ S3-Upload fehlgeschlagen ({key}): {e}")
+            log_event('s3_upload', status='failed', key=key, error=str(e)[:200])
+            with self.lock:
+                self.failed += 1
+                self.pending.discard(key)
+            return False
+        with self.lock:
+            self.objects[key] = size
+            self.uploaded.append(path)
+            self.bytes += size
+            self.pending.discard(key)
+        log_event('s3_upload', status='done', key=key, bytes=size)
+        return True
+
+    def _upload_multipart(self, f, key):
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key,
+                                                        ContentType='application/pdf')['UploadId']
+        try:
+            parts = []
+            while True:
+                chunk = f.read(self.PART_SIZE)
+                if not chunk:
+                    break
+                part_number = len(parts) + 1
+                response = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                   PartNumber=part_number, Body=chunk)
+                parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except Exception:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            except Exception:
+                pass
+            raise
+
+    def finish(self):
+        """
+        Wartet auf alle Uploads und löscht ohne keep_local die hochgeladenen lokalen Kopien.
+
+        Returns:
+            tuple: (hochgeladen, fehlgeschlagen)
+        """
+        for future in self.futures:
+            future.result()
+        self.executor.shutdown(wait=True)
+        if not self.keep_local:
+            for path in self.uploaded:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(self.uploaded), self.failed
+
+
+S3_SINK = None  # wird in run_downloader gesetzt
+
+def create_s3_sink(settings, client=None):
+    """
+    S3-Ziel aus den Einstellungen (s3_bucket leer = aus). Zugangsdaten kommen
+    wie bei allen AWS-Werkzeugen aus Umgebungsvariablen oder ~/.aws/credentials.
+    client ersetzt den boto3-Client, z.B. durch eine Attrappe.
+    """
+    if not settings['s3_bucket']:
+        return None
+    if client is None:
+        try:
+            import boto3
+        except ImportError:
+            print("  ✗ FEHLER: 'boto3' Modul nicht installiert!")
+            print("  → Bitte ausführen: pip install boto3")
+            print("  → PDFs werden nur lokal gespeichert")
+            return None
+        client = boto3.client('s3', endpoint_url=settings['s3_endpoint'] or None,
+                              region_name=settings['s3_region'] or None)
+    roots = {DOWNLOAD_DIR: ""}
+    if os.path.normcase(DOWNLOAD_DIR_MAILBOX) != os.path.normcase(DOWNLOAD_DIR):
+        roots[DOWNLOAD_DIR_MAILBOX] = "mailbox/"
+    try:
+        sink = S3Sink(client, settings['s3_bucket'], settings['s3_prefix'], roots,
+                      settings['s3_workers'], settings['s3_keep_local'])
+    except Exception as e:
+        print(f"  ✗ S3-Bucket '{settings['s3_bucket']}' nicht erreichbar: {e}")
+        print("  → PDFs werden nur lokal gespeichert")
+        return None
+    print(f"[v{__version__}] S3-Bucket {settings['s3_bucket']}: {len(sink.objects)} Objekt(e) "
+          f"in {sink.listing_seconds:.2f}s gelistet ({settings['s3_workers']} Upload-Threads)")
+    return sink
+# ========== ENDE NEU V2.36 ==========
+
+# NEU V2.33 vorkompilierte Muster für sanitize_filename
+_DECIMAL_POINT = re.compile(r'(\d)\.(\d)')
+_SEPARATOR_RUN = re.compile(r'[-_]+')
 
 # NEU V2.07
 def sanitize_filename(filename):
@@ -201,14 +1474,14 @@ def sanitize_filename(filename):
         filename = filename[:-4]
     
     # Ersetze Dezimalpunkt durch "_" (nur wenn von Zahlen umgeben)
-    filename = re.sub(r'(\d)\.(\d)', r'\1_\2', filename)
+    filename = _DECIMAL_POINT.sub(r'\1_\2', filename)
     
     # Entferne alle anderen Punkte (z.B. von Abkürzungen wie "Pkt.")
     filename = filename.replace('.', '')
     
     # Normalisiere alle Trennzeichen: aufeinanderfolgende _ und/oder - zu einem Zeichen
     # Dabei hat "_" Vorrang vor "-"
-    filename = re.sub(r'[-_]+', lambda m: '_' if '_' in m.group() else '-', filename)
+    filename = _SEPARATOR_RUN.sub(lambda m: '_' if '_' in m.group() else '-', filename)
     
     # Entferne Trennzeichen am Ende
     filename = filename.rstrip('_-')
@@ -238,7 +1511,7 @@ def load_config():
             print(f"\n→ Bitte überprüfe die Datei:")
             print(f"   {CONFIG_PATH}")
             print(f"{'='*60}\n")
-            input(" ⚠  Drücke Enter zum Beenden...")
+            wait_for_enter(" ⚠  Drücke Enter zum Beenden...")
             sys.exit(1)
     else:
         config['General'] = {
@@ -251,7 +1524,46 @@ def load_config():
             'use_saved_credentials': DEFAULT_CONFIG['use_saved_credentials'],
             'get_documents': DEFAULT_CONFIG['get_documents'],
             'only_new_docs': DEFAULT_CONFIG['only_new_docs'],
-            'only_executed': DEFAULT_CONFIG['only_executed']
+            'only_executed': DEFAULT_CONFIG['only_executed'],
+            'http_download': DEFAULT_CONFIG['http_download'],
+            'http_pool_size': DEFAULT_CONFIG['http_pool_size'],
+            'try_headless': DEFAULT_CONFIG['try_headless'],
+            'parallel_mailbox': DEFAULT_CONFIG['parallel_mailbox'],
+            'backfill_workers': DEFAULT_CONFIG['backfill_workers'],
+            'resume_interrupted_runs': DEFAULT_CONFIG['resume_interrupted_runs'],
+            'retry_attempts': DEFAULT_CONFIG['retry_attempts'],
+            'retry_backoff': DEFAULT_CONFIG['retry_backoff'],
+            'retry_failed_only': DEFAULT_CONFIG['retry_failed_only'],
+            'diagnostics_directory': DEFAULT_CONFIG['diagnostics_directory'],
+            'error_capture_mode': DEFAULT_CONFIG['error_capture_mode'],
+            'error_capture_max': DEFAULT_CONFIG['error_capture_max'],
+            'console_mode': DEFAULT_CONFIG['console_mode'],
+            'non_interactive': DEFAULT_CONFIG['non_interactive'],
+            'event_log': DEFAULT_CONFIG['event_log'],
+            'wkn_mapping_file': DEFAULT_CONFIG['wkn_mapping_file'],
+            'wkn_learn': DEFAULT_CONFIG['wkn_learn'],
+            'restore_filter_state': DEFAULT_CONFIG['restore_filter_state'],
+            'inventory_mode': DEFAULT_CONFIG['inventory_mode'],
+            'inventory_file': DEFAULT_CONFIG['inventory_file'],
+            'inventory_max': DEFAULT_CONFIG['inventory_max'],
+            'from_date': DEFAULT_CONFIG['from_date'],
+            'to_date': DEFAULT_CONFIG['to_date'],
+            'adaptive_rate': DEFAULT_CONFIG['adaptive_rate'],
+            'verify_remote': DEFAULT_CONFIG['verify_remote'],
+            'archive_layout': DEFAULT_CONFIG['archive_layout'],
+            'dedup_mode': DEFAULT_CONFIG['dedup_mode'],
+            'metadata_index': DEFAULT_CONFIG['metadata_index'],
+            'session_budget_mb': DEFAULT_CONFIG['session_budget_mb'],
+            'run_deadline': DEFAULT_CONFIG['run_deadline'],
+            'phase_budgets': DEFAULT_CONFIG['phase_budgets'],
+            'circuit_breaker': DEFAULT_CONFIG['circuit_breaker'],
+            's3_bucket': DEFAULT_CONFIG['s3_bucket'],
+            's3_prefix': DEFAULT_CONFIG['s3_prefix'],
+            's3_endpoint': DEFAULT_CONFIG['s3_endpoint'],
+            's3_region': DEFAULT_CONFIG['s3_region'],
+            's3_workers': DEFAULT_CONFIG['s3_workers'],
+            's3_keep_local': DEFAULT_CONFIG['s3_keep_local'],
+            'flight_recorder': DEFAULT_CONFIG['flight_recorder']
         }
         config['Keywords'] = {'transaction_types': DEFAULT_CONFIG['transaction_types']}
         # ========== NEU V2.02/V2.09: WKN-Beispiele ==========
@@ -278,6 +1590,56 @@ def load_config():
     
     # ========== NEU V2.02: WKN-Mapping laden ==========
     wkn_mapping = load_wkn_mapping(config)
+
+    # NEU V2.22 externe Zuordnungs-Datei (wird erst beim ersten Nachschlagen geladen)
+    wkn_mapping_file = config.get('General', 'wkn_mapping_file', fallback='').strip() or None
+    if wkn_mapping_file:
+        wkn_mapping_file = os.path.normpath(os.path.join(BASE_DIR, os.path.expanduser(wkn_mapping_file)))
+    wkn_learn = config.getboolean('General', 'wkn_learn', fallback=False)
+
+    # NEU V2.29 Ablage: flat (alles in einem Ordner) oder year_type (Jahr/Typ)
+    archive_layout = config.get('General', 'archive_layout', fallback='flat').strip().lower()
+    if archive_layout not in ('flat', 'year_type'):
+        print(f"  ⚠ Unbekanntes archive_layout '{archive_layout}', verwende flat")
+        archive_layout = 'flat'
+
+    # NEU V2.30 identische PDFs: off, hardlink oder skip
+    dedup_mode = config.get('General', 'dedup_mode', fallback='off').strip().lower()
+    if dedup_mode not in ('off', 'hardlink', 'skip'):
+        print(f"  ⚠ Unbekannter dedup_mode '{dedup_mode}', verwende off")
+        dedup_mode = 'off'
+
+    # NEU V2.35 Zeitbudgets je Phase, z.B. "filter=60, scan=300" (Sekunden)
+    phase_budgets = {}
+    for part in config.get('General', 'phase_budgets', fallback=DEFAULT_CONFIG['phase_budgets']).split(','):
+        if not part.strip():
+            continue
+        name, _, seconds = part.partition('=')
+        name = name.strip().lower()
+        try:
+            if name not in RUN_PHASES:
+                raise ValueError(f"unbekannte Phase (erlaubt: {', '.join(RUN_PHASES)})")
+            phase_budgets[name] = float(seconds)
+        except ValueError as e:
+            print(f"  ⚠ phase_budgets '{part.strip()}': {e} - wird ignoriert")
+
+    # NEU V2.25 Zeitraum prüfen (leer = offen)
+    date_bounds = {}
+    for key in ('from_date', 'to_date'):
+        value = config.get('General', key, fallback='').strip()
+        try:
+            date_bounds[key] = _iso_date_arg(value) if value else None
+        except argparse.ArgumentTypeError as e:
+            print(f"  ⚠ {key}: {e} - Grenze wird ignoriert")
+            date_bounds[key] = None
+    wkn_mapping = WknMapping(wkn_mapping, wkn_mapping_file,
+                             os.path.join(STATE_DIR, "wkn_learned.csv") if wkn_learn else None)
+
+    # NEU V2.20 unbekannten Diagnose-Modus abfangen
+    error_capture_mode = config.get('General', 'error_capture_mode', fallback=DEFAULT_CONFIG['error_capture_mode']).strip().lower()
+    if error_capture_mode not in ('html', 'clip', 'full', 'off'):
+        print(f"  ⚠ Unbekannter error_capture_mode '{error_capture_mode}', nutze '{DEFAULT_CONFIG['error_capture_mode']}'")
+        error_capture_mode = DEFAULT_CONFIG['error_capture_mode']
     
     return {
         'max_transactions': config.getint('General', 'max_transactions', fallback=int(DEFAULT_CONFIG['max_transactions'])),
@@ -291,6 +1653,51 @@ def load_config():
         'get_documents': config.getboolean('General', 'get_documents', fallback=True),
         'only_new_docs': config.getboolean('General', 'only_new_docs', fallback=True),
         'only_executed': config.getboolean('General', 'only_executed', fallback=True),
+        'http_download': config.getboolean('General', 'http_download', fallback=False),  # NEU V2.14
+        'http_pool_size': max(1, config.getint('General', 'http_pool_size', fallback=int(DEFAULT_CONFIG['http_pool_size']))),
+        'try_headless': config.getboolean('General', 'try_headless', fallback=False),  # NEU V2.15
+        'parallel_mailbox': config.getboolean('General', 'parallel_mailbox', fallback=False),  # NEU V2.16
+        'backfill_workers': max(0, config.getint('General', 'backfill_workers', fallback=int(DEFAULT_CONFIG['backfill_workers']))),  # NEU V2.17
+        'resume_interrupted_runs': config.getboolean('General', 'resume_interrupted_runs', fallback=True),  # NEU V2.18
+        'retry_attempts': max(0, config.getint('General', 'retry_attempts', fallback=int(DEFAULT_CONFIG['retry_attempts']))),  # NEU V2.19
+        'retry_backoff': config.getfloat('General', 'retry_backoff', fallback=float(DEFAULT_CONFIG['retry_backoff'])),
+        'retry_failed_only': config.getboolean('General', 'retry_failed_only', fallback=False),
+        # NEU V2.20 Fehler-Diagnose
+        'diagnostics_dir': os.path.normpath(os.path.join(BASE_DIR, os.path.expanduser(
+            config.get('General', 'diagnostics_directory', fallback=DEFAULT_CONFIG['diagnostics_directory']).strip()))),
+        'error_capture_mode': error_capture_mode,
+        'error_capture_max': max(0, config.getint('General', 'error_capture_max', fallback=int(DEFAULT_CONFIG['error_capture_max']))),
+        # NEU V2.21 Konsole / Event-Log
+        'console_mode': config.get('General', 'console_mode', fallback=DEFAULT_CONFIG['console_mode']).strip().lower(),
+        'non_interactive': config.getboolean('General', 'non_interactive', fallback=False),
+        'event_log': os.path.join(STATE_DIR, "events.jsonl") if config.getboolean('General', 'event_log', fallback=True) else None,
+        'wkn_learn': wkn_learn,  # NEU V2.22
+        'restore_filter_state': config.getboolean('General', 'restore_filter_state', fallback=False),  # NEU V2.23
+        # NEU V2.24 Inventur-Modus
+        'inventory_mode': config.getboolean('General', 'inventory_mode', fallback=False),
+        'inventory_file': os.path.normpath(os.path.join(BASE_DIR, os.path.expanduser(
+            config.get('General', 'inventory_file', fallback=DEFAULT_CONFIG['inventory_file']).strip()))),
+        'inventory_max': config.getint('General', 'inventory_max', fallback=int(DEFAULT_CONFIG['inventory_max'])),
+        'from_date': date_bounds['from_date'],  # NEU V2.25
+        'to_date': date_bounds['to_date'],  # NEU V2.25
+        'adaptive_rate': config.getboolean('General', 'adaptive_rate', fallback=True),  # NEU V2.26
+        'verify_remote': config.getboolean('General', 'verify_remote', fallback=False),  # NEU V2.27
+        'archive_layout': archive_layout,  # NEU V2.29
+        'dedup_mode': dedup_mode,  # NEU V2.30
+        'metadata_index': config.getboolean('General', 'metadata_index', fallback=False),  # NEU V2.32
+        'session_budget_mb': config.getint('General', 'session_budget_mb', fallback=int(DEFAULT_CONFIG['session_budget_mb'])),  # NEU V2.34
+        # NEU V2.35 Zeitlimit (Minuten), Budgets je Phase (Sekunden), Circuit-Breaker
+        'run_deadline': config.getint('General', 'run_deadline', fallback=int(DEFAULT_CONFIG['run_deadline'])),
+        'phase_budgets': phase_budgets,
+        'circuit_breaker': config.getint('General', 'circuit_breaker', fallback=int(DEFAULT_CONFIG['circuit_breaker'])),
+        # NEU V2.36 S3-kompatibler Bucket als zusätzliches Ziel
+        's3_bucket': config.get('General', 's3_bucket', fallback='').strip(),
+        's3_prefix': config.get('General', 's3_prefix', fallback='').strip(),
+        's3_endpoint': config.get('General', 's3_endpoint', fallback='').strip(),
+        's3_region': config.get('General', 's3_region', fallback='').strip(),
+        's3_workers': max(1, config.getint('General', 's3_workers', fallback=int(DEFAULT_CONFIG['s3_workers']))),
+        's3_keep_local': config.getboolean('General', 's3_keep_local', fallback=True),
+        'flight_recorder': max(0, config.getint('General', 'flight_recorder', fallback=int(DEFAULT_CONFIG['flight_recorder']))),  # NEU V2.37
         'keywords': [k.strip() for k in config.get('Keywords', 'transaction_types', fallback=DEFAULT_CONFIG['transaction_types']).split(',')],
         'pdf_button_names': [k.strip() for k in config.get('ButtonTexts', 'pdf_button_names', fallback=DEFAULT_CONFIG['pdf_button_names']).split(',')],
         'logout_button': config.get('ButtonTexts', 'logout_button', fallback=DEFAULT_CONFIG['logout_button']),
@@ -335,15 +1742,152 @@ def filename_from_url(url: str):
         print(f"DEBUG filename_from_url: Exception aufgetreten: {e}")
         return None
 
-def collect_targets(items, keywords, max_transactions):
-    found = []
-    for idx, item in enumerate(items):
-        if len(found) >= max_transactions:
+# ========== NEU V2.33: Parser für den Listentext ==========
+class TransactionRecord(NamedTuple):
+    """Ausgewerteter Listentext einer Transaktion"""
+    keyword: str
+    text: str
+    name: str           # Wertpapier ohne Klammern, Beträge und Typ
+    isin: str           # ISIN aus dem Text (Klammern), sonst ""
+    amount: str | None  # letzter Betrag ohne Tausenderpunkte, z.B. "-1234,56"
+
+
+class TransactionTextParser:
+    """
+    Zerlegt Listentexte und baut daraus die Dateinamen. Alle Muster sind
+    vorkompiliert, parse_batch wertet die ganze Zielliste auf einmal aus.
+    Die Regeln entsprechen der bisherigen Namenslogik (V2.07 - V2.24),
+    tests/test_transaction_parser.py prüft sie gegen Beispiele aus der Liste.
+    """
+
+    PARENS = re.compile(r'\(.*?\)')
+    THOUSANDS = re.compile(r'(?<=\d)\.(?=\d)')
+    AMOUNT = re.compile(r'-?\d+,\d{2}')
+    AMOUNT_TAIL = re.compile(r'-?\d+[\.,]\d{2}.*$')
+    ISIN = re.compile(r'\(([A-Z]{2}[A-Z0-9]{10})\)')
+    URL_DATE_ISIN = re.compile(r'(\d{4}-\d{2}-\d{2})-.+?-([A-Z]{2}[A-Z0-9]{10})')
+    NON_WORD = re.compile(r'[^\w\s-]')
+    NAME_CHARS = str.maketrans({'€': '', ',': '-', ':': '', '/': '-'})
+
+    def parse(self, full_text, keyword):
+        name = self.AMOUNT_TAIL.sub('', self.PARENS.sub('', full_text)).strip()
+        if name.startswith(keyword):
+            name = name[len(keyword):].strip()
+        amounts = self.AMOUNT.findall(self.THOUSANDS.sub('', full_text))
+        isin_match = self.ISIN.search(full_text)
+        return TransactionRecord(keyword, full_text, name,
+                                 isin_match.group(1) if isin_match else "",
+                                 amounts[-1] if amounts else None)
+
+    def parse_batch(self, targets):
+        """targets: Liste von (idx, zeit, text, keyword) wie von collect_targets"""
+        parse = self.parse
+        return [parse(target[2], target[3]) for target in targets]
+
+    def url_date_isin(self, pdf_url):
+        """Returns: (Datum, ISIN) aus der PDF-URL oder None"""
+        match = self.URL_DATE_ISIN.search(pdf_url.split("?")[0] if pdf_url else "")
+        return match.groups() if match else None
+
+    def file_name(self, record, pdf_url, wkn_mapping, vorabpauschale=False, today=None):
+        """
+        Bereinigter Dateiname (ohne use_original_filename).
+        today ersetzt das aktuelle Datum, wenn die URL keines liefert.
+        """
+        today = today or datetime.now()
+        if vorabpauschale:
+            vp_text = record.text[8:].strip() if record.text.startswith("Steuern ") else record.text
+            isin_match = self.ISIN.search(vp_text)
+            identifier_str = convert_isin_to_wkn(isin_match.group(1) if isin_match else "UNKNOWN", wkn_mapping)
+            wp_name = self.PARENS.sub('', vp_text).replace("Vorabpauschale:", "").strip()
+            wp_name_clean = self.NON_WORD.sub('_', "_".join(wp_name.split()))
+            original_name = filename_from_url(pdf_url.split("?")[0] if pdf_url else "")
+            if original_name:
+                original_base = original_name.rsplit('.pdf', 1)[0] if original_name.endswith('.pdf') else original_name
+                file_name = f"{original_base}-{identifier_str}-{wp_name_clean}.pdf"
+            else:
+                # Fallback falls kein Original-Name verfügbar
+                file_name = f"{today.year}-01-02-Vorabpauschale-{identifier_str}-{wp_name_clean}.pdf"
+        else:
+            date_isin = self.url_date_isin(pdf_url)
+            date_str, isin_str = date_isin or (today.strftime("%Y-%m-%d"), "UNKNOWN")
+            betrag = record.amount.replace(',', '_') if record.amount else "0_00"
+            wp_name_clean = "_".join(record.name.translate(self.NAME_CHARS).split())
+            identifier_str = convert_isin_to_wkn(isin_str, wkn_mapping)
+            file_name = f"{date_str}-{record.keyword[:4]}-{identifier_str}-{wp_name_clean}-{betrag}.pdf"
+        return sanitize_filename(file_name)
+
+
+TRANSACTION_PARSER = TransactionTextParser()
+# ========== ENDE NEU V2.33 ==========
+
+# ========== NEU V2.25: Zeitraum from_date/to_date ==========
+class DateRange:
+    """
+    Zeitraum aus from_date/to_date (JJJJ-MM-TT, None = offen). Listen und
+    Mailbox sind absteigend sortiert: neuere Einträge werden übersprungen,
+    beim ersten älteren Eintrag ist der Zeitraum vorbei (passed).
+    """
+
+    def __init__(self, from_date=None, to_date=None):
+        self.from_date = from_date
+        self.to_date = to_date
+        self.passed = False
+        self._dates = {}
+
+    def __bool__(self):
+        return bool(self.from_date or self.to_date)
+
+    def classify(self, date_str):
+        """Returns: 'newer', 'inside' oder 'older' (unbekanntes Datum zählt als 'inside')"""
+        if not date_str:
+            return 'inside'
+        if self.to_date and date_str > self.to_date:
+            return 'newer'
+        if self.from_date and date_str < self.from_date:
+            self.passed = True
+            return 'older'
+        return 'inside'
+
+    def item_date(self, item, zeit):
+        """Datum einer Transaktionszeile; die Datums-Überschrift wird je Gruppe nur einmal gelesen"""
+        if not zeit:
+            return ""
+        if zeit not in self._dates:
+            date_str = parse_list_date(zeit)
+            if not date_str:
+                try:
+                    date_str = parse_list_date(item.evaluate(
+                        "el => { const h = document.getElementById(el.getAttribute('aria-labelledby').split(' ')[0]);"
+                        " return h ? h.innerText : ''; }"))
+                except Exception:
+                    date_str = ""
+            self._dates[zeit] = date_str
+        return self._dates[zeit]
+
+# mit from_date begrenzt der Zeitraum den Lauf, nicht mehr max_transactions/max_documents
+DATE_RANGE_MAX = 100000
+
+def date_range_from_settings(settings):
+    return DateRange(settings['from_date'], settings['to_date'])
+# ========== ENDE NEU V2.25 ==========
+
+def collect_targets(items, keywords, max_transactions, date_range=None):
+    found = []
+    for idx, item in enumerate(items):
+        if len(found) >= max_transactions:
             break
         try:
             if not item.is_visible():
                 continue
             zeit = item.get_attribute('aria-labelledby')
+            # NEU V2.25 Zeilen außerhalb des Zeitraums
+            if date_range:
+                position = date_range.classify(date_range.item_date(item, zeit))
+                if position == 'newer':
+                    continue
+                if position == 'older':
+                    break
             text = item.inner_text().replace("\n", " ").strip()
             for key in keywords:
                 if key in text:
@@ -392,10 +1936,11 @@ def handle_popups(page):
         print(f"  ⚠ Popup-Handling Fehler: {e}")
 
 # ========== NEU V2.04: Scroll-Funktion zum Nachladen ==========
-def scroll_and_load_transactions(page, keywords, max_transactions, settings):
+def scroll_and_load_transactions(page, keywords, max_transactions, settings, date_range=None):
     """
     Scrollt durch die Transaktionsliste und lädt nach, bis max_transactions 
     erreicht ist oder keine neuen Transaktionen mehr erscheinen.
+    NEU V2.25: oder der Beginn des Zeitraums (from_date) unterschritten ist.
     """
     print(f"[v{__version__}] Starte Scroll-Logik zum Nachladen...")
     
@@ -412,7 +1957,7 @@ def scroll_and_load_transactions(page, keywords, max_transactions, settings):
             print(f"  ⚠ Fehler beim Laden der Elemente: {e}")
             break
         
-        current_targets = collect_targets(all_items, keywords, max_transactions)
+        current_targets = collect_targets(all_items, keywords, max_transactions, date_range)
         current_count = len(current_targets)
         
         print(f"  → Aktuell sichtbar: {current_count} Transaktionen")
@@ -421,6 +1966,16 @@ def scroll_and_load_transactions(page, keywords, max_transactions, settings):
         if current_count >= max_transactions:
             print(f"  ✓ Maximum erreicht ({max_transactions})")
             break
+
+        # NEU V2.25 ältere Transaktionen als from_date erreicht
+        if date_range and date_range.passed:
+            print(f"  ✓ Beginn des Zeitraums erreicht ({date_range.from_date})")
+            break
+
+        # NEU V2.35 Zeitbudget: mit den bisher geladenen Transaktionen weitermachen
+        if RUN_DEADLINE.expired('scan'):
+            RUN_DEADLINE.cancel('scan', None, "ältere Transaktionen")
+            break
         
         # Prüfen ob sich die Anzahl nicht mehr ändert
         if current_count == previous_count:
@@ -445,8 +2000,220 @@ def scroll_and_load_transactions(page, keywords, max_transactions, settings):
     return current_count
 # ========== ENDE NEU V2.04 ==========
 
-def save_error_screenshot(page, download_dir, full_text, error_type, date_str=None, wp_name=None):
-    """Speichert einen Error-Screenshot mit aussagekräftigem Namen"""
+# ========== NEU V2.35: Zeitlimit des Laufs, Budgets je Phase und Circuit-Breaker ==========
+RUN_PHASES = ('login', 'filter', 'scan', 'transactions', 'mailbox')
+
+class RunDeadline:
+    """
+    Zeitlimit für den ganzen Lauf (run_deadline) und Budgets je Phase
+    (phase_budgets, gemessen ab Beginn der Phase). Ist eine Phase abgelaufen,
+    wird sie an der nächsten sicheren Stelle beendet und festgehalten, was
+    übersprungen wurde. Der Circuit-Breaker beendet eine Phase nach
+    circuit_breaker aufeinanderfolgenden Fehlern gleicher Art.
+    Ohne Limits (Standard) ist nie etwas abgelaufen.
+    """
+
+    def __init__(self, run_seconds=0, budgets=None, breaker_limit=0):
+        self.start = time.perf_counter()
+        self.run_seconds = run_seconds
+        self.budgets = budgets or {}
+        self.breaker_limit = breaker_limit
+        self.started = {}
+        self.tripped = {}    # Phase -> Grund
+        self.failures = {}   # Phase -> (Fehlerart, Anzahl in Folge)
+        self.cancelled = []  # (Phase, Grund, Anzahl übersprungen, was)
+        self.lock = threading.Lock()  # Mailbox-Thread läuft parallel
+
+    def begin(self, phase):
+        """Beginn der Phase merken (nur beim ersten Aufruf, z.B. nicht bei Wiederholungen)"""
+        self.started.setdefault(phase, time.perf_counter())
+
+    def remaining(self, phase):
+        """Restzeit in Sekunden für Lauf und Phase, None = unbegrenzt"""
+        now = time.perf_counter()
+        limits = []
+        if self.run_seconds:
+            limits.append(self.run_seconds - (now - self.start))
+        if phase in self.budgets:
+            limits.append(self.budgets[phase] - (now - self.started.get(phase, now)))
+        return min(limits) if limits else None
+
+    def reason(self, phase):
+        """Grund, warum die Phase enden muss, sonst None"""
+        if phase in self.tripped:
+            return self.tripped[phase]
+        now = time.perf_counter()
+        if self.run_seconds and now - self.start >= self.run_seconds:
+            return 'run_deadline'
+        if phase in self.budgets and now - self.started.get(phase, now) >= self.budgets[phase]:
+            return 'phase_budget'
+        return None
+
+    def expired(self, phase):
+        return self.reason(phase) is not None
+
+    def timeout_ms(self, phase, default_ms):
+        """Playwright-Timeout höchstens bis zum Ende von Lauf bzw. Phase (mindestens 1 s)"""
+        remaining = self.remaining(phase)
+        if remaining is None:
+            return default_ms
+        return int(max(1000, min(default_ms, remaining * 1000)))
+
+    def failure(self, phase, kind):
+        """Fehlschlag zählen; nach breaker_limit gleichen Fehlern in Folge ist die Phase beendet"""
+        if not self.breaker_limit:
+            return
+        with self.lock:
+            last, count = self.failures.get(phase, (None, 0))
+            count = count + 1 if last == kind else 1
+            self.failures[phase] = (kind, count)
+            if count >= self.breaker_limit and phase not in self.tripped:
+                self.tripped[phase] = f"circuit_breaker:{kind}"
+                print(f"  ✗ Circuit-Breaker: {count}x '{kind}' in Folge - beende Phase '{phase}'")
+                log_event('circuit_breaker', phase=phase, kind=kind, count=count)
+
+    def success(self, phase):
+        with self.lock:
+            self.failures.pop(phase, None)
+
+    def cancel(self, phase, skipped=None, what="Einträge"):
+        """Phase beenden; skipped = Anzahl übersprungener Einträge (None = unbekannt)"""
+        reason = self.reason(phase) or 'cancelled'
+        with self.lock:
+            self.cancelled.append((phase, reason, skipped, what))
+        rest = f"{skipped} {what} übersprungen" if skipped is not None else f"restliche {what} übersprungen"
+        print(f"  ⚠ Phase '{phase}' beendet ({reason}), {rest}")
+        log_event('phase_cancelled', phase=phase, reason=reason, skipped=skipped, what=what)
+        flight_dump(f"{phase}_{reason}")  # NEU V2.37
+
+    def was_cancelled(self, phase):
+        return any(entry[0] == phase for entry in self.cancelled)
+
+    def remaining_settings(self, settings):
+        """
+        Kopie von settings mit der Restzeit von Lauf und Phasen, z.B. für
+        Backfill-Prozesse. Abgelaufene Limits bleiben minimal statt 0 (= unbegrenzt).
+        """
+        now = time.perf_counter()
+        remaining = dict(settings)
+        if self.run_seconds:
+            remaining['run_deadline'] = max(0.001, self.run_seconds - (now - self.start)) / 60
+        remaining['phase_budgets'] = {
+            phase: max(0.001, budget - (now - self.started.get(phase, now)))
+            for phase, budget in self.budgets.items()
+        }
+        return remaining
+
+    def report(self):
+        for phase, reason, skipped, what in self.cancelled:
+            count = skipped if skipped is not None else "?"
+            print(f"[v{__version__}] Abgebrochen: {phase} ({reason}), übersprungen: {count} {what}")
+
+
+def run_deadline_from_settings(settings):
+    return RunDeadline(settings['run_deadline'] * 60, settings['phase_budgets'], settings['circuit_breaker'])
+
+RUN_DEADLINE = RunDeadline()  # wird in run_downloader bzw. _backfill_worker gesetzt
+# ========== ENDE NEU V2.35 ==========
+
+# ========== NEU V2.20: Fehler-Diagnose mit Obergrenze und Deduplizierung ==========
+class ErrorCapture:
+    """
+    Sammelt Diagnose-Daten zu Fehlern im separaten Diagnose-Ordner.
+    Je Fehlertyp wird nur das erste Auftreten erfasst, insgesamt höchstens
+    error_capture_max Dateien je Lauf. Nur das Erfassen (HTML-Ausschnitt oder
+    Screenshot-Bytes) läuft im Browser-Thread, das Schreiben erledigt ein
+    Hintergrund-Thread.
+
+    Modi (error_capture_mode):
+        html  HTML des Detail-Panels bzw. der Seite (am schnellsten)
+        clip  Screenshot nur des Detail-Panels
+        full  Screenshot des sichtbaren Fensters (Verhalten bis V2.19)
+        off   keine Diagnose-Dateien
+    """
+
+    PANEL_SELECTOR = "[role='dialog']"
+
+    def __init__(self, settings):
+        self.mode = settings['error_capture_mode']
+        self.max_captures = settings['error_capture_max']
+        self.directory = settings['diagnostics_dir']
+        self.counts = {}
+        self.captured = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diag-writer")
+
+    def capture(self, page, error_type, name):
+        with self.lock:
+            self.counts[error_type] = self.counts.get(error_type, 0) + 1
+            if self.mode == 'off' or self.counts[error_type] > 1 or self.captured >= self.max_captures:
+                return
+            self.captured += 1
+
+        try:
+            if self.mode == 'html':
+                data = self._html_snippet(page).encode('utf-8')
+                file_name = name + ".html"
+            elif self.mode == 'clip':
+                data = self._panel_screenshot(page)
+                file_name = name + ".png"
+            else:
+                data = page.screenshot()
+                file_name = name + ".png"
+        except Exception as e:
+            print(f"  ⚠ Diagnose fehlgeschlagen: {e}")
+            return
+
+        self.writer.submit(self._write, file_name, data)
+        print(f"*** ERROR ***  ⚠ Diagnose gespeichert: {file_name}")
+
+    def _html_snippet(self, page):
+        html = None
+        try:
+            panel = page.locator(self.PANEL_SELECTOR).first
+            if panel.count() > 0:
+                html = panel.evaluate("el => el.outerHTML")
+        except Exception:
+            pass
+        if not html:
+            html = page.content()
+        return f"<!-- {page.url} -->\n{html[:500000]}"
+
+    def _panel_screenshot(self, page):
+        try:
+            panel = page.locator(self.PANEL_SELECTOR).first
+            if panel.count() > 0 and panel.is_visible():
+                return panel.screenshot(timeout=2000)
+        except Exception:
+            pass
+        return page.screenshot()
+
+    def _write(self, file_name, data):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, file_name), 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"  ⚠ Diagnose-Datei konnte nicht geschrieben werden: {e}")
+
+    def close(self):
+        """Wartet auf ausstehende Schreibvorgänge und gibt eine Zusammenfassung aus"""
+        if self.closed:
+            return
+        self.closed = True
+        self.writer.shutdown(wait=True)
+        total = sum(self.counts.values())
+        if total:
+            by_type = ", ".join(f"{t}: {n}" for t, n in sorted(self.counts.items()))
+            print(f"[v{__version__}] Fehler: {total} ({by_type}), {self.captured} Diagnose-Datei(en) in {self.directory}")
+
+ERROR_CAPTURE = None  # wird in run_downloader bzw. je Backfill-Prozess gesetzt
+
+def capture_error(page, full_text, error_type, date_str=None, wp_name=None):
+    """Erfasst Diagnose-Daten zu einem Fehler mit aussagekräftigem Namen"""
+    if ERROR_CAPTURE is None:
+        return
     try:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
@@ -467,13 +2234,444 @@ def save_error_screenshot(page, download_dir, full_text, error_type, date_str=No
         else:
             parts.append(clean_text)
         
-        error_file_name = "_".join(parts) + ".png"
-        error_path = os.path.join(download_dir, error_file_name)
-        
-        page.screenshot(path=error_path)
-        print(f"*** ERROR ***  ⚠ Screenshot gespeichert: {error_file_name}") # V2.04b
-    except Exception as screenshot_error:
-        print(f"  ⚠ Screenshot fehlgeschlagen: {screenshot_error}")
+        ERROR_CAPTURE.capture(page, error_type, "_".join(parts))
+    except Exception as e:
+        print(f"  ⚠ Diagnose fehlgeschlagen: {e}")
+# ========== ENDE NEU V2.20 ==========
+
+# ========== NEU V2.37: Flugschreiber für Netzwerk und Konsole ==========
+class FlightRecorder:
+    """
+    Ringpuffer der letzten N Antworten (URL, Status, Dauer, Größe),
+    fehlgeschlagenen Requests und Konsolen-Meldungen des Browsers. Im Lauf
+    wird nur in den Puffer eingetragen; geschrieben wird erst, wenn eine
+    Transaktion fehlschlägt oder der Lauf abbricht (HAR-ähnliches JSON im
+    Diagnose-Ordner, je Fehlerart nur einmal). URLs werden ohne Query-String
+    gepuffert, da z.B. die PDF-Links ein Zugriffs-Token (?token=) enthalten.
+    """
+
+    URL_QUERY = re.compile(r'(https?://[^\s?#"\'<>]+)[?#][^\s"\'<>]*')
+
+    def __init__(self, size, directory):
+        self.entries = deque(maxlen=size)
+        self.console = deque(maxlen=max(20, size // 4))
+        self.directory = directory
+        self.pending = {}  # Request -> Eintrag, bis requestfinished die Dauer liefert
+        self.dumped = set()
+
+    def attach(self, context):
+        context.on("response", self._on_response)
+        context.on("requestfinished", self._on_finished)
+        context.on("requestfailed", self._on_failed)
+        context.on("console", self._on_console)
+
+    @staticmethod
+    def _safe_url(url):
+        """URL ohne Query-String und Fragment"""
+        return url.split('#', 1)[0].split('?', 1)[0][:500]
+
+    def _on_response(self, response):
+        request = response.request
+        entry = {
+            'time': time.time(),
+            'method': request.method,
+            'url': self._safe_url(response.url),
+            'status': response.status,
+            'size': int(response.headers.get('content-length') or -1),
+            'mime': response.headers.get('content-type', ''),
+            'type': request.resource_type,
+            'ms': -1,
+        }
+        self.entries.append(entry)
+        if len(self.pending) > 1000:
+            self.pending.clear()  # Requests ohne requestfinished nicht ewig festhalten
+        self.pending[request] = entry
+
+    def _on_finished(self, request):
+        entry = self.pending.pop(request, None)
+        if entry is not None:
+            timing = request.timing
+            entry['ms'] = round(timing.get('responseEnd', -1), 1)
+            if timing.get('startTime', -1) > 0:
+                entry['time'] = timing['startTime'] / 1000  # Beginn des Requests statt Eingang der Antwort
+
+    def _on_failed(self, request):
+        self.pending.pop(request, None)
+        self.entries.append({
+            'time': time.time(),
+            'method': request.method,
+            'url': self._safe_url(request.url),
+            'status': 0,
+            'size': -1,
+            'mime': '',
+            'type': request.resource_type,
+            'ms': -1,
+            'error': self.URL_QUERY.sub(r'\1', request.failure or ''),
+        })
+
+    def _on_console(self, message):
+        if message.type in ('error', 'warning'):
+            text = self.URL_QUERY.sub(r'\1', message.text)  # Meldungen nennen oft die URL
+            self.console.append({'time': time.time(), 'type': message.type, 'text': text[:500]})
+
+    def dump(self, reason):
+        """Puffer als HAR-ähnliche Datei schreiben (je reason einmal je Lauf)"""
+        if reason in self.dumped or not (self.entries or self.console):
+            return None
+        self.dumped.add(reason)
+        entries = [{
+            'startedDateTime': datetime.fromtimestamp(e['time']).isoformat(timespec='milliseconds'),
+            'time': e['ms'],
+            'request': {'method': e['method'], 'url': e['url']},
+            'response': {'status': e['status'], 'content': {'size': e['size'], 'mimeType': e['mime']}},
+            '_resourceType': e['type'],
+            **({'_error': e['error']} if e.get('error') else {}),
+        } for e in list(self.entries)]
+        har = {'log': {
+            'version': '1.2',
+            'creator': {'name': 'SC-Downloader', 'version': __version__},
+            'comment': reason,
+            'entries': entries,
+            '_console': [dict(c, time=datetime.fromtimestamp(c['time']).isoformat(timespec='milliseconds'))
+                         for c in list(self.console)],
+        }}
+        safe_reason = re.sub(r'[^\w-]', '_', reason)[:40]
+        path = os.path.join(self.directory, f"flight_{safe_reason}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.har.json")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(har, f, ensure_ascii=False, indent=1)
+            print(f"  ⚠ Flugschreiber gespeichert: {os.path.basename(path)} ({len(entries)} Requests)")
+            log_event('flight_recorder', reason=reason, file=path, entries=len(entries))
+            return path
+        except Exception as e:
+            print(f"  ⚠ Flugschreiber konnte nicht geschrieben werden: {e}")
+            return None
+
+FLIGHT_RECORDER = None  # wird in run_downloader gesetzt (flight_recorder > 0)
+
+def flight_dump(reason):
+    if FLIGHT_RECORDER is not None:
+        FLIGHT_RECORDER.dump(reason)
+# ========== ENDE NEU V2.37 ==========
+
+# ========== NEU V2.38: Mitschnitt und Wiedergabe (HAR) für Vergleichsläufe ==========
+HAR_SENSITIVE_HEADERS = {'cookie', 'set-cookie', 'authorization', 'proxy-authorization',
+                         'x-csrf-token', 'x-xsrf-token'}
+HAR_SENSITIVE_KEYS = {
+    'password', 'passwort', 'email', 'mail', 'username', 'firstname', 'lastname', 'fullname',
+    'givenname', 'familyname', 'phone', 'phonenumber', 'mobile', 'iban', 'bic', 'birthdate', 'birthday',
+    'dateofbirth', 'street', 'address', 'zipcode', 'postalcode', 'city', 'taxid', 'taxnumber',
+    'customerid', 'personid', 'userid', 'accountnumber', 'otp',
+}
+HAR_EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+# Zuweisungen in HTML/JS-Text: "firstName": "Max", firstName: 'Max', \"iban\":\"DE..\", data-iban="DE.."
+HAR_ASSIGNMENT_PATTERN = re.compile(r'''\\?["']?([A-Za-z_][\w-]*)\\?["']?\s*[:=]\s*\\?["']((?:[^"'\\]|\\[^"'])*)\\?["']''')
+HAR_QUERY_PATTERN = re.compile(r'''[?&]([\w.-]+)=([^&#\s"'<>\\]+)''')
+HAR_PLACEHOLDER_PDF = (
+    b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+    b"2 0 obj\n<< /Type /Pages /Kids [] /Count 0 >>\nendobj\n"
+    b"xref\n0 3\n0000000000 65535 f \n0000000009 00000 n \n0000000058 00000 n \n"
+    b"trailer << /Size 3 /Root 1 0 R >>\nstartxref\n110\n%%EOF\n"
+)
+
+def _har_sensitive_key(key):
+    """Feld-, Parameter- oder Header-Name mit Zugangsdaten oder persönlichen Daten?"""
+    key = re.sub(r'[^a-z]', '', str(key).lower())
+    return key in HAR_SENSITIVE_KEYS or key.endswith(
+        ('password', 'token', 'secret', 'email', 'iban', 'apikey', 'sessionid', 'auth', 'authorization'))
+
+
+class _HarResponse:
+    """Antwort aus dem Mitschnitt mit den Teilen der Playwright-API, die download_pdf_in_browser nutzt"""
+
+    def __init__(self, entry):
+        response = entry['response']
+        self.status = response['status']
+        self.headers = {h['name'].lower(): h['value'] for h in response.get('headers', [])}
+        self._content = response.get('content', {})
+
+    def body(self):
+        text = self._content.get('text', '')
+        if self._content.get('encoding') == 'base64':
+            return base64.b64decode(text)
+        return text.encode('utf-8')
+
+
+class HarSession:
+    """
+    --record: schneidet den Netzwerkverkehr eines echten Laufs als HAR mit
+    (inkl. der PDF-Abrufe über page.request) und entfernt danach Zugangsdaten
+    und persönliche Daten. --replay: spielt den Mitschnitt über
+    context.route_from_har ohne Netzwerk wieder ab.
+
+    Beide Modi arbeiten in einer Sandbox (scalable_state/har_sandbox) mit
+    eigener Ablage und eigenem Zustand, damit vorhandene PDFs, Checkpoints und
+    Filterzustände den Ablauf nicht verändern. Die Wiedergabe nutzt eine Kopie
+    der Session ohne Caches (die App sieht sich angemeldet), Laufzeit und
+    Anzahl Requests werden je Version in har_metrics.json verglichen.
+    """
+
+    def __init__(self, mode, path):
+        self.mode = mode
+        self.path = os.path.abspath(path)
+        self.metrics_path = os.path.join(STATE_DIR, "har_metrics.json")
+        self.sandbox = os.path.join(STATE_DIR, "har_sandbox")
+        self.requests = 0
+        self.api_requests = 0
+        self.api_entries = []
+        self.finished = False
+        self._api_index = None
+
+    def prepare(self, settings):
+        """
+        Richtet die Sandbox ein und stellt Optionen ab, deren Requests am
+        Browser vorbeilaufen (HTTP-Client, Mailbox-Browser, Backfill-Prozesse).
+
+        Returns:
+            tuple: (STATE_DIR, SESSION_DIR) für diesen Lauf
+        """
+        if self.mode == 'replay' and not os.path.isfile(self.path):
+            raise FileNotFoundError(f"Mitschnitt nicht gefunden: {self.path}")
+        shutil.rmtree(self.sandbox, ignore_errors=True)
+        os.makedirs(os.path.join(self.sandbox, "state"))
+        settings.update(download_dir=os.path.join(self.sandbox, "downloads"), download_dir_mailbox='',
+                        http_download=False, parallel_mailbox=False, backfill_workers=0, verify_remote=False,
+                        s3_bucket='', resume_interrupted_runs=False, retry_failed_only=False,
+                        session_budget_mb=0, wkn_learn=False, metadata_index=False)
+        session_dir = SESSION_DIR
+        if self.mode == 'replay':
+            session_dir = os.path.join(self.sandbox, "session")
+            if os.path.isdir(SESSION_DIR):
+                cache_names = {os.path.basename(name) for name in SESSION_CACHE_DIRS}
+                shutil.copytree(SESSION_DIR, session_dir, ignore=lambda d, names: cache_names.intersection(names))
+            print(f"[v{__version__}] Wiedergabe: {self.path}")
+        else:
+            atexit.register(self.finish_recording)  # auch bei Abbruch nichts Unbereinigtes liegen lassen
+            print(f"[v{__version__}] Mitschnitt: {self.path}")
+        print(f"  → Sandbox: {self.sandbox}")
+        return os.path.join(self.sandbox, "state"), session_dir
+
+    def launch_options(self):
+        if self.mode == 'record':
+            return {'record_har_path': self.path, 'record_har_content': 'embed'}
+        return {}
+
+    def attach(self, context):
+        context.on("request", self._count_request)
+        if self.mode == 'replay':
+            context.route_from_har(self.path, not_found='abort')
+
+    def _count_request(self, request):
+        self.requests += 1
+
+    def fetch(self, page, url):
+        """Ersatz für page.request.get: zeichnet auf bzw. liefert aus dem Mitschnitt"""
+        self.api_requests += 1
+        if self.mode == 'replay':
+            if self._api_index is None:
+                self._api_index = self._load_api_index()
+            entry = self._api_index.get(url)
+            if entry is None:
+                raise RuntimeError(f"nicht im Mitschnitt: {url[:80]}")
+            return _HarResponse(entry)
+        start = time.perf_counter()
+        response = page.request.get(url)
+        body = response.body()
+        self.api_entries.append(self._api_entry(url, response, body, time.perf_counter() - start))
+        return response
+
+    def _load_api_index(self):
+        with open(self.path, encoding='utf-8') as f:
+            entries = json.load(f)['log']['entries']
+        index = {}
+        for entry in entries:
+            if entry['request']['method'] == 'GET' and (entry.get('_apiRequest') or entry['request']['url'] not in index):
+                index[entry['request']['url']] = entry
+        return index
+
+    @staticmethod
+    def _api_entry(url, response, body, seconds):
+        headers = response.headers
+        return {
+            'startedDateTime': datetime.now().astimezone().isoformat(timespec='milliseconds'),
+            'time': round(seconds * 1000, 1),
+            'request': {'method': 'GET', 'url': url, 'httpVersion': 'HTTP/1.1', 'cookies': [], 'headers': [],
+                        'queryString': [], 'headersSize': -1, 'bodySize': 0},
+            'response': {'status': response.status, 'statusText': '', 'httpVersion': 'HTTP/1.1', 'cookies': [],
+                         'headers': [{'name': k, 'value': v} for k, v in headers.items()],
+                         'content': {'size': len(body), 'mimeType': headers.get('content-type', ''),
+                                     'text': base64.b64encode(body).decode('ascii'), 'encoding': 'base64'},
+                         'redirectURL': '', 'headersSize': -1, 'bodySize': len(body)},
+            'cache': {},
+            'timings': {'send': 0, 'wait': round(seconds * 1000, 1), 'receive': 0},
+            '_apiRequest': True,
+        }
+
+    def finish_recording(self):
+        """HAR um die PDF-Abrufe ergänzen und bereinigen (nach context.close())"""
+        if self.mode != 'record' or self.finished or not os.path.isfile(self.path):
+            return
+        self.finished = True
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                har = json.load(f)
+            har['log']['entries'].extend(self.api_entries)
+            replaced = scrub_har(har)
+            _write_json_atomic(self.path, har)
+            print(f"[v{__version__}] ✓ Mitschnitt gespeichert: {self.path} ({len(har['log']['entries'])} Requests, "
+                  f"{replaced} persönliche Werte ersetzt)")
+        except Exception as e:
+            # lieber gar kein Mitschnitt als einer mit Zugangsdaten
+            print(f"  ✗ Mitschnitt konnte nicht bereinigt werden, wird gelöscht: {e}")
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def report(self, seconds, downloaded):
+        """Laufzeit und Round-Trips speichern und mit anderen Versionen vergleichen"""
+        metrics = _read_json(self.metrics_path, {})
+        runs = metrics.setdefault(os.path.basename(self.path), {})
+        key = __version__ if self.mode == 'replay' else 'live'
+        runs[key] = {
+            'seconds': round(seconds, 1),
+            'requests': self.requests,
+            'api_requests': self.api_requests,
+            'downloaded': downloaded,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+        }
+        try:
+            _write_json_atomic(self.metrics_path, metrics)
+        except OSError as e:
+            print(f"  ⚠ HAR-Metriken konnten nicht gespeichert werden: {e}")
+        label = "Wiedergabe" if self.mode == 'replay' else "Mitschnitt"
+        print(f"[v{__version__}] {label}: {seconds:.1f} s, {self.requests} Requests + {self.api_requests} PDF-Abrufe, "
+              f"{downloaded} PDF(s)")
+        current = runs[key]
+        for other, run in sorted(runs.items()):
+            if other == key:
+                continue
+            diff = (current['seconds'] - run['seconds']) / run['seconds'] * 100 if run['seconds'] else 0
+            name = other if other == 'live' else 'v' + other
+            print(f"  → gegenüber {name} ({run['timestamp']}): {run['seconds']:.1f} s -> {current['seconds']:.1f} s ({diff:+.0f}%), "
+                  f"Requests {run['requests']} -> {current['requests']}, PDF(s) {run['downloaded']} -> {current['downloaded']}")
+
+
+def scrub_har(har):
+    """
+    Entfernt Zugangsdaten und persönliche Daten aus einem HAR:
+    Cookies und Header mit Zugangsdaten (z.B. X-Auth-Token), Werte
+    persönlicher Felder und Parameter (JSON, Formulare, Query-Strings,
+    Zuweisungen in HTML/JS) und E-Mail-Adressen. Jeder gefundene Wert wird
+    überall im Mitschnitt (auch in URLs) durch denselben Platzhalter ersetzt,
+    damit die Wiedergabe weiterhin passende Requests findet; kurze Werte
+    (z.B. "Max") nur als ganzes Wort. PDF-Inhalte werden durch ein leeres PDF ersetzt.
+
+    Returns:
+        Anzahl ersetzter Werte
+    """
+    entries = har['log']['entries']
+    values = set()
+
+    def add(key, value):
+        if _har_sensitive_key(key) and value.strip() and value != "***":
+            values.add(value)
+            if '%' in value or '+' in value:
+                values.add(unquote(value.replace('+', ' ')))
+
+    def collect(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    value = str(value)  # z.B. numerische Kunden-Nummer
+                if isinstance(value, str) and _har_sensitive_key(key):
+                    add(key, value)
+                else:
+                    collect(value)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    def texts(entry):
+        """Alle Text-Inhalte eines Eintrags (Request-Body, Antwort ohne base64)"""
+        post = entry['request'].get('postData')
+        if post:
+            yield post
+        content = entry['response'].get('content', {})
+        if content.get('text') and content.get('encoding') != 'base64':
+            yield content
+
+    for entry in entries:
+        request = entry['request']
+        for holder in texts(entry):
+            text = holder['text']
+            values.update(HAR_EMAIL_PATTERN.findall(text))
+            try:
+                collect(json.loads(text))
+            except ValueError:
+                if '=' in text and holder is request.get('postData'):
+                    collect(dict(parse_qsl(text)))
+            # HTML/JS (z.B. Zustand der App in <script>) und URLs im Text
+            for key, value in HAR_ASSIGNMENT_PATTERN.findall(text):
+                add(key, value)
+            for key, value in HAR_QUERY_PATTERN.findall(text):
+                add(key, value)
+        for key, value in parse_qsl(urlparse(request['url']).query):
+            add(key, value)
+        for key, value in HAR_QUERY_PATTERN.findall(request['url']):
+            add(key, value)
+        for param in request.get('queryString', []) + request.get('postData', {}).get('params', []):
+            add(param.get('name', ''), param.get('value', ''))
+        for part in (request, entry['response']):
+            for header in part.get('headers', []):
+                if header['name'].lower() not in ('cookie', 'set-cookie'):
+                    add(header['name'], header['value'])
+
+    placeholders = {}
+    for value in values:
+        digest = hashlib.sha256(value.encode('utf-8')).hexdigest()[:10]
+        placeholder = f"x{digest}@example.invalid" if HAR_EMAIL_PATTERN.fullmatch(value) else f"x{digest}"
+        placeholders[value] = placeholder
+        placeholders.setdefault(quote(value, safe=''), quote(placeholder, safe=''))
+    # kurze Werte nur als ganzes Wort ersetzen ("Max", aber nicht "Maximum")
+    pattern = re.compile("|".join(
+        re.escape(v) if len(v) >= 4 else rf"(?<!\w){re.escape(v)}(?!\w)"
+        for v in sorted(placeholders, key=len, reverse=True))) if placeholders else None
+
+    def replace(text):
+        return pattern.sub(lambda m: placeholders[m.group(0)], text) if pattern and text else text
+
+    for entry in entries:
+        for part in (entry['request'], entry['response']):
+            part['cookies'] = []
+            for header in part.get('headers', []):
+                if header['name'].lower() in HAR_SENSITIVE_HEADERS or _har_sensitive_key(header['name']):
+                    header['value'] = "***"
+                else:
+                    header['value'] = replace(header['value'])
+        request = entry['request']
+        request['url'] = replace(request['url'])
+        for param in request.get('queryString', []):
+            param['value'] = replace(param['value'])
+        post = request.get('postData')
+        if post:
+            post['text'] = replace(post.get('text', ''))
+            for param in post.get('params', []):
+                param['value'] = replace(param.get('value', ''))
+        content = entry['response'].get('content', {})
+        if 'pdf' in content.get('mimeType', '').lower():
+            content.update(text=base64.b64encode(HAR_PLACEHOLDER_PDF).decode('ascii'), encoding='base64',
+                           size=len(HAR_PLACEHOLDER_PDF))
+        elif content.get('text') and content.get('encoding') != 'base64':
+            content['text'] = replace(content['text'])
+        if entry['response'].get('redirectURL'):
+            entry['response']['redirectURL'] = replace(entry['response']['redirectURL'])
+    return len(values)
+
+
+HAR_SESSION = None  # wird in run_downloader gesetzt (--record / --replay)
+# ========== ENDE NEU V2.38 ==========
 
 # NEU V2.06
 def normalize_text(s: str) -> str:
@@ -539,12 +2737,56 @@ def resolve_and_prepare_download_dir(raw_dir: str) -> str:
             print(" ✗ Kritischer Fehler: Konnte kein gültiges Download-Verzeichnis anlegen.")
             print(f"   Primär: {candidate} -> {e}")
             print(f"   Fallback: {fallback} -> {e2}")
-            input(" Drücke Enter zum Beenden...")
+            wait_for_enter(" Drücke Enter zum Beenden...")
             sys.exit(1)
 
-def _launch_context_with_retry(p, settings):
+# NEU V2.17
+def write_file_no_clobber(target_path, data):
+    """
+    Schreibt eine Datei atomar, ohne eine bestehende Datei zu überschreiben.
+    Die Daten landen zuerst in einer Temp-Datei im Zielordner und werden dann
+    per Hardlink unter dem Zielnamen angelegt. Schreiben mehrere Prozesse
+    gleichzeitig dieselbe Datei, gewinnt genau einer.
+
+    Returns:
+        'saved' wenn geschrieben, 'exists' wenn die Datei bereits existiert,
+        'duplicate' wenn der Inhalt schon unter anderem Namen vorliegt
+        (NEU V2.30, je nach dedup_mode verlinkt oder gar nicht gespeichert)
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)  # NEU V2.29 Jahr/Typ-Ordner
+
+    # NEU V2.30 gleicher Inhalt unter anderem Namen -> verlinken oder überspringen
+    handled, digest = store_pdf_deduplicated(target_path, data)
+    if handled:
+        return 'duplicate'
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".__part__", suffix=".tmp", dir=os.path.dirname(target_path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            os.link(tmp_path, target_path)
+        except FileExistsError:
+            note_archived(target_path)
+            return 'exists'
+        except OSError:
+            # Dateisystem ohne Hardlinks (z.B. FAT32 oder manche Netzlaufwerke)
+            if os.path.exists(target_path):
+                note_archived(target_path)
+                return 'exists'
+            os.replace(tmp_path, target_path)
+        note_archived(target_path)  # NEU V2.29
+        if digest:
+            CONTENT_INDEX.add(target_path, digest, len(data))
+        return 'saved'
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _launch_context_with_retry(p, settings, headless=False):
     """
     Startet launch_persistent_context mit einmaligem Selbstheilungsversuch.
+    NEU V2.15: headless=True startet ohne Fenster und ohne slow_mo.
 
     Tritt ein TargetClosedError auf (typisch bei beschädigter EXE-Session),
     wird der SESSION_DIR gelöscht und genau einmal neu versucht.
@@ -554,9 +2796,11 @@ def _launch_context_with_retry(p, settings):
     def _do_launch():
         return p.chromium.launch_persistent_context(
             SESSION_DIR,
-            headless=False,
-            slow_mo=settings['slow_mo'],
-            accept_downloads=True
+            headless=headless,
+            slow_mo=0 if headless else settings['slow_mo'],
+            accept_downloads=True,
+            downloads_path=mailbox_downloads_dir(),  # NEU V2.28
+            **(HAR_SESSION.launch_options() if HAR_SESSION else {})  # NEU V2.38
         )
 
     try:
@@ -591,7 +2835,7 @@ def _launch_context_with_retry(p, settings):
             print(f"    2) Pfad in die Adressleiste kopieren und Enter")
             print(f"    3) Ordner löschen (Entf)")
             print(f"{'='*60}")
-            input("\nDrücke Enter zum Beenden ...")
+            wait_for_enter("\nDrücke Enter zum Beenden ...")
             sys.exit(1)
 
         # Einmaliger Neuversuch – kein weiterer Retry
@@ -603,703 +2847,2528 @@ def _launch_context_with_retry(p, settings):
             print(f"\n  Mögliche Ursachen:")
             print(f"  • Eine andere Instanz des Programms läuft noch")
             print(f"  • Chromium ist nicht korrekt in der EXE enthalten")
-            input("\nDrücke Enter zum Beenden ...")
+            wait_for_enter("\nDrücke Enter zum Beenden ...")
             sys.exit(1)
 
-# ==========================================================================================
-#
-# ========================================= START ==========================================
-#
-# ==========================================================================================
+# ========== NEU V2.34: Session-Ordner verkleinern ==========
+# Cache-Ordner des Chromium-Profils; Cookies, Local Storage, IndexedDB und
+# Preferences liegen woanders und bleiben erhalten (Anmeldung bleibt bestehen)
+SESSION_CACHE_DIRS = (
+    'Cache', 'Code Cache', 'GPUCache', 'DawnCache', 'DawnGraphiteCache', 'DawnWebGPUCache',
+    'GrShaderCache', 'GraphiteDawnCache', 'ShaderCache', 'component_crx_cache', 'Crashpad',
+    os.path.join('Service Worker', 'CacheStorage'), os.path.join('Service Worker', 'ScriptCache'),
+)
+SESSION_STATE_FILE = "session_state.json"
 
-def run_downloader():
-    global DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX # NEU V2.04b / V2.13
-    settings = load_config()
-    KEYWORDS = settings['keywords']
-    PDF_BUTTON_NAMES = settings['pdf_button_names']
-    WKN_MAPPING = settings['wkn_mapping']  # ========== NEU V2.02 ==========
-    
-    # NEU V2.09 fehlerhaften Pfad abfangen
-    DOWNLOAD_DIR = resolve_and_prepare_download_dir(settings['download_dir'])
-    print(f"[v{__version__}] Zielordner: {DOWNLOAD_DIR}")
+def _dir_size(path):
+    """Größe eines Ordners in Bytes (rekursiv, ohne Symlinks zu folgen)"""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
 
-    # NEU V2.13: separates Mailbox-Verzeichnis (optional)
-    if settings['download_dir_mailbox']:
-        DOWNLOAD_DIR_MAILBOX = resolve_and_prepare_download_dir(settings['download_dir_mailbox'])
-        print(f"[v{__version__}] Zielordner Mailbox:       {DOWNLOAD_DIR_MAILBOX}")
+def session_cache_dirs():
+    """Vorhandene Cache-Ordner im Session-Ordner und in dessen Profilen (Default, Profile 1, ...)"""
+    bases = [SESSION_DIR]
+    try:
+        bases += [e.path for e in os.scandir(SESSION_DIR)
+                  if e.is_dir() and (e.name == 'Default' or e.name.startswith('Profile '))]
+    except OSError:
+        return []
+    return [os.path.join(base, name) for base in bases for name in SESSION_CACHE_DIRS
+            if os.path.isdir(os.path.join(base, name))]
+
+def compact_session(budget_mb, force=False):
+    """
+    Leert die Cache-Ordner der Session, größte zuerst, bis sie wieder unter
+    budget_mb liegt. force=True leert alle Cache-Ordner unabhängig vom Budget.
+    Darf nur laufen, solange kein Browser die Session benutzt.
+
+    Returns:
+        True wenn verkleinert wurde
+    """
+    if not os.path.isdir(SESSION_DIR) or (budget_mb <= 0 and not force):
+        return False
+    budget = budget_mb * 1024 * 1024
+    before = _dir_size(SESSION_DIR)
+    if before <= budget and not force:
+        return False
+
+    size = before
+    cleared = 0
+    caches = sorted(((path, _dir_size(path)) for path in session_cache_dirs()), key=lambda c: c[1], reverse=True)
+    for path, cache_size in caches:
+        if size <= budget and not force:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        size -= cache_size
+        cleared += 1
+    after = _dir_size(SESSION_DIR)
+    print(f"[v{__version__}] Session-Ordner verkleinert: {before / 1048576:.1f} MB -> {after / 1048576:.1f} MB "
+          f"({cleared} Cache-Ordner geleert, Budget {budget_mb} MB)")
+    if after > budget:
+        print(f"  ⚠ Session-Ordner bleibt über dem Budget, der Rest sind keine Cache-Daten")
+    log_event('session_compact', before=before, after=after, cleared=cleared)
+    return True
+
+def report_launch_time(seconds, compacted):
+    """Browserstart merken; nach dem Verkleinern mit dem letzten Start davor vergleichen"""
+    path = os.path.join(STATE_DIR, SESSION_STATE_FILE)
+    state = _read_json(path, {})
+    previous = state.get('launch_seconds')
+    if compacted and previous:
+        print(f"[v{__version__}] Browserstart: {seconds:.2f}s (vor dem Verkleinern: {previous:.2f}s)")
     else:
-        DOWNLOAD_DIR_MAILBOX = DOWNLOAD_DIR
+        print(f"[v{__version__}] Browserstart: {seconds:.2f}s")
+    log_event('phase', phase='launch', seconds=round(seconds, 2), compacted=compacted)
+    state['launch_seconds'] = round(seconds, 3)
+    try:
+        _write_json_atomic(path, state)
+    except OSError as e:
+        print(f"  ⚠ Session-Status konnte nicht gespeichert werden: {e}")
+
+def measure_launch(p, settings):
+    """Dauer eines Browserstarts ohne Fenster bis zur ersten leeren Seite"""
+    start = time.perf_counter()
+    context = _launch_context_with_retry(p, settings, headless=True)
+    try:
+        if not context.pages:
+            context.new_page()
+        return time.perf_counter() - start
+    finally:
+        context.close()
 
+def compact_session_command(settings):
+    """--compact-session: alle Cache-Ordner leeren, Browserstart vorher und nachher messen"""
     with sync_playwright() as p:
-        context = _launch_context_with_retry(p, settings)
-        page = context.new_page()
+        before = measure_launch(p, settings)
+        compact_session(settings['session_budget_mb'], force=True)
+        after = measure_launch(p, settings)
+    print(f"[v{__version__}] Browserstart: vorher {before:.2f}s, nachher {after:.2f}s")
+# ========== ENDE NEU V2.34 ==========
 
-        # NEU V2.10.6  HTTP-Cache leeren, Cookies/Session bleiben erhalten
-        page.route("**/*", lambda route: route.continue_(headers={
-            **route.request.headers,
-            "Cache-Control": "no-cache",
-            "Pragma": "no-cache"
-        }))
-        
+# ========== NEU V2.26: adaptive Ratensteuerung der Downloads ==========
+def parse_retry_after(value):
+    """Retry-After Header (Sekunden oder HTTP-Datum) in Sekunden, höchstens 120"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
         try:
-            page.goto(TARGET_URL, wait_until="commit")
-        except Exception as e:
-            print(f"  ✗ Fehler beim Öffnen der Seite: {e}")
-            context.close()
-            return
-        
-        # wichtig damit ein ggf benötigter Login erkannt wird
-        page.wait_for_load_state("networkidle")
+            from email.utils import parsedate_to_datetime
+            retry_at = parsedate_to_datetime(value)
+            seconds = (retry_at - datetime.now(retry_at.tzinfo)).total_seconds()
+        except Exception:
+            return None
+    return min(max(seconds, 0.0), 120.0)
 
-        if "login" in page.url:
-            # NEU V2.08 Versuche Auto-Fill falls aktiviert
-            if settings['use_saved_credentials']:
-                username, password = ensure_credentials(settings['use_saved_credentials'])
-                
-                if username and password:
-                    try:
-                        print("  → Fülle Login-Daten aus...")
-                        page.wait_for_selector("#username", timeout=10000)
-                        page.fill('#username', username, timeout=2000)
-                        page.fill('#password', password, timeout=1000)
-                        # Login-Button klicken
-                        page.get_by_role("button", name="Login").click() # Selektor über Text
-                        print("  ✓ Login-Daten ausgefüllt - Bitte 2FA in der App bestätigen")
-                    except Exception as e:
-                        print(f"  ⚠ Auto-Fill fehlgeschlagen: {e}")
-                        print("  → Bitte komplett manuell einloggen")
+class AdaptiveRateController:
+    """
+    Steuert die Parallelität der PDF-Downloads nach dem AIMD-Prinzip:
+    Bei stabiler Latenz steigt die erlaubte Parallelität schrittweise bis
+    max_concurrency, bei 429/5xx wird sie halbiert und alle Downloads pausieren
+    (Retry-After des Servers, sonst exponentieller Backoff), bei deutlich
+    steigender Latenz sinkt sie um eins.
+    """
+
+    THROTTLE_STATUS = (429, 502, 503, 504)
+    MAX_RETRIES = 3
+
+    def __init__(self, max_concurrency, start=2):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = min(start, self.max_concurrency)
+        self.peak_limit = self.limit
+        self.cond = threading.Condition()
+        self.active = 0
+        self.pause_until = 0.0
+        self.backoff = 1.0
+        self.latency = None  # gleitender Mittelwert
+        self.good_streak = 0
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def acquire(self):
+        """Wartet auf einen freien Platz und eine ggf. laufende Pause"""
+        with self.cond:
+            while True:
+                pause = self.pause_until - time.monotonic()
+                if pause > 0:
+                    self.cond.wait(pause)
+                elif self.active >= self.limit:
+                    self.cond.wait()
                 else:
-                    print("  → Bitte manuell einloggen")
+                    break
+            self.active += 1
+        return time.perf_counter()
+
+    def release(self, start, status, retry_after=None):
+        """
+        Wertet eine Antwort aus (status None = Verbindungsfehler).
+        Returns: Wartezeit in Sekunden, wenn die Anfrage gedrosselt wurde, sonst None
+        """
+        latency = time.perf_counter() - start
+        with self.cond:
+            self.active -= 1
+            self.requests += 1
+            wait = None
+            if status in self.THROTTLE_STATUS:
+                self.throttled += 1
+                self.limit = max(1, self.limit // 2)
+                self.good_streak = 0
+                wait = parse_retry_after(retry_after)
+                if wait is None:
+                    wait = self.backoff
+                    self.backoff = min(self.backoff * 2, 60.0)
+                self.pause_until = max(self.pause_until, time.monotonic() + wait)
+                self.wait_seconds += wait
+            elif status is None:
+                self.limit = max(1, self.limit - 1)
+                self.good_streak = 0
             else:
-                print("Warte auf manuellen Login (2FA)...")
-            
-            # Warte auf erfolgreichen Login (wie bisher)
-            try:
-                page.wait_for_url(re.compile(r".*/(cockpit|transactions|dashboard|broker)/.*"), timeout=90000) # 90 Sekunden warten
-                print("  ✓ Login erkannt.")
-            except Exception as e:
-                if "Timeout" in type(e).__name__ or "Timeout" in str(e):
-                    # NEU V2.09 
-                    print(" ⚠  TIMEOUT: Kein Login innerhalb von 1 Minute")
-                    context.close()
-                    input(" ⏸  Drücke Enter zum Beenden...")
-                    sys.exit(1)
+                self.backoff = 1.0
+                if self.latency is not None and latency > 2 * self.latency and self.limit > 1:
+                    self.limit -= 1
+                    self.good_streak = 0
                 else:
-                    print(f"  ⚠ Login-Warnung: {e}")
-                    
-            # Debug V2.09 STOP zum manuellen Debuggen
-            # page.pause()
-
-            page.wait_for_load_state("networkidle")
-            handle_popups(page)
-            
-            if TARGET_URL not in page.url:
-                print("  -> Navigiere zu Transaktionen...")
-                try:
-                    page.goto(TARGET_URL)
-                    #handle_popups(page)
-                except Exception as e:
-                    print(f"  ⚠ Navigation fehlgeschlagen: {e}")
-        
-        try:
-            page.wait_for_load_state("networkidle")
-        except Exception as e:
-            print(f"  ⚠ Warnung beim Laden: {e}")
-        
-        time.sleep(settings['page_load_wait'])
+                    self.good_streak += 1
+                    if self.good_streak >= self.limit and self.limit < self.max_concurrency:
+                        self.limit += 1
+                        self.peak_limit = max(self.peak_limit, self.limit)
+                        self.good_streak = 0
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.cond.notify_all()
+            return wait
 
-        # Start Filter Auftragstyp
-        print(f"[v{__version__}] Setze Auftragstyp Filter...")
-        try:
-            filter_button = page.get_by_text("Auftragstyp").first
-            filter_button.wait_for(state="visible", timeout=10000)
-            filter_button.click()
-            print("  ✓ Filter-Dropdown geöffnet")
-            
+    def run(self, send):
+        """
+        Führt send() unter Ratensteuerung aus und wiederholt gedrosselte Anfragen.
+        send() gibt (Antwort, Status, Retry-After Header) zurück.
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            start = self.acquire()
             try:
-                dropdown = page.locator("[role='listbox'], [role='menu'], div[class*='dropdown'][class*='menu']").first
-                for keyword in KEYWORDS:
-                    try:
-                        dropdown.get_by_text(keyword, exact=False).first.click(timeout=1000, no_wait_after=True)
-                        print(f"  ✓ Filter gesetzt: {keyword}")
-                    except Exception as e:
-                        print(f"  ⚠ Filter '{keyword}' nicht gefunden: {e}")
-                
-                page.keyboard.press("Escape")
-                print("  ✓ Filter angewendet")
-            except Exception as e:
-                print(f"  ⚠ Dropdown-Fehler: {e}")
-        except Exception as e:
-            print(f"  ⚠ Filter-Button nicht gefunden: {e}")
-            print("  → Fahre ohne Filter fort")
+                response, status, retry_after = send()
+            except Exception:
+                self.release(start, None)
+                raise
+            wait = self.release(start, status, retry_after)
+            if wait is None or attempt == self.MAX_RETRIES:
+                return response
+            print(f"  ⚠ Server drosselt (HTTP {status}), neuer Versuch in {wait:.1f}s")
+        return response
 
-        # Ende Filter Auftragstyp
-        page.wait_for_load_state("networkidle", timeout=10000)
+    def summary(self):
+        minutes = max(time.perf_counter() - self.started, 1e-6) / 60
+        return {
+            'requests': self.requests,
+            'per_minute': round(self.requests / minutes, 1),
+            'concurrency': self.limit,
+            'peak_concurrency': self.peak_limit,
+            'throttled': self.throttled,
+            'wait_seconds': round(self.wait_seconds, 1),
+        }
 
-        # NEU V2.10.3 Start Filter Status (nur ausgeführte Transaktionen)
-        if settings['only_executed']:
-            print(f"[v{__version__}] Setze Status-Filter...")
-            try:
-                status_filter_button = page.get_by_text("Status").first
-                status_filter_button.wait_for(state="visible", timeout=10000)
-                status_filter_button.click()
-                print("  ✓ Status-Filter-Dropdown geöffnet")
-                
-                try:
-                    status_dropdown = page.locator("[role='listbox'], [role='menu'], div[class*='dropdown'][class*='menu']").first
-                    # Klicke auf die "Ausgeführt" Checkbox
-                    try:
-                        status_dropdown.locator("#EXECUTED-label").first.click(timeout=1000, no_wait_after=True)
-                        print(f"  ✓ Status-Filter gesetzt: Ausgeführt")
-                    except Exception as e:
-                        print(f"  ⚠ Status-Filter 'Ausgeführt' nicht gefunden: {e}")
-                    
-                    page.keyboard.press("Escape")
-                    print("  ✓ Status-Filter angewendet")
-                except Exception as e:
-                    print(f"  ⚠ Status-Dropdown-Fehler: {e}")
+RATE_CONTROLLER = None  # wird in run_downloader bzw. je Backfill-Prozess gesetzt
+
+def create_rate_controller(settings):
+    if not settings['adaptive_rate']:
+        return None
+    # Browser-Downloads laufen nacheinander, parallel nur der HTTP-Pool
+    return AdaptiveRateController(settings['http_pool_size'] if settings['http_download'] else 1)
+
+def rate_controlled(send):
+    """send() mit Ratensteuerung ausführen, falls aktiv. Returns: Antwort"""
+    if RATE_CONTROLLER is None:
+        return send()[0]
+    return RATE_CONTROLLER.run(send)
+# ========== ENDE NEU V2.26 ==========
+
+# ========== NEU V2.14: PDF-Download per HTTP-Client ==========
+def export_storage_state(context):
+    """
+    Exportiert Cookies und Local Storage des eingeloggten Browser-Kontexts.
+
+    Returns:
+        dict im Playwright storage_state Format oder None bei Fehler
+    """
+    try:
+        return context.storage_state()
+    except Exception as e:
+        print(f"  ⚠ Session-Export fehlgeschlagen: {e}")
+        return None
+
+class HttpPdfDownloader:
+    """
+    Lädt PDFs außerhalb des Browsers über eine requests-Session mit
+    Keep-Alive Connection-Pool. Die Downloads laufen in Worker-Threads,
+    während der Browser mit den nächsten Transaktionen weiterarbeitet.
+    """
+
+    def __init__(self, storage_state, pool_size, user_agent=None):
+        # requests erst hier importieren (nur wenn benötigt)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        for cookie in storage_state.get('cookies', []):
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain'), path=cookie.get('path', '/')
+            )
+
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="pdf-http")
+        self.lock = threading.Lock()
+        self.futures = []
+        self.pending_paths = set()
+        self.downloaded = 0
+        self.failed = 0
+        self.total_bytes = 0
+
+    def is_pending(self, target_path):
+        """True, wenn für diesen Zielpfad bereits ein Download eingereiht ist"""
+        with self.lock:
+            return target_path in self.pending_paths
+
+    def submit(self, pdf_url, target_path, on_result=None):
+        """
+        Reiht einen Download ein. on_result(result, info) wird im Worker-Thread
+        mit dem Ergebnis wie bei download_pdf_in_browser aufgerufen.
+        """
+        with self.lock:
+            self.pending_paths.add(target_path)
+        self.futures.append(self.executor.submit(self._fetch, pdf_url, target_path, on_result))
+
+    def _fetch(self, pdf_url, target_path, on_result=None):
+        try:
+            result, info = self._download(pdf_url, target_path)
+        finally:
+            with self.lock:
+                self.pending_paths.discard(target_path)
+        if on_result:
+            try:
+                on_result(result, info)
             except Exception as e:
-                print(f"  ⚠ Status-Filter-Button nicht gefunden: {e}")
-                print("  → Fahre ohne Status-Filter fort")
-        else:
-            print(f"[v{__version__}] Status-Filter deaktiviert (only_executed = False)")
-        # Ende Filter Status
-        page.wait_for_load_state("networkidle", timeout=10000)
+                print(f"  ⚠ [HTTP] Ergebnis konnte nicht vermerkt werden: {e}")
+        return result != 'failed'
 
+    def _download(self, pdf_url, target_path):
+        """
+        Returns:
+            tuple: ('saved', Bytes) | ('exists', None) | ('duplicate', Bytes) | ('failed', Fehlertext)
+        """
+        file_name = os.path.basename(target_path)
         try:
-            all_items = page.locator("div[role='button'], button").all()
+            # NEU V2.26 Parallelität und Pausen über die Ratensteuerung
+            def send():
+                response = self.session.get(pdf_url, timeout=60)
+                return response, response.status_code, response.headers.get('Retry-After')
+            response = rate_controlled(send)
+            if response.status_code != 200:
+                print(f"  ✗ HTTP-Fehler: Status {response.status_code} ({file_name})")
+                return 'failed', f"http_{response.status_code}"
+
+            pdf_bytes = response.content
+            if pdf_bytes[:4] != b'%PDF':
+                print(f"  ✗ Fehler: Keine gültige PDF-Datei ({file_name})")
+                return 'failed', 'invalid_pdf'
+
+            stored = write_file_no_clobber(target_path, pdf_bytes)
+            if stored == 'exists':
+                print(f"  -> ✓ Bereits vorhanden: {file_name}")
+                return 'exists', None
+            if stored == 'duplicate':
+                return 'duplicate', len(pdf_bytes)
+            remember_validators(target_path, response.headers, len(pdf_bytes))  # NEU V2.27
+
+            with self.lock:
+                self.downloaded += 1
+                self.total_bytes += len(pdf_bytes)
+            print(f"  -> ✓ [HTTP] Gespeichert: {file_name} ({len(pdf_bytes) / 1024:.1f} KB)")
+            return 'saved', len(pdf_bytes)
         except Exception as e:
-            print(f"  ✗ Fehler beim Laden der Transaktionen: {e}")
-            context.close()
+            print(f"  ✗ [HTTP] Download fehlgeschlagen ({file_name}): {e}")
+            return 'failed', 'http_exception'
+
+    def finish(self):
+        """
+        Wartet auf alle eingereihten Downloads und schließt den Pool.
+        NEU V2.35 höchstens bis zum Zeitlimit der Transaktions-Phase; danach
+        werden noch nicht gestartete Downloads verworfen (zählen als
+        fehlgeschlagen), laufende Downloads werden noch abgeschlossen.
+
+        Returns:
+            tuple: (heruntergeladen, fehlgeschlagen)
+        """
+        expired = False
+        cancelled = 0
+        started = []  # nach Ablauf des Zeitlimits nicht mehr abbrechbar (laufend oder fertig)
+        for future in self.futures:
+            if not expired:
+                remaining = RUN_DEADLINE.remaining('transactions')
+                try:
+                    if not future.result(timeout=None if remaining is None else max(0, remaining)):
+                        self.failed += 1
+                    continue
+                except FutureTimeout:
+                    expired = True
+            if future.cancel():
+                cancelled += 1
+            else:
+                started.append(future)
+        if cancelled:
+            self.failed += cancelled
+            RUN_DEADLINE.cancel('transactions', cancelled, "HTTP-Download(s)")
+        # laufende Downloads schreiben noch ihre Datei -> Session erst danach schließen
+        self.executor.shutdown(wait=True)
+        for future in started:
+            if not future.result():
+                self.failed += 1
+        self.session.close()
+        return self.downloaded, self.failed
+
+def create_http_downloader(context, page, settings):
+    """
+    Erstellt den HTTP-Downloader aus dem storage_state des Browser-Kontexts.
+    Gibt None zurück, wenn die Option deaktiviert oder nicht verfügbar ist;
+    dann wird wie bisher im Browser heruntergeladen.
+    """
+    if not settings['http_download']:
+        return None
+
+    storage_state = export_storage_state(context)
+    if not storage_state:
+        print("  → PDFs werden im Browser geladen")
+        return None
+
+    try:
+        user_agent = page.evaluate("() => navigator.userAgent")
+    except Exception:
+        user_agent = None
+
+    try:
+        downloader = HttpPdfDownloader(storage_state, settings['http_pool_size'], user_agent)
+    except ImportError:
+        print("  ✗ FEHLER: 'requests' Modul nicht installiert!")
+        print("  → Bitte ausführen: pip install requests")
+        print("  → PDFs werden im Browser geladen")
+        return None
+
+    print(f"  ✓ HTTP-Download aktiv ({settings['http_pool_size']} Verbindungen)")
+    return downloader
+
+def finish_http_downloads(http_downloader):
+    """
+    Wartet auf den HTTP-Downloader (höchstens bis zum Zeitlimit der
+    Transaktions-Phase) und gibt (heruntergeladen, fehlgeschlagen) zurück
+    """
+    if not http_downloader:
+        return 0, 0
+    remaining = RUN_DEADLINE.remaining('transactions')
+    limit = f" (höchstens {max(0, remaining):.0f}s)" if remaining is not None else ""
+    print(f"\n[v{__version__}] Warte auf laufende HTTP-Downloads{limit}...")
+    downloaded, failed = http_downloader.finish()
+    print(f"[v{__version__}] HTTP-Downloads abgeschlossen: {downloaded} gespeichert, {failed} fehlgeschlagen "
+          f"({http_downloader.total_bytes / 1024 / 1024:.1f} MB)")
+    return downloaded, failed
+# ========== ENDE NEU V2.14 ==========
+
+# ========== NEU V2.15: Headless-Start und Laufzeit-Report ==========
+def _open_start_page(context):
+    """
+    Öffnet eine neue Seite mit der Transaktionsliste und wartet, bis ein ggf.
+    benötigter Login erkannt werden kann. Gibt None zurück, wenn die Seite
+    nicht geöffnet werden konnte.
+    """
+    page = context.new_page()
+
+    # NEU V2.10.6  HTTP-Cache leeren, Cookies/Session bleiben erhalten
+    # NEU V2.38 nicht bei Wiedergabe: Seiten-Routen haben Vorrang vor route_from_har
+    if not (HAR_SESSION and HAR_SESSION.mode == 'replay'):
+        page.route("**/*", lambda route: route.continue_(headers={
+            **route.request.headers,
+            "Cache-Control": "no-cache",
+            "Pragma": "no-cache"
+        }))
+
+    try:
+        page.goto(TARGET_URL, wait_until="commit")
+    except Exception as e:
+        print(f"  ✗ Fehler beim Öffnen der Seite: {e}")
+        return None
+
+    # wichtig damit ein ggf benötigter Login erkannt wird
+    page.wait_for_load_state("networkidle")
+    return page
+
+class PeakMemorySampler:
+    """
+    Ermittelt im Hintergrund den Spitzen-Speicherverbrauch (RSS) des Skripts
+    inklusive aller Browser-Prozesse. Benötigt das optionale Modul psutil,
+    ohne psutil wird kein Speicherwert ermittelt.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _sample(self):
+        total = 0
+        try:
+            total = self._process.memory_info().rss
+            for child in self._process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except Exception:
+                    continue
+        except Exception:
+            pass
+        self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if self._process is None:
             return
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
 
-        targets = collect_targets(all_items, KEYWORDS, settings['max_transactions'])
+    def stop(self):
+        """Beendet die Messung. Returns: Spitzenwert in Bytes oder None ohne psutil"""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._sample()
+        return self.peak
 
-        if not targets:
-            print("  ℹ️ Keine relevanten Dokumente gefunden, warte kurz und versuche erneut...")
-            time.sleep(settings['transaction_wait'])
-            try:
-                all_items = page.locator("div[role='button'], button").all()
-            except Exception:
-                all_items = []
-            targets = collect_targets(all_items, KEYWORDS, settings['max_transactions'])
+def report_run_metrics(run_mode, seconds, peak_bytes, rate=None, outcome='ok'):
+    """
+    Gibt Laufzeit und Spitzen-Speicher aus und speichert sie je Modus in
+    STATE_DIR, damit headless und headed Läufe verglichen werden können.
+    Jeder Modus (auch headless→headed, inventory) hat einen eigenen Eintrag.
+    NEU V2.26: rate enthält die Kennzahlen der Ratensteuerung.
+    outcome: 'ok' oder Grund eines vorzeitigen Endes (z.B. aborted, no_targets)
+    """
+    metrics_path = os.path.join(STATE_DIR, "run_metrics.json")
+    try:
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+    except Exception:
+        metrics = {}
 
-        # ========== NEU V2.04: Scroll-Logik aktivieren ==========
-        if len(targets) < settings['max_transactions']:
-            total_visible = scroll_and_load_transactions(page, KEYWORDS, settings['max_transactions'], settings)
-            # Nach dem Scrollen erneut alle Targets sammeln
-            try:
-                all_items = page.locator("div[role='button'], button").all()
-                targets = collect_targets(all_items, KEYWORDS, settings['max_transactions'])
-            except Exception as e:
-                print(f"  ⚠ Fehler beim erneuten Sammeln nach Scroll: {e}")
-        # ========== ENDE NEU V2.04 ==========
+    metrics[run_mode] = {
+        'seconds': round(seconds, 1),
+        'peak_mb': round(peak_bytes / 1024 / 1024, 1) if peak_bytes else None,
+        'rate': rate,
+        'outcome': outcome,
+        'timestamp': datetime.now().isoformat(timespec='seconds')
+    }
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(metrics_path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, indent=2)
+    except Exception as e:
+        print(f"  ⚠ Metriken konnten nicht gespeichert werden: {e}")
+
+    memory_str = f"{peak_bytes / 1024 / 1024:.0f} MB" if peak_bytes else "n/a (pip install psutil)"
+    outcome_str = f" (vorzeitig beendet: {outcome})" if outcome != 'ok' else ""
+    print(f"[v{__version__}] Modus: {run_mode}, Laufzeit: {seconds:.1f} s, Spitzen-Speicher: {memory_str}{outcome_str}")
+    if rate and rate['requests']:
+        print(f"[v{__version__}] Download-Rate: {rate['per_minute']:.1f}/min, Parallelität {rate['concurrency']} "
+              f"(max. {rate['peak_concurrency']}), gedrosselt: {rate['throttled']}x, Pausen: {rate['wait_seconds']:.0f} s")
+    for mode, last in metrics.items():
+        if mode != run_mode:
+            peak_str = f"{last['peak_mb']:.0f} MB" if last.get('peak_mb') else "n/a"
+            print(f"[v{__version__}]   letzter {mode:8} Lauf: {last['seconds']:.1f} s, {peak_str} ({last['timestamp']})")
+# ========== ENDE NEU V2.15 ==========
+
+# ========== NEU V2.16: Mailbox-Phase als eigene Funktion, optional parallel ==========
+def download_mailbox_documents(page, settings, navigate=True):
+    """
+    Lädt die Dokumente aus der Mailbox herunter.
+
+    Args:
+        page: Seite im eingeloggten Kontext
+        settings: Einstellungen aus load_config()
+        navigate: False, wenn die Mailbox bereits geöffnet ist
 
-        print(f"[v{__version__}] Suche beendet. {len(targets)} relevante Dokumente gefunden.")
+    Returns:
+        tuple: (heruntergeladen, übersprungen)
+    """
+    docs_downloaded = 0
+    docs_skipped = 0
+    date_range = date_range_from_settings(settings)  # NEU V2.25
+    if date_range.from_date:
+        settings = dict(settings, max_documents=DATE_RANGE_MAX)
+
+    print(f"\n[v{__version__}] ...suche nach Dokumenten (max. {settings['max_documents']})")
+    
+    try:
+        if navigate:
+            print(f"  -> Navigiere zur Mailbox...")
+            page.goto(TARGET_URL2)
+            # sicherstellen das die Seite geladen ist
+            time.sleep(2)
         
-        downloaded = skipped = 0
-        for target_idx, (idx, zeit, full_text, keyword) in enumerate(targets):
-            file_name = "unknown_transaction.pdf" 
+        try:
+            page.wait_for_load_state("networkidle")
+        except Exception as e:
+            print(f"  ⚠ Warnung beim Laden der Mailbox: {e}")
+        
+        time.sleep(settings['page_load_wait'])
+        print(f"  ✓ Mailbox geladen")
+        
+        # V2.10.2 neue Scrolllogik - Hole Gesamthöhe und sichtbare Höhe dynamisch
+        try:
+            scroll_container = page.locator('div[role="list"][aria-label="Mailbox"] > div').first
+            total_height = scroll_container.evaluate("element => element.scrollHeight")
+            viewport_height = scroll_container.evaluate("element => element.clientHeight")
+            
+            #print(f"  Gesamthöhe: {total_height}px, sichtbar: {viewport_height}px")
+            print(f"  ℹ️ max. mögliche Anzahl Dokumente ca. {int(total_height/60)}")
+            
+            # Schätze Dokumente pro Viewport (~9-10 Dokumente)
+            docs_per_viewport = 7
+            
+            # Berechne benötigte Scroll-Steps basierend auf max_documents
+            needed_steps = (settings['max_documents'] // docs_per_viewport) + 2  # +2 als Puffer
+            max_possible_steps = int(total_height / viewport_height) + 1
+            
+            scroll_steps = min(needed_steps, max_possible_steps)
+            
+            #print(f"  Benötigte Scroll-Steps für {settings['max_documents']} Dokumente: {scroll_steps}")
+        except Exception as e:
+            print(f"  ⚠ Fehler: {e}")
+            scroll_steps = (settings['max_documents'] // 9) + 2  # Fallback
+            viewport_height = 800
+        
+        # Download-Loop
+        processed_ids = set()  # Vermeide Duplikate
+        
+        # Scrolle in Viewport-großen Schritten
+        RUN_DEADLINE.begin('mailbox')  # NEU V2.35
+        for step in range(scroll_steps):
+            if docs_downloaded + docs_skipped >= settings['max_documents']:
+                print(f"  ✓ Maximum erreicht ({settings['max_documents']})")
+                break
+
+            # NEU V2.35 Zeitlimit des Laufs bzw. Budget der Mailbox
+            if RUN_DEADLINE.expired('mailbox'):
+                RUN_DEADLINE.cancel('mailbox', None, "Dokumente")
+                break
+
+            # NEU V2.25 ältere Dokumente als from_date erreicht
+            if date_range.passed:
+                print(f"  ✓ Beginn des Zeitraums erreicht ({date_range.from_date})")
+                break
+            
+            scroll_pos = step * viewport_height
+            
             try:
-                print(f"\n[{target_idx+1}/{len(targets)}] {full_text[:50]}...")
+                scroll_container.evaluate(f"element => element.scrollTop = {scroll_pos}")
+                time.sleep(0.5)
                 
-                # Transaktion öffnen
-                try:
-                    clicked = False
-                    normalized_target = normalize_text(full_text)
-                    items = page.locator("div[role='button'], button")
-                    count = items.count()
-
-                    for i in range(count):
-                        item = items.nth(i)
+                #print(f"  Scroll-Position: {scroll_pos}/{total_height}px")
+                
+                # Verarbeite alle aktuell sichtbaren Dokumente
+                if not settings['only_new_docs']:
+                    # Alle Dokumente mit Download-Symbol
+                    visible_docs = page.locator('[data-mailbox-item-subject]').filter(
+                        has=page.locator('[data-testid="mailbox-download"]')
+                    ).all()
+                else:
+                    # Nur neue Dokumente (mit Neu-Kennzeichnung)
+                    candidate_rows = page.locator('[data-mailbox-item-subject]').filter(
+                        has=page.locator('[data-testid="mailbox-download"]')
+                    )
+                    
+                    visible_docs = []
+                    for i in range(candidate_rows.count()):
+                        row = candidate_rows.nth(i)
                         try:
-                            item_zeit = item.get_attribute('aria-labelledby')
-                            ui_text = normalize_text(item.inner_text())
-                            if ui_text != normalized_target:
-                                continue
-                            if item_zeit != zeit:
-                                continue
-                            type_element = item.get_by_text(keyword, exact=True).first
-                            type_element.scroll_into_view_if_needed(timeout=2000)
-                            time.sleep(0.1)
-                            type_element.click(timeout=settings['click_transaction_timeout'])
-                            clicked = True
-                            print("  ✓ Transaktion geöffnet")
-                            break
+                            status_cell = row.locator('div.MuiGrid-grid-xs-1').last
+                            indicator = status_cell.locator('*')
+                            if indicator.count() > 0 and indicator.first.is_visible():
+                                visible_docs.append(row)
                         except Exception:
                             continue
-
-                    if not clicked:
-                        print("  ✗ Transaktion nicht gefunden, überspringe")
-                        save_error_screenshot(page, DOWNLOAD_DIR, full_text, "missing_transaction")
-                        continue
-                except Exception as e:
-                    print(f"  ✗ Klick fehlgeschlagen: {e}")
-                    save_error_screenshot(page, DOWNLOAD_DIR, full_text, "missing_transaction")
-                    continue
-                
-                time.sleep(settings['transaction_wait'])
                 
-                # PDF-Button finden
-                pdf_btn = None
-                found_button_name = None
-                for btn_text in PDF_BUTTON_NAMES:
+                # Download jedes sichtbaren Dokuments
+                for row in visible_docs:
+                    # Prüfe ob bereits verarbeitet
                     try:
-                        pdf_btn = page.get_by_text(btn_text).first
-                        pdf_btn.wait_for(state="visible", timeout=settings['pdf_button_timeout'])
-                        found_button_name = btn_text
-                        print(f"  ✓ PDF-Button gefunden: '{found_button_name}'")
-                        break
-                    except Exception as e:
+                        doc_id = row.get_attribute('data-testid')
+                        if doc_id in processed_ids:
+                            continue
+                        processed_ids.add(doc_id)
+                    except:
                         continue
-                
-                if not pdf_btn or not found_button_name:
-                    print(f"  ✗ Kein PDF-Button gefunden (versucht: {', '.join(PDF_BUTTON_NAMES)})")
-                    wp_extract = re.sub(r'\(.*?\)', '', full_text)
-                    pattern = r'-?\d+[\.,]\d{2}.*$'
-                    wp_extract = re.sub(pattern, '', wp_extract).strip()
-                    if wp_extract.startswith(keyword):
-                        wp_extract = wp_extract[len(keyword):].strip()
-                    save_error_screenshot(page, DOWNLOAD_DIR, full_text, "missing_pdf", None, wp_extract)
-                    page.keyboard.press("Escape")
-                    continue
+                    
+                    if docs_downloaded + docs_skipped >= settings['max_documents']:
+                        break
+                    if RUN_DEADLINE.expired('mailbox'):
+                        break
 
-                # === NEU V2.06 ==============================================
-                # VORABPAUSCHALE: Spezielles Element klicken
-                # ============================================================
-                is_vorabpauschale = (keyword == "Steuern" and found_button_name == "Vorabpauschale")
-                
-                if is_vorabpauschale:
-                    print("  -> Vorabpauschale erkannt, verwende speziellen Selektor...")
+                    # NEU V2.25 Zeitraum anhand des Datums in der Zeile
+                    if date_range:
+                        try:
+                            position = date_range.classify(parse_list_date(row.inner_text()))
+                        except Exception:
+                            position = 'inside'
+                        if position == 'newer':
+                            continue
+                        if position == 'older':
+                            break
+                    
                     try:
-                        # Spezial-Element für Vorabpauschale finden
-                        vp_element = page.locator('[data-testid="value-Vorabpauschale"]').first
-                        vp_element.wait_for(state="visible", timeout=2000)
+                        print(f"\n[Dokument {docs_downloaded + docs_skipped + 1}/{settings['max_documents']}]")
                         
-                        # PDF-Tab öffnen
-                        with context.expect_page(timeout=settings['pdf_tab_timeout']) as new_page_info:
-                            vp_element.click(timeout=settings['pdf_button_timeout'])
-                        new_tab = new_page_info.value
-                        pdf_url = new_tab.url
-                        print(f"  ✓ PDF-URL aus Tab: {pdf_url[:60]}...")
-                        new_tab.close()
-                    except Exception as e:
-                        print(f"  ✗ Vorabpauschale-Element nicht gefunden: {e}")
+                        # Suche das Download-Element innerhalb dieser Zeile
+                        download_element = None
                         try:
-                            page.keyboard.press("Escape")
-                        except:
-                            pass
-                        continue
-                
-                # ============================================================
-                # STANDARD: Normaler PDF-Button
-                # ============================================================
-                else:
-                    pdf_url = None
-                    try:
-                        print(f"  -> Öffne PDF-Tab...")
-                        with context.expect_page(timeout=settings['pdf_tab_timeout']) as new_page_info:
-                            pdf_btn.click(timeout=settings['pdf_button_timeout'])
-                        new_tab = new_page_info.value
-                        pdf_url = new_tab.url
-                        print(f"  ✓ PDF-URL aus Tab: {pdf_url[:60]}...")
-                        new_tab.close()
-                    except Exception as e:
-                        print(f"  ✗ PDF-Tab konnte nicht geöffnet werden: {e}")
+                            download_element = row.locator('[data-testid="mailbox-download"]').first
+                            download_element.wait_for(state="visible", timeout=settings['pdf_button_timeout'])
+                            print(f"  ✓ Download-Symbol gefunden")
+                        except Exception as e:
+                            print(f"  ✗ Download-Symbol nicht gefunden: {e}")
+                            continue
+                        
+                        # Klick auf das Download-Element
                         try:
-                            page.keyboard.press("Escape")
-                        except:
-                            pass
-                        continue
-                
-                # ============================================================
-                # AB HIER: Gemeinsame Logik für alle PDFs
-                # ============================================================
-                
-                # Dateiname erstellen
-                url_without_params = pdf_url.split("?")[0] if pdf_url else ""
-                
-                # Vorabpauschale: Spezielle Namenslogik
-                if is_vorabpauschale:
-                    vp_text = full_text
-                    if vp_text.startswith("Steuern "):
-                        vp_text = vp_text[8:].strip()
-                    
-                    isin_match = re.search(r'\(([A-Z]{2}[A-Z0-9]{10})\)', vp_text)
-                    isin_str = isin_match.group(1) if isin_match else "UNKNOWN"
-                    identifier_str = convert_isin_to_wkn(isin_str, WKN_MAPPING)
+                            print(f"  -> Öffne Dokument...")
+                            
+                            # Fange den direkten Download ab
+                            download_info = None
+                            try:
+                                with page.expect_download(timeout=settings['pdf_tab_timeout']) as download_info_promise:
+                                    # V2.10.8 JavaScript Klick auf DOM statt Playwright Mausklick
+                                    clickable = row.locator('[data-testid="mailbox-download"]').first
+                                    page.evaluate("el => el.click()", clickable.element_handle())
+                                
+                                download_info = download_info_promise.value
+                                print(f"  ✓ Download gestartet: {download_info.suggested_filename}")
+                                
+                            except Exception as download_error:
+                                print(f"  ✗ Download-Event nicht gefangen: {download_error}")
+                                continue
+                            
+                        except Exception as e:
+                            print(f"  ✗ Dokument konnte nicht geöffnet werden: {e}")
+                            continue
+                        
+                        # Original-Dateiname ermitteln
+                        final_file_name = download_info.suggested_filename
+                        if not final_file_name.lower().endswith('.pdf'):
+                            final_file_name += '.pdf'
+                        
+                        # NEU V2.25 Zeitraum zusätzlich am Datum im Dateinamen prüfen
+                        name_date = re.match(r'^(\d{4})-?(\d{2})-?(\d{2})', final_file_name)
+                        if date_range and name_date and date_range.classify("-".join(name_date.groups())) != 'inside':
+                            print(f"  -> Außerhalb des Zeitraums: {final_file_name}")
+                            try:
+                                download_info.delete()
+                            except Exception:
+                                pass
+                            if date_range.passed:
+                                break
+                            continue
+
+                        # NEU V2.10.5 optional auch Dokument-Dateinamen als YYYY-MM-DD formatieren
+                        if not settings['use_original_filename']:
+                            final_file_name = re.sub(r'^(\d{4})(\d{2})(\d{2})', r'\1-\2-\3', final_file_name)
+                        
+                        # Zielpfad festlegen (NEU V2.29 nach archive_layout, Prüfung über den Index)
+                        mailbox_index = archive_index(DOWNLOAD_DIR_MAILBOX)
+                        existing_path = mailbox_index.find(final_file_name)
+                        aliased = not existing_path and mailbox_index.contains(final_file_name)  # NEU V2.30
+                        target_path = existing_path or archive_path(DOWNLOAD_DIR_MAILBOX, final_file_name, None,
+                                                                    settings['archive_layout'])
+                        
+                        # NEU V2.36 nur noch im S3-Bucket (keep_local aus) -> wie alte Datei behandeln
+                        in_bucket = not existing_path and S3_SINK is not None and S3_SINK.exists(target_path)
+
+                        # Duplikatsprüfung mit Datumsprüfung
+                        if existing_path or aliased or in_bucket:
+                            
+                            # Datum der existierenden Datei prüfen
+                            age_seconds = time.time() - os.path.getmtime(target_path) if existing_path else float('inf')
+                            
+                            if age_seconds > 600:  # Älter als 10 Minuten
+                                # Alte Datei = Duplikat, überspringen
+                                print(f"  -> ✓ Bereits vorhanden: {final_file_name}")
+                                docs_skipped += 1
+                                log_event('document', status='exists', file_name=final_file_name)
+                                # Download-Objekt verwerfen
+                                try:
+                                    temp_path = download_info.path()
+                                    if temp_path and os.path.exists(temp_path):
+                                        os.remove(temp_path)
+                                except Exception:
+                                    pass
+                                continue
+                            else:
+                                # Frische Datei = anderes Dokument mit gleichem Namen
+                                base_name = final_file_name[:-4]  # ohne .pdf
+                                counter = 1
+                                while mailbox_index.contains(final_file_name):
+                                    final_file_name = f"{base_name}_{counter}.pdf"
+                                    counter += 1
+                                target_path = archive_path(DOWNLOAD_DIR_MAILBOX, final_file_name, None,
+                                                           settings['archive_layout'])
+                                print(f"  -> Gleichnamiges Dokument, speichere als: {final_file_name}")
+                        
+                        # PDF herunterladen
+                        try:
+                            print("  -> Lade PDF herunter...")
+                            
+                            # NEU V2.28 Download liegt im selben Dateisystem -> umbenennen statt kopieren
+                            temp_path = download_info.path()
+                            os.makedirs(os.path.dirname(target_path), exist_ok=True)  # NEU V2.29
+
+                            # NEU V2.30 gleicher Inhalt bereits in der Ablage (z.B. als Transaktions-PDF)?
+                            digest = ContentIndex._hash_file(temp_path) if CONTENT_INDEX else None
+                            if digest and CONTENT_INDEX.store_duplicate(target_path, digest, os.path.getsize(temp_path)):
+                                download_info.delete()  # gezählt in CONTENT_INDEX.duplicates
+                                continue
+
+                            try:
+                                os.replace(temp_path, target_path)
+                            except OSError:
+                                download_info.save_as(target_path)
+
+                            # NEU V2.31 auch Mailbox-Dokumente auf PDF-Struktur prüfen, beschädigte erneut laden
+                            valid, reason = check_pdf_structure(target_path)
+                            if not valid:
+                                print(f"  ✗ Dokument beschädigt ({reason}), zum erneuten Laden vorgemerkt: {final_file_name}")
+                                log_event('document', status='corrupt', file_name=final_file_name, reason=reason)
+                                if REDOWNLOAD_QUEUE is not None:
+                                    quarantine_file(target_path, reason, REDOWNLOAD_QUEUE)
+                                    REDOWNLOAD_QUEUE.save()
+                                continue
+
+                            note_archived(target_path)
+                            if digest:
+                                CONTENT_INDEX.add(target_path, digest, os.path.getsize(target_path))
+                            file_size = os.path.getsize(target_path) / 1024
+                            
+                            print(f"  -> ✓ Gespeichert: {final_file_name} ({file_size:.1f} KB)")
+                            docs_downloaded += 1
+                            log_event('document', status='done', file_name=final_file_name,
+                                      bytes=int(file_size * 1024))
+                            
+                        except Exception as e:
+                            print(f"  ✗ Download fehlgeschlagen: {e}")
+                            # Aufräumen falls Download-Datei teilweise existiert
+                            try:
+                                temp_path = download_info.path()
+                                if temp_path and os.path.exists(temp_path):
+                                    os.remove(temp_path)
+                            except Exception:
+                                pass
                     
-                    wp_name = re.sub(r'\(.*?\)', '', vp_text)
-                    wp_name = wp_name.replace("Vorabpauschale:", "").strip()
-                    wp_name_clean = "_".join(wp_name.split())
-                    wp_name_clean = re.sub(r'[^\w\s-]', '_', wp_name_clean)
+                    except Exception as e:
+                        print(f"  ✗ FEHLER bei Dokument: {e}")
+                        continue
                     
-                    # Original-Dateiname vom Server holen
-                    original_name = filename_from_url(url_without_params)
-                    if original_name:
-                        # Original-Name ohne .pdf Extension
-                        original_base = original_name.rsplit('.pdf', 1)[0] if original_name.endswith('.pdf') else original_name
-                        final_file_name = f"{original_base}-{identifier_str}-{wp_name_clean}.pdf"
-                    else:
-                        # Fallback falls kein Original-Name verfügbar
-                        current_year = datetime.now().year
-                        date_str = f"{current_year}-01-02"
-                        final_file_name = f"{date_str}-Vorabpauschale-{identifier_str}-{wp_name_clean}.pdf"
-                
+            except Exception as e:
+                print(f"  ⚠ Fehler bei Scroll-Position {scroll_pos}: {e}")
+                continue
+        
+        print(f"\n[v{__version__}] Dokumente-Download abgeschlossen: {docs_downloaded} heruntergeladen, {docs_skipped} übersprungen")
+        
+    except Exception as e:
+        print(f"  ✗ Fehler beim Mailbox-Zugriff: {e}")
+
+    return docs_downloaded, docs_skipped
+
+# ========== NEU V2.28: Download-Ordner des Browsers neben der Mailbox ==========
+def mailbox_downloads_dir():
+    """
+    Download-Ordner des Browsers innerhalb des Mailbox-Ordners. Liegt er im
+    selben Dateisystem wie das Ziel, wird ein fertiger Download nur noch
+    umbenannt statt kopiert.
+    """
+    path = os.path.join(DOWNLOAD_DIR_MAILBOX, ".scalable_downloads")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cleanup_mailbox_downloads():
+    """Entfernt Reste abgebrochener Downloads aus früheren Läufen"""
+    path = os.path.join(DOWNLOAD_DIR_MAILBOX, ".scalable_downloads")
+    removed = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        print(f"[v{__version__}] {removed} unvollständige Download-Datei(en) entfernt")
+# ========== ENDE NEU V2.28 ==========
+
+def _mailbox_worker(storage_state, settings, result):
+    """
+    Thread-Funktion der parallelen Mailbox-Phase. Die Sync-API von Playwright
+    ist an ihren Thread gebunden, daher startet der Thread eine eigene
+    Playwright-Instanz mit einem unsichtbaren Browser, der die Session
+    (storage_state) des eingeloggten Kontexts übernimmt.
+    """
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True, downloads_path=mailbox_downloads_dir())  # NEU V2.28
+            try:
+                context = browser.new_context(storage_state=storage_state, accept_downloads=True)
+                page = context.new_page()
+                page.goto(TARGET_URL2)
+                page.wait_for_load_state("networkidle")
+                if "login" in page.url:
+                    print("  ⚠ Parallele Mailbox: Session nicht übernommen (Login verlangt)")
+                    return
+                result['counts'] = download_mailbox_documents(page, settings, navigate=False)
+                context.close()
+            finally:
+                browser.close()
+    except Exception as e:
+        print(f"  ⚠ Parallele Mailbox fehlgeschlagen: {e}")
+
+def start_parallel_mailbox(context, settings):
+    """
+    Startet die Mailbox-Phase parallel zur Transaktions-Phase.
+
+    Returns:
+        tuple: (thread, result) oder (None, None) wenn nicht aktiv
+    """
+    if not (settings['get_documents'] and settings['parallel_mailbox']):
+        return None, None
+
+    storage_state = export_storage_state(context)
+    if not storage_state:
+        return None, None
+
+    result = {}
+    thread = threading.Thread(target=_mailbox_worker, args=(storage_state, settings, result),
+                              name="mailbox", daemon=True)
+    thread.start()
+    print(f"[v{__version__}] Mailbox-Phase läuft parallel...")
+    return thread, result
+# ========== ENDE NEU V2.16 ==========
+
+# ========== NEU V2.18: Download-Schritt und Checkpoint ==========
+# ========== NEU V2.27: Validatoren (ETag/Last-Modified) je PDF ==========
+class PdfValidators:
+    """
+    Merkt sich je gespeichertem PDF die Antwort-Validatoren des Servers
+    (ETag, Last-Modified, Länge), damit vorhandene Dateien später per
+    bedingter Anfrage geprüft werden können. Gespeichert in STATE_DIR.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(STATE_DIR, "pdf_validators.json")
+        self.lock = threading.Lock()
+        self.entries = _read_json(self.path, {})
+        self.changed = {}
+
+    @staticmethod
+    def _key(target_path):
+        # Dateiname als Schlüssel, unabhängig vom Unterordner (archive_layout)
+        return os.path.basename(target_path)
+
+    def get(self, target_path):
+        with self.lock:
+            return self.entries.get(self._key(target_path))
+
+    def remember(self, target_path, headers, length):
+        """headers: Antwort-Header mit kleingeschriebenen Namen"""
+        entry = {
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'length': length,
+            'checked': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self.lock:
+            self.entries[self._key(target_path)] = entry
+            self.changed[self._key(target_path)] = entry
+
+    def save(self):
+        """Schreibt die Änderungen; andere Prozesse (Backfill) werden zusammengeführt"""
+        with self.lock:
+            if not self.changed:
+                return
+            merged = _read_json(self.path, {})
+            merged.update(self.changed)
+            self.changed = {}
+        try:
+            _write_json_atomic(self.path, merged)
+        except OSError as e:
+            print(f"  ⚠ PDF-Validatoren konnten nicht gespeichert werden: {e}")
+
+PDF_VALIDATORS = None  # wird in run_downloader bzw. je Backfill-Prozess gesetzt
+
+def remember_validators(target_path, headers, length):
+    if PDF_VALIDATORS is not None:
+        PDF_VALIDATORS.remember(target_path, {k.lower(): v for k, v in headers.items()}, length)
+
+def revalidate_pdf(page, pdf_url, target_path):
+    """
+    Prüft ein vorhandenes PDF per bedingter Anfrage (If-None-Match /
+    If-Modified-Since). Nur geänderte Dokumente werden übertragen; die
+    bisherige Fassung wird nach STATE_DIR/replaced verschoben.
+
+    Returns:
+        'unchanged' | 'updated' | 'failed'
+    """
+    known = PDF_VALIDATORS.get(target_path) if PDF_VALIDATORS else None
+    headers = {}
+    if known and known.get('etag'):
+        headers['If-None-Match'] = known['etag']
+    if known and known.get('last_modified'):
+        headers['If-Modified-Since'] = known['last_modified']
+
+    try:
+        def send():
+            response = page.request.get(pdf_url, headers=headers)
+            return response, response.status, response.headers.get('retry-after')
+        response = rate_controlled(send)
+        if response.status == 304:
+            return 'unchanged'
+        if response.status != 200:
+            print(f"  ⚠ Prüfung fehlgeschlagen: HTTP {response.status}")
+            return 'failed'
+
+        pdf_bytes = response.body()
+        if pdf_bytes[:4] != b'%PDF':
+            return 'failed'
+        remember_validators(target_path, response.headers, len(pdf_bytes))
+        with open(target_path, 'rb') as f:
+            if f.read() == pdf_bytes:
+                return 'unchanged'
+
+        # Neue Fassung: alte Datei aufheben und ersetzen
+        replaced_dir = os.path.join(STATE_DIR, "replaced")
+        os.makedirs(replaced_dir, exist_ok=True)
+        stem, ext = os.path.splitext(os.path.basename(target_path))
+        shutil.copy2(target_path, os.path.join(replaced_dir, f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"))
+        tmp_path = target_path + ".part"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, target_path)
+        return 'updated'
+    except Exception as e:
+        print(f"  ⚠ Prüfung fehlgeschlagen: {e}")
+        return 'failed'
+# ========== ENDE NEU V2.27 ==========
+
+def download_pdf_in_browser(page, pdf_url, target_path):
+    """
+    Lädt ein PDF mit der Session des Browsers (page.request) und speichert es.
+
+    Returns:
+        tuple: ('saved', Bytes) | ('exists', None) | ('duplicate', Bytes) | ('failed', Fehlertext)
+    """
+    try:
+        # NEU V2.26 Pausen bei Drosselung über die Ratensteuerung
+        def send():
+            response = HAR_SESSION.fetch(page, pdf_url) if HAR_SESSION else page.request.get(pdf_url)  # NEU V2.38
+            return response, response.status, response.headers.get('retry-after')
+        response = rate_controlled(send)
+
+        if response.status != 200:
+            print(f"  ✗ HTTP-Fehler: Status {response.status}")
+            return 'failed', f"http_{response.status}"
+
+        content_type = response.headers.get('content-type', '').lower()
+        if 'pdf' not in content_type:
+            print(f"  ⚠ Warnung: Content-Type ist kein PDF: {content_type}")
+
+        pdf_bytes = response.body()
+
+        if pdf_bytes[:4] != b'%PDF':
+            print("  ✗ Fehler: Keine gültige PDF-Datei")
+            return 'failed', "invalid_pdf"
+
+        # NEU V2.17 atomar und ohne Überschreiben (parallele Backfill-Shards)
+        stored = write_file_no_clobber(target_path, pdf_bytes)
+        if stored != 'saved':
+            return stored, (len(pdf_bytes) if stored == 'duplicate' else None)
+
+        remember_validators(target_path, response.headers, len(pdf_bytes))  # NEU V2.27
+        return 'saved', len(pdf_bytes)
+
+    except Exception as e:
+        print(f"  ✗ Download fehlgeschlagen: {e}")
+        return 'failed', "download_error"
+
+def _read_json(path, default=None):
+    """Liest eine JSON-Datei, gibt default zurück wenn sie fehlt oder defekt ist"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+def _write_json_atomic(path, data):
+    """Schreibt eine JSON-Datei über eine Temp-Datei, damit sie nie halb geschrieben ist"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+def _target_key(target):
+    """Eindeutiger Schlüssel einer Transaktion (idx ändert sich beim Nachladen der Liste)"""
+    _, zeit, text, keyword = target
+    return f"{zeit}|{keyword}|{normalize_text(text)}"
+
+class RunCheckpoint:
+    """
+    Fortschritt eines Transaktions-Durchlaufs in STATE_DIR/checkpoint.json:
+    die Zielliste aus collect_targets, die aufgelösten PDF-URLs und der
+    Status je Transaktion (pending, resolved, done, failed).
+    Bricht ein Lauf ab, setzt der nächste bei der ersten offenen Transaktion fort.
+    Statuswechsel werden gesammelt und höchstens alle SAVE_INTERVAL Sekunden
+    geschrieben (bei vielen Transaktionen sonst quadratischer Schreibaufwand),
+    der Rest beim Beenden des Programms.
+    """
+
+    SAVE_INTERVAL = 5
+
+    def __init__(self, signature, entries):
+        self.path = os.path.join(STATE_DIR, "checkpoint.json")
+        self.signature = signature
+        self.entries = entries
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.finished = False
+        self.saved_at = time.monotonic()
+        atexit.register(self.flush)  # auch bei Abbruch den letzten Stand sichern
+
+    @staticmethod
+    def _signature(settings):
+        # Nur bei gleichen Such-Einstellungen fortsetzen
+        return {
+            'keywords': settings['keywords'],
+            'only_executed': settings['only_executed'],
+            'use_original_filename': settings['use_original_filename'],
+            'from_date': settings['from_date'],  # NEU V2.25
+            'to_date': settings['to_date'],
+        }
+
+    @classmethod
+    def create(cls, settings, targets):
+        entries = {}
+        for target in targets:
+            entries.setdefault(_target_key(target), {'target': list(target), 'status': 'pending'})
+        checkpoint = cls(cls._signature(settings), entries)
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load_unfinished(cls, settings):
+        """Lädt den Checkpoint eines abgebrochenen Laufs oder None"""
+        data = _read_json(os.path.join(STATE_DIR, "checkpoint.json"))
+        if not data or data.get('signature') != cls._signature(settings):
+            return None
+        checkpoint = cls(data['signature'], data['entries'])
+        return checkpoint if checkpoint.open_targets() else None
+
+    def entry(self, target):
+        return self.entries.get(_target_key(target))
+
+    def update(self, target, **fields):
+        with self.lock:
+            self.entries.setdefault(_target_key(target), {'target': list(target)}).update(fields)
+            self.dirty = True
+            if time.monotonic() - self.saved_at >= self.SAVE_INTERVAL:
+                self._save()
+
+    def flush(self):
+        """Gesammelte Statuswechsel schreiben"""
+        with self.lock:
+            if self.dirty and not self.finished:
+                self._save()
+
+    def open_targets(self):
+        return [tuple(e['target']) for e in self.entries.values() if e.get('status') != 'done']
+
+    def all_resolved(self, targets):
+        return all((self.entry(t) or {}).get('pdf_url') for t in targets)
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        try:
+            _write_json_atomic(self.path, {
+                'version': __version__,
+                'updated': datetime.now().isoformat(timespec='seconds'),
+                'signature': self.signature,
+                'entries': self.entries,
+            })
+        except Exception as e:
+            print(f"  ⚠ Checkpoint konnte nicht gespeichert werden: {e}")
+
+    def finish(self):
+        """Lauf vollständig -> Checkpoint entfernen"""
+        with self.lock:
+            self.finished = True
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+# ========== ENDE NEU V2.18 ==========
+
+# ========== NEU V2.19: Retry-Queue für fehlgeschlagene Transaktionen ==========
+MAX_RETRY_ATTEMPTS = 10  # danach wird eine Transaktion aus der Queue entfernt
+
+class RetryQueue:
+    """
+    Fehlgeschlagene Transaktionen mit Grund und Anzahl der Versuche in
+    STATE_DIR/retry_queue.json. Sie werden am Ende des Laufs mit
+    exponentiellem Backoff wiederholt und in den nächsten Lauf übernommen.
+    Backfill-Shards sammeln nur im Speicher (persist=False), der Hauptprozess
+    übernimmt ihr Ergebnis mit merge().
+    """
+
+    def __init__(self, persist=True):
+        self.path = os.path.join(STATE_DIR, "retry_queue.json") if persist else None
+        self.entries = _read_json(self.path, {}) if persist else {}
+        self.resolved = set()  # in diesem Lauf erledigte Schlüssel
+        self.lock = threading.Lock()
+
+    def entry(self, target):
+        return self.entries.get(_target_key(target))
+
+    def targets(self):
+        return [tuple(e['target']) for e in self.entries.values()]
+
+    def record(self, target, reason='unknown', **fields):
+        with self.lock:
+            key = _target_key(target)
+            entry = self.entries.setdefault(key, {'target': list(target), 'attempts': 0})
+            entry['attempts'] += 1
+            entry['reason'] = reason
+            entry['last_attempt'] = datetime.now().isoformat(timespec='seconds')
+            entry.update(fields)
+            if entry['attempts'] >= MAX_RETRY_ATTEMPTS:
+                print(f"  ⚠ Nach {entry['attempts']} Versuchen aufgegeben ({reason}): {target[2][:50]}")
+                del self.entries[key]
+            self.save()
+
+    def update(self, target, **fields):
+        with self.lock:
+            entry = self.entries.get(_target_key(target))
+            if entry:
+                entry.update(fields)
+                self.save()
+
+    def resolve(self, target):
+        with self.lock:
+            key = _target_key(target)
+            self.resolved.add(key)
+            if self.entries.pop(key, None):
+                self.save()
+
+    def merge(self, failed, resolved):
+        """Ergebnis eines Backfill-Shards übernehmen: erledigte entfernen, Fehlschläge zählen"""
+        with self.lock:
+            for key in resolved:
+                self.entries.pop(key, None)
+            self.save()
+        for entry in failed:
+            fields = {k: v for k, v in entry.items() if k not in ('target', 'attempts', 'reason', 'last_attempt')}
+            self.record(tuple(entry['target']), entry.get('reason', 'unknown'), **fields)
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            if self.entries:
+                _write_json_atomic(self.path, self.entries)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+        except Exception as e:
+            print(f"  ⚠ Retry-Queue konnte nicht gespeichert werden: {e}")
+
+def retry_failed_targets(page, context, settings, retry_queue, checkpoint=None, list_loader=None):
+    """
+    Wiederholt die Transaktionen der Retry-Queue bis zu retry_attempts mal,
+    die Wartezeit verdoppelt sich von Runde zu Runde.
+
+    Returns:
+        tuple: (heruntergeladen, übersprungen)
+    """
+    downloaded = skipped = 0
+    for attempt in range(1, settings['retry_attempts'] + 1):
+        targets = retry_queue.targets()
+        if not targets:
+            break
+        # NEU V2.35 keine Wiederholung nach Zeitlimit oder Circuit-Breaker
+        if RUN_DEADLINE.expired('transactions'):
+            RUN_DEADLINE.cancel('transactions', len(targets), "Wiederholung(en)")
+            break
+        wait = settings['retry_backoff'] * 2 ** (attempt - 1)
+        print(f"\n[v{__version__}] Wiederholung {attempt}/{settings['retry_attempts']}: "
+              f"{len(targets)} fehlgeschlagene Transaktion(en), warte {wait:.0f} s...")
+        time.sleep(wait)
+        round_downloaded, round_skipped = process_transactions(page, context, targets, settings, None,
+                                                               checkpoint, list_loader, retry_queue)
+        downloaded += round_downloaded
+        skipped += round_skipped
+    return downloaded, skipped
+# ========== ENDE NEU V2.19 ==========
+
+# ========== NEU V2.17: Transaktions-Phase als Funktionen (auch für Backfill-Shards) ==========
+# ========== NEU V2.23: Filterzustand speichern und wiederherstellen ==========
+FILTER_STATE_FILE = "filter_state.json"
+FILTER_DROPDOWN_SELECTOR = "[role='listbox'], [role='menu'], div[class*='dropdown'][class*='menu']"
+
+def _filter_signature(keywords, settings):
+    return "|".join(sorted(k.lower() for k in keywords)) + f"|executed={settings['only_executed']}"
+
+def _read_filter_storage(page):
+    """Liest Einträge aus session-/localStorage, die nach Filterzustand aussehen"""
+    try:
+        return page.evaluate("""() => {
+            const result = {};
+            for (const [name, store] of [['session', sessionStorage], ['local', localStorage]]) {
+                for (let i = 0; i < store.length; i++) {
+                    const key = store.key(i);
+                    if (/filter/i.test(key)) result[name + ':' + key] = store.getItem(key);
+                }
+            }
+            return result;
+        }""")
+    except Exception:
+        return {}
+
+def save_filter_state(page, keywords, settings, storage_before, url_before):
+    """
+    Merkt sich, wie die App den gesetzten Filter abbildet (URL-Parameter oder
+    Storage-Einträge), damit der nächste Lauf ihn direkt wiederherstellen kann.
+    Die URL nur, wenn sich ihre Parameter durch das Filtern geändert haben.
+    """
+    query = urlparse(page.url).query
+    url = page.url if query and query != urlparse(url_before).query else None
+    storage = {k: v for k, v in _read_filter_storage(page).items() if storage_before.get(k) != v}
+    if not url and not storage:
+        return
+    path = os.path.join(STATE_DIR, FILTER_STATE_FILE)
+    states = _read_json(path, {})
+    states[_filter_signature(keywords, settings)] = {'url': url, 'storage': storage}
+    try:
+        _write_json_atomic(path, states)
+    except OSError:
+        pass
+
+def restore_filter_state(page, keywords, settings):
+    """
+    Stellt einen gespeicherten Filterzustand direkt wieder her.
+    Returns: True wenn wiederhergestellt
+    """
+    path = os.path.join(STATE_DIR, FILTER_STATE_FILE)
+    states = _read_json(path, {})
+    state = states.get(_filter_signature(keywords, settings))
+    if not state:
+        return False
+    try:
+        if state.get('storage'):
+            page.evaluate("""(entries) => {
+                for (const [key, value] of Object.entries(entries)) {
+                    const [store, name] = [key.slice(0, key.indexOf(':')), key.slice(key.indexOf(':') + 1)];
+                    (store === 'session' ? sessionStorage : localStorage).setItem(name, value);
+                }
+            }""", state['storage'])
+        if state.get('url'):
+            page.goto(state['url'], wait_until="commit")
+        else:
+            page.reload(wait_until="commit")
+        page.wait_for_load_state("networkidle", timeout=10000)
+        page.get_by_text("Auftragstyp").first.wait_for(state="visible", timeout=10000)
+        mismatch = _filter_mismatch(page, keywords, settings)
+        if not mismatch:
+            return True
+        print(f"  ⚠ Gespeicherter Filter passt nicht ({mismatch}), setze Filter neu")
+    except Exception as e:
+        print(f"  ⚠ Gespeicherter Filter nicht wiederherstellbar: {e}")
+
+    # veralteter Zustand: verwerfen und ungefiltert neu laden, damit das Dropdown nichts abwählt
+    states.pop(_filter_signature(keywords, settings), None)
+    try:
+        _write_json_atomic(path, states)
+    except OSError:
+        pass
+    try:
+        page.evaluate("""(keys) => {
+            for (const key of keys) {
+                const [store, name] = [key.slice(0, key.indexOf(':')), key.slice(key.indexOf(':') + 1)];
+                (store === 'session' ? sessionStorage : localStorage).removeItem(name);
+            }
+        }""", list(state.get('storage') or {}))
+        page.goto(TARGET_URL, wait_until="commit")
+        page.wait_for_load_state("networkidle", timeout=10000)
+    except Exception as e:
+        print(f"  ⚠ Seite konnte nicht neu geladen werden: {e}")
+    return False
+
+def _filter_selection(page, button_text):
+    """
+    Öffnet ein Filter-Dropdown und liest die ausgewählten Einträge.
+    Returns: (Texte der ausgewählten Einträge, Text des ganzen Dropdowns)
+    """
+    page.get_by_text(button_text).first.click(timeout=5000)
+    try:
+        dropdown = page.locator(FILTER_DROPDOWN_SELECTOR).first
+        dropdown.wait_for(state="visible", timeout=2000)
+        selected = dropdown.evaluate("""(menu) => Array.from(menu.querySelectorAll(
+            "[aria-checked='true'], [aria-selected='true'], input:checked")).map(el => {
+                const label = (el.labels && el.labels[0]) || el.closest('label, [role=option], [role=menuitemcheckbox], li') || el;
+                return ((label.innerText || el.getAttribute('aria-label') || '') + ' ' + (el.id || '')).trim();
+            })""")
+        return [text.lower() for text in selected], dropdown.inner_text().lower()
+    finally:
+        page.keyboard.press("Escape")
+
+def _filter_mismatch(page, keywords, settings):
+    """
+    Prüft den wiederhergestellten Filter an den ausgewählten Einträgen der Dropdowns.
+    Returns: None wenn er passt, sonst eine kurze Beschreibung der Abweichung
+    """
+    try:
+        selected, available = _filter_selection(page, "Auftragstyp")
+        wanted = {k for k in keywords if k.lower() in available}
+        chosen = {k for k in keywords if any(k.lower() in text for text in selected)}
+        extra = [text for text in selected if not any(k.lower() in text for k in keywords)]
+        if not wanted or chosen != wanted or extra:
+            return f"Auftragstyp: {', '.join(sorted(chosen)) or 'keiner'}"
+        if settings['only_executed']:
+            selected, _ = _filter_selection(page, "Status")
+            if not any('ausgeführt' in text or 'executed' in text for text in selected):
+                return "Status: nicht nur ausgeführte"
+    except Exception as e:
+        return f"nicht prüfbar: {e}"
+    return None
+
+def _select_filter_options(dropdown, keywords):
+    """
+    Liest die verfügbaren Einträge des Dropdowns einmal aus und klickt nur die
+    passenden an. Nicht vorhandene Begriffe kosten so keine Wartezeit mehr.
+    Returns: Anzahl gesetzter Filter
+    """
+    try:
+        dropdown.wait_for(state="visible", timeout=2000)
+        available = dropdown.inner_text().lower()
+    except Exception:
+        available = None
+
+    selected = 0
+    for keyword in keywords:
+        if available is not None and keyword.lower() not in available:
+            print(f"  ⚠ Filter '{keyword}' nicht im Dropdown vorhanden")
+            continue
+        try:
+            dropdown.get_by_text(keyword, exact=False).first.click(timeout=1000, no_wait_after=True)
+            print(f"  ✓ Filter gesetzt: {keyword}")
+            selected += 1
+        except Exception as e:
+            print(f"  ⚠ Filter '{keyword}' nicht gefunden: {e}")
+    return selected
+# ========== ENDE NEU V2.23 ==========
+
+def apply_transaction_filters(page, keywords, settings):
+    """Setzt die Filter "Auftragstyp" und (optional) "Status" in der Transaktionsliste"""
+    filter_start = time.perf_counter()
+    RUN_DEADLINE.begin('filter')  # NEU V2.35
+
+    # NEU V2.23 gespeicherten Filterzustand direkt wiederherstellen
+    if settings['restore_filter_state'] and restore_filter_state(page, keywords, settings):
+        seconds = time.perf_counter() - filter_start
+        print(f"[v{__version__}] ✓ Filter aus letztem Lauf wiederhergestellt ({seconds:.2f}s)")
+        log_event('phase', phase='filters', mode='restored', seconds=round(seconds, 2))
+        return
+    storage_before = _read_filter_storage(page) if settings['restore_filter_state'] else {}
+    url_before = page.url
+
+    # Start Filter Auftragstyp
+    print(f"[v{__version__}] Setze Auftragstyp Filter...")
+    try:
+        filter_button = page.get_by_text("Auftragstyp").first
+        filter_button.wait_for(state="visible", timeout=RUN_DEADLINE.timeout_ms('filter', 10000))
+        filter_button.click()
+        print("  ✓ Filter-Dropdown geöffnet")
+        
+        try:
+            dropdown = page.locator(FILTER_DROPDOWN_SELECTOR).first
+            _select_filter_options(dropdown, keywords)  # NEU V2.23
+            
+            page.keyboard.press("Escape")
+            print("  ✓ Filter angewendet")
+        except Exception as e:
+            print(f"  ⚠ Dropdown-Fehler: {e}")
+    except Exception as e:
+        print(f"  ⚠ Filter-Button nicht gefunden: {e}")
+        print("  → Fahre ohne Filter fort")
+
+    # Ende Filter Auftragstyp
+    page.wait_for_load_state("networkidle", timeout=RUN_DEADLINE.timeout_ms('filter', 10000))
+
+    # NEU V2.10.3 Start Filter Status (nur ausgeführte Transaktionen)
+    if settings['only_executed'] and RUN_DEADLINE.expired('filter'):
+        RUN_DEADLINE.cancel('filter', 1, "Status-Filter")  # NEU V2.35
+    elif settings['only_executed']:
+        print(f"[v{__version__}] Setze Status-Filter...")
+        try:
+            status_filter_button = page.get_by_text("Status").first
+            status_filter_button.wait_for(state="visible", timeout=RUN_DEADLINE.timeout_ms('filter', 10000))
+            status_filter_button.click()
+            print("  ✓ Status-Filter-Dropdown geöffnet")
+            
+            try:
+                status_dropdown = page.locator(FILTER_DROPDOWN_SELECTOR).first
+                # Klicke auf die "Ausgeführt" Checkbox
+                try:
+                    status_dropdown.locator("#EXECUTED-label").first.click(timeout=1000, no_wait_after=True)
+                    print(f"  ✓ Status-Filter gesetzt: Ausgeführt")
+                except Exception as e:
+                    print(f"  ⚠ Status-Filter 'Ausgeführt' nicht gefunden: {e}")
                 
-                # Standard: Normale Namenslogik
-                else:
-                    match = re.search(r'(\d{4}-\d{2}-\d{2})-.+?-([A-Z]{2}[A-Z0-9]{10})', url_without_params)
-                    date_str = match.group(1) if match else datetime.now().strftime("%Y-%m-%d")
-                    isin_str = match.group(2) if match else "UNKNOWN"
-                    
-                    if not match:
-                        print(f"  ⚠ Konnte Datum/ISIN nicht aus URL parsen: {url_without_params}")
-
-                    wp_name = re.sub(r'\(.*?\)', '', full_text)
-                    # V2.10.5 Tausenderbeträge korrekt behandeln
-                    full_text_norm = re.sub(r'(?<=\d)\.(?=\d)', '', full_text)
-                    betrag_m = re.findall(r'-?\d+,\d{2}', full_text_norm)
-                    betrag = betrag_m[-1].replace(',', '_') if betrag_m else "0_00"
-                    pattern2 = r'-?\d+[\.,]\d{2}.*$'
-                    wp_name = re.sub(pattern2, '', wp_name).strip()
-                    if wp_name.startswith(keyword): 
-                        wp_name = wp_name[len(keyword):].strip()
-                    wp_name_clean = "_".join(wp_name.replace("€", "").replace(",", "-").replace(":", "").replace("/", "-").split())
+                page.keyboard.press("Escape")
+                print("  ✓ Status-Filter angewendet")
+            except Exception as e:
+                print(f"  ⚠ Status-Dropdown-Fehler: {e}")
+        except Exception as e:
+            print(f"  ⚠ Status-Filter-Button nicht gefunden: {e}")
+            print("  → Fahre ohne Status-Filter fort")
+    else:
+        print(f"[v{__version__}] Status-Filter deaktiviert (only_executed = False)")
+    # Ende Filter Status
+    page.wait_for_load_state("networkidle", timeout=RUN_DEADLINE.timeout_ms('filter', 10000))
+
+    # NEU V2.23
+    if settings['restore_filter_state']:
+        save_filter_state(page, keywords, settings, storage_before, url_before)
+    seconds = time.perf_counter() - filter_start
+    print(f"[v{__version__}] Filter gesetzt in {seconds:.2f}s")
+    log_event('phase', phase='filters', mode='dropdown', seconds=round(seconds, 2))
+
+def load_transaction_targets(page, keywords, settings):
+    """
+    Sammelt die relevanten Transaktionen der gefilterten Liste und scrollt bei Bedarf nach.
+
+    Returns:
+        Liste von (idx, zeit, text, keyword) oder None bei Fehler
+    """
+    scan_start = time.perf_counter()
+    RUN_DEADLINE.begin('scan')  # NEU V2.35
+    date_range = date_range_from_settings(settings)  # NEU V2.25
+    if date_range:
+        print(f"[v{__version__}] Zeitraum: {date_range.from_date or '...'} bis {date_range.to_date or '...'}")
+    if date_range.from_date:
+        settings = dict(settings, max_transactions=DATE_RANGE_MAX)
+    try:
+        all_items = page.locator("div[role='button'], button").all()
+    except Exception as e:
+        print(f"  ✗ Fehler beim Laden der Transaktionen: {e}")
+        return None
+
+    targets = collect_targets(all_items, keywords, settings['max_transactions'], date_range)
+
+    if not targets:
+        print("  ℹ️ Keine relevanten Dokumente gefunden, warte kurz und versuche erneut...")
+        time.sleep(settings['transaction_wait'])
+        try:
+            all_items = page.locator("div[role='button'], button").all()
+        except Exception:
+            all_items = []
+        targets = collect_targets(all_items, keywords, settings['max_transactions'], date_range)
+
+    # ========== NEU V2.04: Scroll-Logik aktivieren ==========
+    if len(targets) < settings['max_transactions'] and not date_range.passed:
+        total_visible = scroll_and_load_transactions(page, keywords, settings['max_transactions'], settings, date_range)
+        # Nach dem Scrollen erneut alle Targets sammeln
+        try:
+            all_items = page.locator("div[role='button'], button").all()
+            targets = collect_targets(all_items, keywords, settings['max_transactions'], date_range)
+        except Exception as e:
+            print(f"  ⚠ Fehler beim erneuten Sammeln nach Scroll: {e}")
+    # ========== ENDE NEU V2.04 ==========
+
+    print(f"[v{__version__}] Suche beendet. {len(targets)} relevante Dokumente gefunden.")
+    log_event('phase', phase='scan', targets=len(targets), seconds=round(time.perf_counter() - scan_start, 2))
+    return targets
+
+def process_transactions(page, context, targets, settings, http_downloader=None, checkpoint=None,
+                         list_loader=None, retry_queue=None):
+    """
+    Öffnet die Transaktionen nacheinander, ermittelt die PDF-URL und speichert das PDF.
+    NEU V2.18: mit checkpoint wird der Fortschritt je Transaktion gespeichert,
+    list_loader lädt die Transaktionsliste erst, wenn wirklich geklickt werden muss.
+    NEU V2.19: Fehlschläge landen mit Grund in der retry_queue.
+
+    Returns:
+        tuple: (heruntergeladen, übersprungen)
+    """
+    PDF_BUTTON_NAMES = settings['pdf_button_names']
+    WKN_MAPPING = settings['wkn_mapping']  # ========== NEU V2.02 ==========
+
+    timing = {}
+    mark_lock = threading.RLock()  # NEU V2.14 Ergebnisse der HTTP-Downloads kommen aus Worker-Threads
+
+    def mark(target, status, timings=None, **fields):
+        """Status einer Transaktion im Checkpoint (NEU V2.18) und in der Retry-Queue (NEU V2.19) festhalten"""
+        with mark_lock:
+            _mark(target, status, timing if timings is None else timings, **fields)
+
+    def _mark(target, status, timing, **fields):
+        # NEU V2.21 Ergebnis mit Dauer der einzelnen Schritte ins Event-Log
+        now = time.perf_counter()
+        log_event('target', status=status, keyword=target[3], text=target[2][:80],
+                  seconds=round(now - timing.get('start', now), 3),
+                  phases={k: round(v, 3) for k, v in timing.items() if k != 'start'}, **fields)
+        if checkpoint:
+            checkpoint.update(target, status=status, **fields)
+        # NEU V2.35 gleiche Fehler in Folge zählen (Circuit-Breaker)
+        if status == 'failed':
+            RUN_DEADLINE.failure('transactions', fields.get('reason', 'unknown'))
+            flight_dump(fields.get('reason', 'unknown'))  # NEU V2.37
+        elif status == 'done':
+            RUN_DEADLINE.success('transactions')
+        if retry_queue:
+            if status == 'failed':
+                retry_queue.record(target, **fields)
+            elif status == 'done':
+                retry_queue.resolve(target)
+            elif 'pdf_url' in fields:
+                retry_queue.update(target, pdf_url=fields['pdf_url'])
+
+    def http_result(target, pdf_url, file_name):
+        """Ergebnis eines eingereihten HTTP-Downloads wie einen Browser-Download vermerken"""
+        submitted = {'start': time.perf_counter()}
+        def on_result(result, info):
+            if result == 'saved':
+                mark(target, 'done', timings=submitted, bytes=info)
+            elif result == 'exists':
+                mark(target, 'done', timings=submitted)
+            elif result == 'duplicate':
+                mark(target, 'done', timings=submitted, duplicate=True)
+            else:
+                mark(target, 'failed', timings=submitted, reason=info, pdf_url=pdf_url, file_name=file_name)
+        return on_result
+
+    records = TRANSACTION_PARSER.parse_batch(targets)  # NEU V2.33
+    RUN_DEADLINE.begin('transactions')  # NEU V2.35
+    limit = RUN_DEADLINE.timeout_ms
+    downloaded = skipped = 0
+    for target_idx, target in enumerate(targets):
+        idx, zeit, full_text, keyword = target
+        # NEU V2.35 Zeitlimit oder Circuit-Breaker: Rest bleibt für den nächsten Lauf offen
+        if RUN_DEADLINE.expired('transactions'):
+            RUN_DEADLINE.cancel('transactions', len(targets) - target_idx, "Transaktion(en)")
+            break
+        file_name = "unknown_transaction.pdf" 
+        timing.clear()
+        timing['start'] = time.perf_counter()
+        try:
+            print(f"\n[{target_idx+1}/{len(targets)}] {full_text[:50]}...")
+
+            # NEU V2.18 Fortsetzung: bereits aufgelöste PDF-URL ohne Klicks nutzen
+            entry = checkpoint.entry(target) if checkpoint else None
+            if not (entry and entry.get('pdf_url')) and retry_queue:
+                entry = retry_queue.entry(target)
+            if entry and entry.get('pdf_url') and entry.get('file_name'):
+                target_path = archive_path(DOWNLOAD_DIR, entry['file_name'], keyword, settings['archive_layout'])
+                if archive_index(DOWNLOAD_DIR).contains(entry['file_name']) or (S3_SINK and S3_SINK.exists(target_path)):
+                    print(f"  -> ✓ Bereits vorhanden: {entry['file_name']}")
+                    skipped += 1
+                    mark(target, 'done')
+                    continue
+                result, info = download_pdf_in_browser(page, entry['pdf_url'], target_path)
+                if result == 'saved':
+                    print(f"  -> ✓ Gespeichert (gespeicherte URL): {entry['file_name']} ({info / 1024:.1f} KB)")
+                    downloaded += 1
+                    mark(target, 'done')
+                    continue
+                if result == 'duplicate':
+                    mark(target, 'done', duplicate=True)
+                    continue
+                print("  → Gespeicherte PDF-URL nicht mehr gültig, öffne Transaktion")
+                mark(target, 'pending', pdf_url=None)
+
+            if list_loader:
+                list_loader()
+                list_loader = None
+            
+            # Transaktion öffnen
+            try:
+                clicked = False
+                normalized_target = normalize_text(full_text)
+                items = page.locator("div[role='button'], button")
+                count = items.count()
+
+                for i in range(count):
+                    item = items.nth(i)
+                    try:
+                        item_zeit = item.get_attribute('aria-labelledby')
+                        ui_text = normalize_text(item.inner_text())
+                        if ui_text != normalized_target:
+                            continue
+                        if item_zeit != zeit:
+                            continue
+                        type_element = item.get_by_text(keyword, exact=True).first
+                        type_element.scroll_into_view_if_needed(timeout=2000)
+                        time.sleep(0.1)
+                        type_element.click(timeout=limit('transactions', settings['click_transaction_timeout']))
+                        clicked = True
+                        timing['open'] = time.perf_counter() - timing['start']
+                        print("  ✓ Transaktion geöffnet")
+                        break
+                    except Exception:
+                        continue
+
+                if not clicked:
+                    print("  ✗ Transaktion nicht gefunden, überspringe")
+                    capture_error(page, full_text, "missing_transaction")
+                    mark(target, 'failed', reason='missing_transaction')
+                    continue
+            except Exception as e:
+                print(f"  ✗ Klick fehlgeschlagen: {e}")
+                capture_error(page, full_text, "missing_transaction")
+                mark(target, 'failed', reason='missing_transaction')
+                continue
+            
+            time.sleep(settings['transaction_wait'])
+            
+            # PDF-Button finden
+            pdf_btn = None
+            found_button_name = None
+            for btn_text in PDF_BUTTON_NAMES:
+                if RUN_DEADLINE.expired('transactions'):
+                    break
+                try:
+                    pdf_btn = page.get_by_text(btn_text).first
+                    pdf_btn.wait_for(state="visible", timeout=limit('transactions', settings['pdf_button_timeout']))
+                    found_button_name = btn_text
+                    print(f"  ✓ PDF-Button gefunden: '{found_button_name}'")
+                    break
+                except Exception as e:
+                    continue
+            
+            if not pdf_btn or not found_button_name:
+                print(f"  ✗ Kein PDF-Button gefunden (versucht: {', '.join(PDF_BUTTON_NAMES)})")
+                capture_error(page, full_text, "missing_pdf", None, records[target_idx].name)
+                mark(target, 'failed', reason='missing_pdf_button')
+                page.keyboard.press("Escape")
+                continue
+
+            # === NEU V2.06 ==============================================
+            # VORABPAUSCHALE: Spezielles Element klicken
+            # ============================================================
+            is_vorabpauschale = (keyword == "Steuern" and found_button_name == "Vorabpauschale")
+            
+            if is_vorabpauschale:
+                print("  -> Vorabpauschale erkannt, verwende speziellen Selektor...")
+                try:
+                    # Spezial-Element für Vorabpauschale finden
+                    vp_element = page.locator('[data-testid="value-Vorabpauschale"]').first
+                    vp_element.wait_for(state="visible", timeout=2000)
                     
-                    identifier_str = convert_isin_to_wkn(isin_str, WKN_MAPPING)
-                    final_file_name = f"{date_str}-{keyword[:4]}-{identifier_str}-{wp_name_clean}-{betrag}.pdf"
-                
-                # NEU V2.07 Dateinamen bereinigen
-                final_file_name = sanitize_filename(final_file_name)
-                
-                # Optional: Original-Dateiname verwenden (NICHT bei Vorabpauschale!)
-                if settings['use_original_filename'] and not is_vorabpauschale:
-                    original_name = filename_from_url(url_without_params)
-                    if original_name:
-                        final_file_name = original_name
+                    # PDF-Tab öffnen
+                    with context.expect_page(timeout=limit('transactions', settings['pdf_tab_timeout'])) as new_page_info:
+                        vp_element.click(timeout=limit('transactions', settings['pdf_button_timeout']))
+                    new_tab = new_page_info.value
+                    pdf_url = new_tab.url
+                    print(f"  ✓ PDF-URL aus Tab: {pdf_url[:60]}...")
+                    new_tab.close()
+                except Exception as e:
+                    print(f"  ✗ Vorabpauschale-Element nicht gefunden: {e}")
+                    mark(target, 'failed', reason='vorabpauschale_element')
+                    try:
+                        page.keyboard.press("Escape")
+                    except:
+                        pass
+                    continue
+            
+            # ============================================================
+            # STANDARD: Normaler PDF-Button
+            # ============================================================
+            else:
+                pdf_url = None
+                try:
+                    print(f"  -> Öffne PDF-Tab...")
+                    with context.expect_page(timeout=limit('transactions', settings['pdf_tab_timeout'])) as new_page_info:
+                        pdf_btn.click(timeout=limit('transactions', settings['pdf_button_timeout']))
+                    new_tab = new_page_info.value
+                    pdf_url = new_tab.url
+                    print(f"  ✓ PDF-URL aus Tab: {pdf_url[:60]}...")
+                    new_tab.close()
+                except Exception as e:
+                    print(f"  ✗ PDF-Tab konnte nicht geöffnet werden: {e}")
+                    mark(target, 'failed', reason='pdf_tab')
+                    try:
+                        page.keyboard.press("Escape")
+                    except:
+                        pass
+                    continue
+            
+            # ============================================================
+            # AB HIER: Gemeinsame Logik für alle PDFs
+            # ============================================================
+            
+            # Dateiname erstellen
+            url_without_params = pdf_url.split("?")[0] if pdf_url else ""
+            
+            # NEU V2.33 Namenslogik (inkl. Vorabpauschale und sanitize_filename) im TransactionTextParser
+            if not is_vorabpauschale and not TRANSACTION_PARSER.url_date_isin(pdf_url):
+                print(f"  ⚠ Konnte Datum/ISIN nicht aus URL parsen: {url_without_params}")
+            final_file_name = TRANSACTION_PARSER.file_name(records[target_idx], pdf_url, WKN_MAPPING, is_vorabpauschale)
+            
+            # Optional: Original-Dateiname verwenden (NICHT bei Vorabpauschale!)
+            if settings['use_original_filename'] and not is_vorabpauschale:
+                original_name = filename_from_url(url_without_params)
+                if original_name:
+                    final_file_name = original_name
 
-                target_path = os.path.join(DOWNLOAD_DIR, final_file_name)
+            # NEU V2.29 Ablage nach archive_layout, vorhandene Datei über den Index finden
+            # NEU V2.30 als Duplikat übersprungen -> vorhanden, aber ohne eigene Datei
+            existing_path = archive_index(DOWNLOAD_DIR).find(final_file_name)
+            aliased = not existing_path and archive_index(DOWNLOAD_DIR).contains(final_file_name)
+            target_path = existing_path or archive_path(DOWNLOAD_DIR, final_file_name, keyword, settings['archive_layout'])
+            timing['resolve'] = time.perf_counter() - timing['start'] - timing.get('open', 0)
+            mark(target, 'resolved', pdf_url=pdf_url, file_name=final_file_name)
 
-                # Duplikatsprüfung
-                if os.path.exists(target_path):
-                    print(f"  -> ✓ Bereits vorhanden: {final_file_name}")
-                    skipped += 1
-                    if settings['stop_at_first_duplicate']:
-                        print("  -> [STOP] Breche ab (Duplikat gefunden).")
+            # Duplikatsprüfung (NEU V2.14 inkl. eingereihter HTTP-Downloads, NEU V2.36 inkl. S3-Bucket)
+            in_bucket = not existing_path and S3_SINK is not None and S3_SINK.exists(target_path)
+            if existing_path or aliased or in_bucket or (http_downloader and http_downloader.is_pending(target_path)):
+                # NEU V2.27 vorhandene Datei beim Server auf neue Fassung prüfen
+                if settings['verify_remote'] and existing_path:
+                    if revalidate_pdf(page, pdf_url, target_path) == 'updated':
+                        print(f"  -> ✓ Neue Fassung gespeichert: {final_file_name}")
+                        downloaded += 1
+                        mark(target, 'done', updated=True)
                         try:
                             page.keyboard.press("Escape")
                         except Exception:
                             pass
-                        break
+                        continue
+                print(f"  -> ✓ Bereits vorhanden: {final_file_name}")
+                skipped += 1
+                mark(target, 'done')
+                if settings['stop_at_first_duplicate'] and not settings['verify_remote']:
+                    print("  -> [STOP] Breche ab (Duplikat gefunden).")
                     try:
                         page.keyboard.press("Escape")
                     except Exception:
                         pass
-                    continue
-
-                # PDF herunterladen
+                    break
                 try:
-                    print("  -> Lade PDF herunter...")
-                    response = page.request.get(pdf_url)
-
-                    if response.status != 200:
-                        print(f"  ✗ HTTP-Fehler: Status {response.status}")
-                        page.keyboard.press("Escape")
-                        continue
-
-                    content_type = response.headers.get('content-type', '').lower()
-                    if 'pdf' not in content_type:
-                        print(f"  ⚠ Warnung: Content-Type ist kein PDF: {content_type}")
-
-                    pdf_bytes = response.body()
-
-                    if pdf_bytes[:4] != b'%PDF':
-                        print("  ✗ Fehler: Keine gültige PDF-Datei")
-                        page.keyboard.press("Escape")
-                        continue
-
-                    with open(target_path, "wb") as f:
-                        f.write(pdf_bytes)
-
-                    file_size = len(pdf_bytes) / 1024
-                    print(f"  -> ✓ Gespeichert: {final_file_name} ({file_size:.1f} KB)")
-                    downloaded += 1
+                    page.keyboard.press("Escape")
+                except Exception:
+                    pass
+                continue
 
-                except Exception as e:
-                    print(f"  ✗ Download fehlgeschlagen: {e}")
-                
+            # NEU V2.14 Download an HTTP-Client übergeben, Browser macht sofort weiter
+            if http_downloader:
+                http_downloader.submit(pdf_url, target_path, http_result(target, pdf_url, final_file_name))
+                print(f"  -> Download eingereiht: {final_file_name}")
                 try:
                     page.keyboard.press("Escape")
                     time.sleep(0.1)
                 except Exception as e:
                     print(f"  ⚠ Escape fehlgeschlagen: {e}")
-                    
-            except Exception as e: 
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                wp_extract = re.sub(r'\(.*?\)', '', full_text)
-                pattern3 = r'-?\d+[\.,]\d{2}.*$'
-                wp_extract = re.sub(pattern3, '', wp_extract).strip()
-                if keyword and wp_extract.startswith(keyword):
-                    wp_extract = wp_extract[len(keyword):].strip()
-                
-                clean_wp = wp_extract[:30].replace(' ', '_')
-                clean_wp = re.sub(r'[^\w\s-]', '', clean_wp).replace(' ', '_')
-                error_file_name = f"error_unexpected_{timestamp}_{clean_wp}.png"
-                error_path = os.path.join(DOWNLOAD_DIR, error_file_name)
-                
-                try:
-                    page.screenshot(path=error_path)
-                    print(f"  ✗ FEHLER: {e}")
-                    print(f"  ⚠ Screenshot gespeichert: {error_file_name}")
-                except Exception as screenshot_error:
-                    print(f"  ✗ FEHLER: {e}")
-                    print(f"  ⚠ Screenshot fehlgeschlagen: {screenshot_error}")
-                
-                try:
-                    page.keyboard.press("Escape")
-                except Exception as esc_error:
-                    print(f"  ⚠ Escape fehlgeschlagen: {esc_error}")
-                    
-        # ENDE for Schleife Transaktionen
-        
-        # Start Download Dokumente
-        docs_downloaded = 0
-        docs_skipped = 0
+                continue
+
+            # PDF herunterladen
+            print("  -> Lade PDF herunter...")
+            download_start = time.perf_counter()
+            result, info = download_pdf_in_browser(page, pdf_url, target_path)
+            timing['download'] = time.perf_counter() - download_start
+            if result == 'saved':
+                print(f"  -> ✓ Gespeichert: {final_file_name} ({info / 1024:.1f} KB)")
+                downloaded += 1
+                mark(target, 'done', bytes=info)
+            elif result == 'exists':
+                print(f"  -> ✓ Bereits vorhanden: {final_file_name}")
+                skipped += 1
+                mark(target, 'done')
+            elif result == 'duplicate':
+                mark(target, 'done', duplicate=True)  # gezählt in CONTENT_INDEX.duplicates
+            else:
+                mark(target, 'failed', reason=info, pdf_url=pdf_url, file_name=final_file_name)
+            
+            try:
+                page.keyboard.press("Escape")
+                time.sleep(0.1)
+            except Exception as e:
+                print(f"  ⚠ Escape fehlgeschlagen: {e}")
                 
-        if settings['get_documents']:
-            print(f"\n[v{__version__}] ...suche nach Dokumenten (max. {settings['max_documents']})")
+        except Exception as e: 
+            print(f"  ✗ FEHLER: {e}")
+            capture_error(page, full_text, "unexpected", None, records[target_idx].name)  # NEU V2.20
             
+            mark(target, 'failed', reason='unexpected')
             try:
-                print(f"  -> Navigiere zur Mailbox...")
-                page.goto(TARGET_URL2)
-                # sicherstellen das die Seite geladen ist
-                time.sleep(2)
+                page.keyboard.press("Escape")
+            except Exception as esc_error:
+                print(f"  ⚠ Escape fehlgeschlagen: {esc_error}")
                 
+    # ENDE for Schleife Transaktionen
+
+    return downloaded, skipped
+
+def _backfill_worker(shard_keywords, storage_state_path, download_dir, settings):
+    """
+    Prozess-Funktion eines Backfill-Shards: eigener Browser mit der Session
+    des Hauptprozesses, Filter auf die Transaktionstypen des Shards.
+    Fehlschläge werden nur gesammelt; in die Retry-Queue schreibt der Hauptprozess.
+
+    Returns:
+        tuple: (heruntergeladen, übersprungen, fehlgeschlagene Einträge, erledigte Schlüssel)
+    """
+    global DOWNLOAD_DIR, ERROR_CAPTURE, RATE_CONTROLLER, PDF_VALIDATORS, CONTENT_INDEX, EVENT_LOG, RUN_DEADLINE
+    DOWNLOAD_DIR = download_dir  # globale Variablen werden im neuen Prozess nicht übernommen
+    RUN_DEADLINE = run_deadline_from_settings(settings)  # Restzeit des Hauptprozesses (remaining_settings)
+    EVENT_LOG = None  # bei fork geerbter Puffer des Hauptprozesses darf nicht doppelt geschrieben werden
+    ERROR_CAPTURE = ErrorCapture(settings)
+    RATE_CONTROLLER = create_rate_controller(settings)
+    # Prozesse des Pools enden über os._exit -> kein atexit, gespeichert wird im finally
+    PDF_VALIDATORS = PdfValidators()
+    if settings['dedup_mode'] != 'off':
+        # Index hat der Hauptprozess aktualisiert -> nur den Cache laden
+        CONTENT_INDEX = ContentIndex(settings['dedup_mode'], scan=False)
+    setup_console_and_log(settings)
+    label = ", ".join(shard_keywords)
+    print(f"[v{__version__}] Backfill-Shard gestartet: {label}")
+    retry_queue = RetryQueue(persist=False)
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            context = browser.new_context(storage_state=storage_state_path, accept_downloads=True)
+            page = _open_start_page(context)
+            if page is None or "login" in page.url:
+                print(f"  ✗ Backfill-Shard '{label}': Session nicht übernommen")
+                return 0, 0, [], []
+            time.sleep(settings['page_load_wait'])
+
+            apply_transaction_filters(page, shard_keywords, settings)
+            targets = load_transaction_targets(page, shard_keywords, settings)
+            if not targets:
+                return 0, 0, [], []
+            downloaded, skipped = process_transactions(page, context, targets, settings, retry_queue=retry_queue)
+            return downloaded, skipped, list(retry_queue.entries.values()), sorted(retry_queue.resolved)
+        finally:
+            browser.close()
+            ERROR_CAPTURE.close()
+            PDF_VALIDATORS.save()
+            if CONTENT_INDEX:
+                CONTENT_INDEX.save()
+            RUN_DEADLINE.report()
+            if EVENT_LOG is not None:
+                EVENT_LOG.close()  # gepufferte Events des Shards schreiben
+
+def run_sharded_backfill(context, settings, retry_queue):
+    """
+    Verteilt die Transaktionstypen (Filter "Auftragstyp") auf parallele
+    Prozesse mit je eigenem Browser-Kontext. max_transactions gilt je Shard.
+    Fehlschläge und Erfolge der Shards werden in die retry_queue übernommen.
+
+    Returns:
+        tuple: (heruntergeladen, übersprungen) oder None, wenn der Backfill
+        nicht gestartet werden konnte
+    """
+    shards = [[keyword] for keyword in settings['keywords']]
+    workers = min(settings['backfill_workers'], len(shards))
+    print(f"[v{__version__}] Backfill: {len(shards)} Shards auf {workers} Prozesse")
+
+    # Session für die Shards als Datei ablegen (enthält Cookies -> danach löschen)
+    storage_state_path = os.path.join(STATE_DIR, "backfill_storage_state.json")
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        context.storage_state(path=storage_state_path)
+    except Exception as e:
+        print(f"  ⚠ Session-Export fehlgeschlagen, normaler Durchlauf: {e}")
+        return None
+
+    # Zeitlimit und Phasen-Budgets gelten auch in den Shards (jeweils die Restzeit)
+    shard_settings = RUN_DEADLINE.remaining_settings(settings)
+
+    downloaded = skipped = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_backfill_worker, shard, storage_state_path, DOWNLOAD_DIR, shard_settings): shard
+                for shard in shards
+            }
+            for future in as_completed(futures):
+                label = ", ".join(futures[future])
                 try:
-                    page.wait_for_load_state("networkidle")
+                    shard_downloaded, shard_skipped, shard_failed, shard_resolved = future.result()
                 except Exception as e:
-                    print(f"  ⚠ Warnung beim Laden der Mailbox: {e}")
-                
-                time.sleep(settings['page_load_wait'])
-                print(f"  ✓ Mailbox geladen")
+                    print(f"  ✗ Backfill-Shard '{label}' abgebrochen: {e}")
+                    continue
+                retry_queue.merge(shard_failed, shard_resolved)
+                print(f"[v{__version__}] Backfill-Shard '{label}' fertig: {shard_downloaded} neu, {shard_skipped} übersprungen, "
+                      f"{len(shard_failed)} fehlgeschlagen")
+                downloaded += shard_downloaded
+                skipped += shard_skipped
+    finally:
+        try:
+            os.remove(storage_state_path)
+        except OSError:
+            pass
+
+    return downloaded, skipped
+# ========== ENDE NEU V2.17 ==========
+
+# ==========================================================================================
+#
+# ========================================= START ==========================================
+#
+# ==========================================================================================
+
+# ========== NEU V2.24: Inventur-Modus ==========
+GERMAN_MONTHS = {'januar': 1, 'februar': 2, 'märz': 3, 'april': 4, 'mai': 5, 'juni': 6, 'juli': 7,
+                 'august': 8, 'september': 9, 'oktober': 10, 'november': 11, 'dezember': 12}
+
+def parse_list_date(label):
+    """Wandelt die Datums-Überschrift der Liste in YYYY-MM-DD um (leer, wenn unbekannt)"""
+    text = label.strip().lower()
+    today = datetime.now().date()
+    if text.startswith('heute'):
+        return today.isoformat()
+    if text.startswith('gestern'):
+        return datetime.fromordinal(today.toordinal() - 1).date().isoformat()
+    m = re.search(r'(\d{4})-(\d{2})-(\d{2})', text)
+    if m:
+        return m.group(0)
+    m = re.search(r'(\d{1,2})\.(\d{1,2})\.(\d{4})', text)
+    if m:
+        return f"{m.group(3)}-{int(m.group(2)):02d}-{int(m.group(1)):02d}"
+    m = re.search(r'(\d{1,2})\.?\s+([a-zä]+)\s+(\d{4})', text)
+    if m and m.group(2) in GERMAN_MONTHS:
+        return f"{m.group(3)}-{GERMAN_MONTHS[m.group(2)]:02d}-{int(m.group(1)):02d}"
+    return ""
+
+def _snapshot_list_rows(page):
+    """
+    Liest alle sichtbaren Transaktionszeilen mit einem einzigen Aufruf im Browser:
+    [aria-labelledby, Text, Text der Datums-Überschrift]
+    """
+    return page.evaluate("""() => Array.from(
+        document.querySelectorAll("div[role='button'][aria-labelledby], button[aria-labelledby]"))
+        .filter(el => el.getClientRects().length > 0)
+        .map(el => {
+            const id = el.getAttribute('aria-labelledby');
+            const header = document.getElementById(id.split(' ')[0]);
+            return [id, el.innerText.replace(/\\n/g, ' ').trim(), header ? header.innerText.trim() : ''];
+        })""")
+
+def export_inventory(page, keywords, settings):
+    """
+    Inventur: scrollt die (gefilterte) Transaktionsliste einmal durch und
+    exportiert jede Zeile mit Datum, Typ, Wertpapier, ISIN und Betrag.
+    Es wird nichts angeklickt und nichts heruntergeladen.
+
+    Returns: Anzahl exportierter Zeilen
+    """
+    start = time.perf_counter()
+    print(f"[v{__version__}] Inventur: lese Transaktionsliste...")
+    date_range = date_range_from_settings(settings)  # NEU V2.25
+    RUN_DEADLINE.begin('scan')  # NEU V2.35
+    rows = {}
+    stable = 0
+    while len(rows) < settings['inventory_max'] and stable < 10 and not date_range.passed:
+        if RUN_DEADLINE.expired('scan'):
+            RUN_DEADLINE.cancel('scan', None, "ältere Transaktionen")
+            break
+        try:
+            snapshot = _snapshot_list_rows(page)
+        except Exception as e:
+            print(f"  ⚠ Liste konnte nicht gelesen werden: {e}")
+            break
+        before = len(rows)
+        for zeit, text, label in snapshot:
+            keyword = next((key for key in keywords if key in text), None)
+            if date_range and date_range.classify(parse_list_date(label)) != 'inside':
+                continue
+            if keyword and (zeit, text) not in rows:
+                rows[(zeit, text)] = (label, keyword)
+        stable = stable + 1 if len(rows) == before else 0
+        if len(rows) != before:
+            print(f"  → Bisher gelesen: {len(rows)} Transaktionen")
+        try:
+            page.keyboard.press("PageDown")
+            time.sleep(settings['critical_wait'])
+        except Exception as e:
+            print(f"  ⚠ Scroll fehlgeschlagen: {e}")
+            break
+
+    rows = list(rows.items())[:settings['inventory_max']]
+    parsed = TRANSACTION_PARSER.parse_batch([(None, zeit, text, keyword) for (zeit, text), (label, keyword) in rows])  # NEU V2.33
+    records = []
+    for ((zeit, text), (label, keyword)), record in zip(rows, parsed):
+        records.append({
+            'date': parse_list_date(label),
+            'date_label': label,
+            'type': record.keyword,
+            'name': record.name,
+            'isin': record.isin,
+            'amount': record.amount.replace(',', '.') if record.amount else "",
+            'text': text,
+        })
+
+    path = settings['inventory_file']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fields = ['date', 'date_label', 'type', 'name', 'isin', 'amount', 'text']
+    with open(path + ".tmp", 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, delimiter=';')
+        writer.writeheader()
+        writer.writerows(records)
+    os.replace(path + ".tmp", path)
+    print(f"  ✓ Inventur gespeichert: {path}")
+
+    # Parquet optional, wenn pandas und pyarrow installiert sind
+    try:
+        import pandas as pd
+        frame = pd.DataFrame(records, columns=fields)
+        frame['amount'] = pd.to_numeric(frame['amount'], errors='coerce')
+        parquet_path = os.path.splitext(path)[0] + ".parquet"
+        frame.to_parquet(parquet_path, index=False)
+        print(f"  ✓ Inventur gespeichert: {parquet_path}")
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"  ⚠ Parquet-Export fehlgeschlagen: {e}")
+
+    seconds = time.perf_counter() - start
+    print(f"[v{__version__}] Inventur: {len(records)} Transaktionen in {seconds:.1f}s exportiert")
+    log_event('phase', phase='inventory', rows=len(records), seconds=round(seconds, 2))
+    return len(records)
+# ========== ENDE NEU V2.24 ==========
+
+def logout(page, settings):
+    """Meldet sich über den Logout-Button ab"""
+    try:
+        # Screenshot zur Diagnose
+        #debug_screenshot = os.path.join(DOWNLOAD_DIR, f"debug_before_logout_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
+        #page.screenshot(path=debug_screenshot)
+        #print(f"  ℹ Debug-Screenshot: {os.path.basename(debug_screenshot)}")
+        
+        logout_btn = page.get_by_text(settings['logout_button']).first
+        # die Timeout Zeit darf nicht zu kurz sein
+        logout_btn.wait_for(state="visible", timeout=10000)
+        logout_btn.click(no_wait_after=True)
+        print(f"\n[v{__version__}] ✓ Abgemeldet")
+    except Exception as e:
+        msg = str(e).lower()
+        if "logout" in msg or "navigated to" in msg:
+            print("✓ Abgemeldet (Navigation gestartet)")
+        else:
+            print(f"⚠ Abmeldung fehlgeschlagen: {e}")
+
+def run_downloader(args=None):
+    global DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX, ERROR_CAPTURE, RATE_CONTROLLER, PDF_VALIDATORS, CONTENT_INDEX, REDOWNLOAD_QUEUE, RUN_DEADLINE, S3_SINK, FLIGHT_RECORDER # NEU V2.04b / V2.13 / V2.20 / V2.26 / V2.27 / V2.30 / V2.31 / V2.35 / V2.36 / V2.37
+    global STATE_DIR, SESSION_DIR, HAR_SESSION  # NEU V2.38
+    settings = apply_cli_overrides(load_config(), args)  # NEU V2.21 Kommandozeile
+    setup_console_and_log(settings)
+
+    # NEU V2.38 Mitschnitt/Wiedergabe: eigener Zustand und eigene Ablage in der Sandbox
+    HAR_SESSION = None
+    if settings.get('har_record') or settings.get('har_replay'):
+        mode = 'replay' if settings.get('har_replay') else 'record'
+        HAR_SESSION = HarSession(mode, settings['har_' + mode])
+        STATE_DIR, SESSION_DIR = HAR_SESSION.prepare(settings)
+    ERROR_CAPTURE = ErrorCapture(settings)
+    RATE_CONTROLLER = create_rate_controller(settings)
+    FLIGHT_RECORDER = FlightRecorder(settings['flight_recorder'], settings['diagnostics_dir']) if settings['flight_recorder'] else None  # NEU V2.37
+    KEYWORDS = settings['keywords']
+    
+    # NEU V2.09 fehlerhaften Pfad abfangen
+    DOWNLOAD_DIR = resolve_and_prepare_download_dir(settings['download_dir'])
+    print(f"[v{__version__}] Zielordner: {DOWNLOAD_DIR}")
+
+    # NEU V2.13: separates Mailbox-Verzeichnis (optional)
+    if settings['download_dir_mailbox']:
+        DOWNLOAD_DIR_MAILBOX = resolve_and_prepare_download_dir(settings['download_dir_mailbox'])
+        print(f"[v{__version__}] Zielordner Mailbox:       {DOWNLOAD_DIR_MAILBOX}")
+    else:
+        DOWNLOAD_DIR_MAILBOX = DOWNLOAD_DIR
+
+    cleanup_mailbox_downloads()  # NEU V2.28
+
+    # NEU V2.29 Ablage umstellen und beenden
+    if settings.get('migrate_layout'):
+        migrate_archive_layout(settings)
+        return
+
+    # NEU V2.31 Ablage prüfen und beenden
+    if settings.get('verify_archive'):
+        verify_archive(settings)
+        return
+
+    # NEU V2.32 Metadaten-Index aktualisieren bzw. durchsuchen und beenden
+    if settings.get('index_only') or settings.get('search'):
+        if settings.get('index_only'):
+            update_metadata_index([DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX])
+        if settings.get('search'):
+            search_metadata_index(settings['search'])
+        return
+
+    # NEU V2.34 Session verkleinern: per Kommando mit Messung, sonst nach Budget
+    if settings.get('compact_session'):
+        compact_session_command(settings)
+        return
+    session_compacted = compact_session(settings['session_budget_mb'])
+
+    # NEU V2.31 beschädigte Dateien erneut laden: Suche reicht bis zur ältesten
+    REDOWNLOAD_QUEUE = RedownloadQueue()
+    atexit.register(REDOWNLOAD_QUEUE.save)
+    if REDOWNLOAD_QUEUE.entries:
+        print(f"[v{__version__}] {len(REDOWNLOAD_QUEUE.entries)} beschädigte Datei(en) werden erneut geladen")
+        oldest = REDOWNLOAD_QUEUE.oldest_date()
+        if oldest and not settings['from_date']:
+            settings['from_date'] = oldest
+        settings['stop_at_first_duplicate'] = False
+        settings['only_new_docs'] = False  # Mailbox-Dokumente sind beim erneuten Laden nicht mehr "neu"
+
+    # NEU V2.29 Verzeichnis-Index einmalig laden
+    for root in dict.fromkeys([DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX]):
+        index = archive_index(root)
+        print(f"[v{__version__}] Verzeichnis-Index: {len(index.paths)} Datei(en) in {index.load_seconds:.2f}s ({root})")
+
+    # NEU V2.30 Inhalts-Index für Duplikate
+    if settings['dedup_mode'] != 'off':
+        CONTENT_INDEX = ContentIndex(settings['dedup_mode'], [DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX])
+        atexit.register(CONTENT_INDEX.save)
+
+    # NEU V2.27 Validatoren der PDFs, auch bei Abbruch speichern
+    PDF_VALIDATORS = PdfValidators()
+    atexit.register(PDF_VALIDATORS.save)
+
+    # NEU V2.36 neue PDFs zusätzlich in den S3-Bucket hochladen
+    S3_SINK = create_s3_sink(settings)
+
+    # NEU V2.15 Laufzeit und Spitzen-Speicher messen
+    run_start = time.perf_counter()
+    RUN_DEADLINE = run_deadline_from_settings(settings)  # NEU V2.35
+    memory_sampler = PeakMemorySampler()
+    memory_sampler.start()
+    log_event('run_start', version=__version__, download_dir=DOWNLOAD_DIR,
+              max_transactions=settings['max_transactions'], keywords=KEYWORDS)
+
+    # NEU V2.15 jeder Ausgang des Laufs (auch vorzeitig oder durch Fehler) landet im Laufzeit-Report
+    run_mode = "headless" if settings['try_headless'] else "headed"
+    outcome = 'aborted'
+    downloaded = skipped = docs_downloaded = docs_skipped = 0
+    inventory_rows = None
+    mailbox_thread = None
+    try:
+        with sync_playwright() as p:
+            headless = settings['try_headless']
+            if headless:
+                print(f"[v{__version__}] Starte Browser ohne Fenster (try_headless)...")
+            launch_start = time.perf_counter()
+            context = _launch_context_with_retry(p, settings, headless=headless)
+            report_launch_time(time.perf_counter() - launch_start, session_compacted)  # NEU V2.34
+            if FLIGHT_RECORDER:
+                FLIGHT_RECORDER.attach(context)  # NEU V2.37
+            if HAR_SESSION:
+                HAR_SESSION.attach(context)  # NEU V2.38
+            page = _open_start_page(context)
+            if page is None:
+                outcome = 'start_page'
+                context.close()
+                return
+
+            # NEU V2.15 Login nötig -> Headless-Versuch verwerfen und sichtbares Fenster öffnen
+            if headless and "login" in page.url:
+                print("  → Login erforderlich, starte Browser mit Fenster...")
+                context.close()
+                headless = False
+                run_mode = "headless→headed"
+                context = _launch_context_with_retry(p, settings, headless=False)
+                if FLIGHT_RECORDER:
+                    FLIGHT_RECORDER.attach(context)  # NEU V2.37
+                if HAR_SESSION:
+                    HAR_SESSION.attach(context)  # NEU V2.38
+                page = _open_start_page(context)
+                if page is None:
+                    outcome = 'start_page'
+                    context.close()
+                    return
+
+            # NEU V2.38 der Login ist nicht wiedergebbar (Zugangsdaten sind aus dem Mitschnitt entfernt)
+            if HAR_SESSION and HAR_SESSION.mode == 'replay' and "login" in page.url:
+                print("  ✗ Wiedergabe: Login-Seite im Mitschnitt - bitte mit angemeldeter Session aufnehmen")
+                outcome = 'replay_login'
+                context.close()
+                return
+
+            if "login" in page.url:
+                login_start = time.perf_counter()
+                RUN_DEADLINE.begin('login')  # NEU V2.35
+                # NEU V2.08 Versuche Auto-Fill falls aktiviert
+                if settings['use_saved_credentials']:
+                    username, password = ensure_credentials(settings['use_saved_credentials'])
                 
-                # V2.10.2 neue Scrolllogik - Hole Gesamthöhe und sichtbare Höhe dynamisch
+                    if username and password:
+                        try:
+                            print("  → Fülle Login-Daten aus...")
+                            page.wait_for_selector("#username", timeout=10000)
+                            page.fill('#username', username, timeout=2000)
+                            page.fill('#password', password, timeout=1000)
+                            # Login-Button klicken
+                            page.get_by_role("button", name="Login").click() # Selektor über Text
+                            print("  ✓ Login-Daten ausgefüllt - Bitte 2FA in der App bestätigen")
+                        except Exception as e:
+                            print(f"  ⚠ Auto-Fill fehlgeschlagen: {e}")
+                            print("  → Bitte komplett manuell einloggen")
+                    else:
+                        print("  → Bitte manuell einloggen")
+                else:
+                    print("Warte auf manuellen Login (2FA)...")
+            
+                # Warte auf erfolgreichen Login (wie bisher)
                 try:
-                    scroll_container = page.locator('div[role="list"][aria-label="Mailbox"] > div').first
-                    total_height = scroll_container.evaluate("element => element.scrollHeight")
-                    viewport_height = scroll_container.evaluate("element => element.clientHeight")
-                    
-                    #print(f"  Gesamthöhe: {total_height}px, sichtbar: {viewport_height}px")
-                    print(f"  ℹ️ max. mögliche Anzahl Dokumente ca. {int(total_height/60)}")
-                    
-                    # Schätze Dokumente pro Viewport (~9-10 Dokumente)
-                    docs_per_viewport = 7
-                    
-                    # Berechne benötigte Scroll-Steps basierend auf max_documents
-                    needed_steps = (settings['max_documents'] // docs_per_viewport) + 2  # +2 als Puffer
-                    max_possible_steps = int(total_height / viewport_height) + 1
-                    
-                    scroll_steps = min(needed_steps, max_possible_steps)
-                    
-                    #print(f"  Benötigte Scroll-Steps für {settings['max_documents']} Dokumente: {scroll_steps}")
+                    page.wait_for_url(re.compile(r".*/(cockpit|transactions|dashboard|broker)/.*"), timeout=RUN_DEADLINE.timeout_ms('login', 90000)) # 90 Sekunden warten (NEU V2.35 höchstens bis zum Zeitlimit)
+                    print("  ✓ Login erkannt.")
+                    log_event('login', outcome='ok', seconds=round(time.perf_counter() - login_start, 1))
                 except Exception as e:
-                    print(f"  ⚠ Fehler: {e}")
-                    scroll_steps = (settings['max_documents'] // 9) + 2  # Fallback
-                    viewport_height = 800
-                
-                # Download-Loop
-                processed_ids = set()  # Vermeide Duplikate
-                
-                # Scrolle in Viewport-großen Schritten
-                for step in range(scroll_steps):
-                    if docs_downloaded + docs_skipped >= settings['max_documents']:
-                        print(f"  ✓ Maximum erreicht ({settings['max_documents']})")
-                        break
-                    
-                    scroll_pos = step * viewport_height
+                    if "Timeout" in type(e).__name__ or "Timeout" in str(e):
+                        # NEU V2.09 
+                        print(" ⚠  TIMEOUT: Kein Login innerhalb von 1 Minute")
+                        log_event('login', outcome='timeout')
+                        flight_dump('login_timeout')  # NEU V2.37
+                        outcome = 'login_timeout'
+                        context.close()
+                        wait_for_enter(" ⏸  Drücke Enter zum Beenden...")
+                        sys.exit(1)
+                    else:
+                        print(f"  ⚠ Login-Warnung: {e}")
                     
+                # Debug V2.09 STOP zum manuellen Debuggen
+                # page.pause()
+
+                page.wait_for_load_state("networkidle")
+                handle_popups(page)
+            
+                if TARGET_URL not in page.url:
+                    print("  -> Navigiere zu Transaktionen...")
                     try:
-                        scroll_container.evaluate(f"element => element.scrollTop = {scroll_pos}")
-                        time.sleep(0.5)
-                        
-                        #print(f"  Scroll-Position: {scroll_pos}/{total_height}px")
-                        
-                        # Verarbeite alle aktuell sichtbaren Dokumente
-                        if not settings['only_new_docs']:
-                            # Alle Dokumente mit Download-Symbol
-                            visible_docs = page.locator('[data-mailbox-item-subject]').filter(
-                                has=page.locator('[data-testid="mailbox-download"]')
-                            ).all()
-                        else:
-                            # Nur neue Dokumente (mit Neu-Kennzeichnung)
-                            candidate_rows = page.locator('[data-mailbox-item-subject]').filter(
-                                has=page.locator('[data-testid="mailbox-download"]')
-                            )
-                            
-                            visible_docs = []
-                            for i in range(candidate_rows.count()):
-                                row = candidate_rows.nth(i)
-                                try:
-                                    status_cell = row.locator('div.MuiGrid-grid-xs-1').last
-                                    indicator = status_cell.locator('*')
-                                    if indicator.count() > 0 and indicator.first.is_visible():
-                                        visible_docs.append(row)
-                                except Exception:
-                                    continue
-                        
-                        # Download jedes sichtbaren Dokuments
-                        for row in visible_docs:
-                            # Prüfe ob bereits verarbeitet
-                            try:
-                                doc_id = row.get_attribute('data-testid')
-                                if doc_id in processed_ids:
-                                    continue
-                                processed_ids.add(doc_id)
-                            except:
-                                continue
-                            
-                            if docs_downloaded + docs_skipped >= settings['max_documents']:
-                                break
-                            
-                            try:
-                                print(f"\n[Dokument {docs_downloaded + docs_skipped + 1}/{settings['max_documents']}]")
-                                
-                                # Suche das Download-Element innerhalb dieser Zeile
-                                download_element = None
-                                try:
-                                    download_element = row.locator('[data-testid="mailbox-download"]').first
-                                    download_element.wait_for(state="visible", timeout=settings['pdf_button_timeout'])
-                                    print(f"  ✓ Download-Symbol gefunden")
-                                except Exception as e:
-                                    print(f"  ✗ Download-Symbol nicht gefunden: {e}")
-                                    continue
-                                
-                                # Klick auf das Download-Element
-                                try:
-                                    print(f"  -> Öffne Dokument...")
-                                    
-                                    # Fange den direkten Download ab
-                                    download_info = None
-                                    try:
-                                        with page.expect_download(timeout=settings['pdf_tab_timeout']) as download_info_promise:
-                                            # V2.10.8 JavaScript Klick auf DOM statt Playwright Mausklick
-                                            clickable = row.locator('[data-testid="mailbox-download"]').first
-                                            page.evaluate("el => el.click()", clickable.element_handle())
-                                        
-                                        download_info = download_info_promise.value
-                                        print(f"  ✓ Download gestartet: {download_info.suggested_filename}")
-                                        
-                                    except Exception as download_error:
-                                        print(f"  ✗ Download-Event nicht gefangen: {download_error}")
-                                        continue
-                                    
-                                except Exception as e:
-                                    print(f"  ✗ Dokument konnte nicht geöffnet werden: {e}")
-                                    continue
-                                
-                                # Original-Dateiname ermitteln
-                                final_file_name = download_info.suggested_filename
-                                if not final_file_name.lower().endswith('.pdf'):
-                                    final_file_name += '.pdf'
-                                
-                                # NEU V2.10.5 optional auch Dokument-Dateinamen als YYYY-MM-DD formatieren
-                                if not settings['use_original_filename']:
-                                    final_file_name = re.sub(r'^(\d{4})(\d{2})(\d{2})', r'\1-\2-\3', final_file_name)
-                                
-                                # Zielpfad festlegen
-                                target_path = os.path.join(DOWNLOAD_DIR_MAILBOX, final_file_name)
-                                
-                                # Duplikatsprüfung mit Datumsprüfung
-                                if os.path.exists(target_path):
-                                    
-                                    # Datum der existierenden Datei prüfen
-                                    existing_mtime = os.path.getmtime(target_path)
-                                    age_seconds = time.time() - existing_mtime
-                                    
-                                    if age_seconds > 600:  # Älter als 10 Minuten
-                                        # Alte Datei = Duplikat, überspringen
-                                        print(f"  -> ✓ Bereits vorhanden: {final_file_name}")
-                                        docs_skipped += 1
-                                        # Download-Objekt verwerfen
-                                        try:
-                                            temp_path = download_info.path()
-                                            if temp_path and os.path.exists(temp_path):
-                                                os.remove(temp_path)
-                                        except Exception:
-                                            pass
-                                        continue
-                                    else:
-                                        # Frische Datei = anderes Dokument mit gleichem Namen
-                                        base_name = final_file_name[:-4]  # ohne .pdf
-                                        counter = 1
-                                        while os.path.exists(target_path):
-                                            final_file_name = f"{base_name}_{counter}.pdf"
-                                            target_path = os.path.join(DOWNLOAD_DIR_MAILBOX, final_file_name)
-                                            counter += 1
-                                        print(f"  -> Gleichnamiges Dokument, speichere als: {final_file_name}")
-                                
-                                # PDF herunterladen
-                                try:
-                                    print("  -> Lade PDF herunter...")
-                                    
-                                    # Direkter Download - Datei verschieben
-                                    download_info.save_as(target_path)
-                                    file_size = os.path.getsize(target_path) / 1024
-                                    
-                                    print(f"  -> ✓ Gespeichert: {final_file_name} ({file_size:.1f} KB)")
-                                    docs_downloaded += 1
-                                    
-                                except Exception as e:
-                                    print(f"  ✗ Download fehlgeschlagen: {e}")
-                                    # Aufräumen falls Download-Datei teilweise existiert
-                                    try:
-                                        temp_path = download_info.path()
-                                        if temp_path and os.path.exists(temp_path):
-                                            os.remove(temp_path)
-                                    except Exception:
-                                        pass
-                            
-                            except Exception as e:
-                                print(f"  ✗ FEHLER bei Dokument: {e}")
-                                continue
-                            
+                        page.goto(TARGET_URL)
+                        #handle_popups(page)
                     except Exception as e:
-                        print(f"  ⚠ Fehler bei Scroll-Position {scroll_pos}: {e}")
-                        continue
-                
-                print(f"\n[v{__version__}] Dokumente-Download abgeschlossen: {docs_downloaded} heruntergeladen, {docs_skipped} übersprungen")
-                
-            except Exception as e:
-                print(f"  ✗ Fehler beim Mailbox-Zugriff: {e}")
+                        print(f"  ⚠ Navigation fehlgeschlagen: {e}")
         
-        # Start Logout
-        if settings['logout_after_run']:
             try:
-                # Screenshot zur Diagnose
-                #debug_screenshot = os.path.join(DOWNLOAD_DIR, f"debug_before_logout_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-                #page.screenshot(path=debug_screenshot)
-                #print(f"  ℹ Debug-Screenshot: {os.path.basename(debug_screenshot)}")
-                
-                logout_btn = page.get_by_text(settings['logout_button']).first
-                # die Timeout Zeit darf nicht zu kurz sein
-                logout_btn.wait_for(state="visible", timeout=10000)
-                logout_btn.click(no_wait_after=True)
-                print(f"\n[v{__version__}] ✓ Abgemeldet")
+                page.wait_for_load_state("networkidle")
             except Exception as e:
-                msg = str(e).lower()
-                if "logout" in msg or "navigated to" in msg:
-                    print("✓ Abgemeldet (Navigation gestartet)")
+                print(f"  ⚠ Warnung beim Laden: {e}")
+        
+            time.sleep(settings['page_load_wait'])
+
+            # NEU V2.24 Inventur: nur die Liste exportieren, keine Klicks und Downloads
+            if settings['inventory_mode']:
+                run_mode = "inventory"
+                apply_transaction_filters(page, KEYWORDS, settings)
+                inventory_rows = export_inventory(page, KEYWORDS, settings)
+                if settings['logout_after_run']:
+                    logout(page, settings)
+                context.close()
+                outcome = 'ok'
+                return
+
+            # NEU V2.16 Mailbox optional parallel zur Transaktions-Phase
+            mailbox_thread, mailbox_result = start_parallel_mailbox(context, settings)
+
+            # NEU V2.19 fehlgeschlagene Transaktionen aus früheren Läufen
+            retry_queue = RetryQueue()
+            carried = retry_queue.targets()
+            if carried:
+                print(f"[v{__version__}] Retry-Queue: {len(carried)} fehlgeschlagene Transaktion(en) aus früheren Läufen")
+
+            # Liste wird nur gebraucht, um Transaktionen anzuklicken -> bei Bedarf einmalig laden
+            list_state = {'loaded': False}
+            def list_loader():
+                if not list_state['loaded']:
+                    list_state['loaded'] = True
+                    apply_transaction_filters(page, KEYWORDS, settings)
+                    load_transaction_targets(page, KEYWORDS, settings)
+
+            # NEU V2.18 abgebrochenen Lauf fortsetzen
+            checkpoint = RunCheckpoint.load_unfinished(settings) if settings['resume_interrupted_runs'] else None
+
+            # NEU V2.17 Backfill: Transaktionstypen parallel in eigenen Prozessen
+            # (ohne eigenen Checkpoint; Fortsetzung und retry_failed_only laufen im Hauptbrowser)
+            use_backfill = (settings['backfill_workers'] > 0 and not checkpoint
+                            and not (settings['retry_failed_only'] and carried))
+            backfill_result = run_sharded_backfill(context, settings, retry_queue) if use_backfill else None
+            http_downloader = None
+
+            if backfill_result:
+                downloaded, skipped = backfill_result
+            else:
+                if checkpoint:
+                    targets = checkpoint.open_targets()
+                    print(f"[v{__version__}] Setze unterbrochenen Lauf fort: {len(targets)} von {len(checkpoint.entries)} Transaktionen offen")
+                    if checkpoint.all_resolved(targets):
+                        print("  ✓ Alle PDF-URLs bekannt - Filter und Scrollen entfallen")
+                    else:
+                        list_loader()
+                elif settings['retry_failed_only'] and carried:
+                    # NEU V2.19 nur die Retry-Queue abarbeiten, keine vollständige Suche
+                    targets = carried
+                    print(f"[v{__version__}] retry_failed_only: verarbeite nur die Retry-Queue")
                 else:
-                    print(f"⚠ Abmeldung fehlgeschlagen: {e}")
+                    apply_transaction_filters(page, KEYWORDS, settings)
+                    list_state['loaded'] = True
+
+                    targets = load_transaction_targets(page, KEYWORDS, settings)
+                    if targets is None:
+                        outcome = 'no_targets'
+                        context.close()
+                        return
+                    # NEU V2.19 übernommene Fehlschläge anhängen, die nicht ohnehin in der Liste sind
+                    known_keys = {_target_key(t) for t in targets}
+                    targets += [t for t in carried if _target_key(t) not in known_keys]
+                    if settings['resume_interrupted_runs']:
+                        checkpoint = RunCheckpoint.create(settings, targets)
+
+                # NEU V2.14 optional: PDFs per HTTP-Client außerhalb des Browsers laden
+                http_downloader = create_http_downloader(context, page, settings) if targets else None
+
+                downloaded, skipped = process_transactions(page, context, targets, settings, http_downloader,
+                                                           checkpoint, list_loader, retry_queue)
+
+            # NEU V2.19 Fehlschläge dieses Laufs (auch der Backfill-Shards) und übernommene,
+            # von keinem Shard gefundene Einträge mit Backoff wiederholen
+            retry_downloaded, retry_skipped = retry_failed_targets(page, context, settings, retry_queue,
+                                                                   checkpoint, list_loader)
+            downloaded += retry_downloaded
+            skipped += retry_skipped
+            if retry_queue.targets():
+                print(f"[v{__version__}] Retry-Queue: {len(retry_queue.targets())} Transaktion(en) werden im nächsten Lauf erneut versucht")
         
-        context.close()
-        print(f"\n[v{__version__}] *** Ergebnis ***")
-        print(f"[v{__version__}] Download-Verzeichnis: {DOWNLOAD_DIR}")
-        if DOWNLOAD_DIR_MAILBOX != DOWNLOAD_DIR:
-            print(f"[v{__version__}] Download Mailbox:       {DOWNLOAD_DIR_MAILBOX}")
-        print(f"[v{__version__}] Transaktionen neu geladen: {downloaded}, Übersprungen: {skipped}")
-        print(f"[v{__version__}] Dokumente     neu geladen: {docs_downloaded}, Übersprungen: {docs_skipped}")
+            # Start Download Dokumente
+                
+            if settings['get_documents']:
+                # NEU V2.16 parallele Mailbox-Phase einsammeln, bei Fehler wie bisher nacheinander
+                if mailbox_thread:
+                    mailbox_thread.join()
+                if mailbox_result and 'counts' in mailbox_result:
+                    docs_downloaded, docs_skipped = mailbox_result['counts']
+                else:
+                    if mailbox_thread:
+                        print("  → Lade Mailbox-Dokumente nacheinander im Hauptbrowser")
+                    docs_downloaded, docs_skipped = download_mailbox_documents(page, settings)
+        
+            # NEU V2.14 HTTP-Downloads brauchen die Session-Cookies -> vor dem Logout abschließen.
+            # Ohne Logout wird der Browser zuerst geschlossen und gibt seinen Speicher frei.
+            http_downloaded = http_failed = 0
+            if http_downloader and settings['logout_after_run']:
+                http_downloaded, http_failed = finish_http_downloads(http_downloader)
+                http_downloader = None
+
+            # Start Logout
+            if settings['logout_after_run']:
+                logout(page, settings)
+        
+            context.close()
+            if HAR_SESSION:
+                HAR_SESSION.finish_recording()  # NEU V2.38 HAR erst nach close() vollständig
+
+            if http_downloader:
+                http_downloaded, http_failed = finish_http_downloads(http_downloader)
+            downloaded += http_downloaded
+
+            # NEU V2.18 Checkpoint erst entfernen, wenn auch alle HTTP-Downloads angekommen sind
+            # NEU V2.35 abgebrochene Transaktions-Phase im nächsten Lauf fortsetzen
+            if checkpoint:
+                if http_failed or RUN_DEADLINE.was_cancelled('transactions'):
+                    checkpoint.flush()
+                else:
+                    checkpoint.finish()
+            PDF_VALIDATORS.save()  # NEU V2.27
+            if CONTENT_INDEX:
+                CONTENT_INDEX.save()  # NEU V2.30
+
+            ERROR_CAPTURE.close()  # NEU V2.20
+
+            # NEU V2.22 WKN-Zuordnungen aus neuen Dokumenten lernen
+            if settings['wkn_learn']:
+                learn_wkn_mappings([DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX], settings['wkn_mapping'])
+
+            # NEU V2.32 neue PDFs in den Metadaten-Index aufnehmen
+            if settings['metadata_index']:
+                update_metadata_index([DOWNLOAD_DIR, DOWNLOAD_DIR_MAILBOX])
+
+            # NEU V2.36 Uploads abschließen (lokale Kopien erst danach ggf. löschen)
+            s3_uploaded = s3_failed = 0
+            if S3_SINK:
+                s3_uploaded, s3_failed = S3_SINK.finish()
+
+            print(f"\n[v{__version__}] *** Ergebnis ***")
+            print(f"[v{__version__}] Download-Verzeichnis: {DOWNLOAD_DIR}")
+            if DOWNLOAD_DIR_MAILBOX != DOWNLOAD_DIR:
+                print(f"[v{__version__}] Download Mailbox:       {DOWNLOAD_DIR_MAILBOX}")
+            print(f"[v{__version__}] Transaktionen neu geladen: {downloaded}, Übersprungen: {skipped}")
+            if http_failed:
+                print(f"[v{__version__}] HTTP-Downloads fehlgeschlagen: {http_failed}")
+            print(f"[v{__version__}] Dokumente     neu geladen: {docs_downloaded}, Übersprungen: {docs_skipped}")
+            RUN_DEADLINE.report()  # NEU V2.35
+            if S3_SINK:
+                print(f"[v{__version__}] S3 hochgeladen: {s3_uploaded} ({S3_SINK.bytes / 1024 / 1024:.1f} MB), "
+                      f"bereits im Bucket: {S3_SINK.present}, fehlgeschlagen: {s3_failed}")
+            if CONTENT_INDEX and CONTENT_INDEX.duplicates:
+                print(f"[v{__version__}] Duplikate (gleicher Inhalt): {CONTENT_INDEX.duplicates}, "
+                      f"gespart: {CONTENT_INDEX.bytes_saved / 1024 / 1024:.1f} MB")
+            outcome = 'ok'
+    finally:
+        # parallele Mailbox-Phase nicht verwaist zurücklassen (bei Abbruch nicht darauf warten)
+        if mailbox_thread and outcome != 'aborted':
+            mailbox_thread.join()
+        ERROR_CAPTURE.close()
+
+        # NEU V2.15 Laufzeit-Report
+        run_seconds = time.perf_counter() - run_start
+        rate = RATE_CONTROLLER.summary() if RATE_CONTROLLER else None
+        report_run_metrics(run_mode, run_seconds, memory_sampler.stop(), rate, outcome)
+        if HAR_SESSION:
+            HAR_SESSION.report(run_seconds, downloaded + docs_downloaded)  # NEU V2.38 Vergleich je Version
+        extra = {'rows': inventory_rows} if inventory_rows is not None else {}
+        log_event('run_end', mode=run_mode, outcome=outcome, seconds=round(run_seconds, 1), downloaded=downloaded,
+                  skipped=skipped, rate=rate, docs_downloaded=docs_downloaded, docs_skipped=docs_skipped, **extra)
 
 # =========== NEU V2.04b ===============
 def open_download_folder(download_dir):
@@ -1318,8 +5387,21 @@ def open_download_folder(download_dir):
 # ========== ENDE NEU V2.04b ==========
 
 if __name__ == "__main__":
-    ensure_browser()
-    run_downloader()
+    multiprocessing.freeze_support()  # NEU V2.17 Backfill-Prozesse in der EXE
+    cli_args = parse_args()  # NEU V2.21
+    NON_INTERACTIVE = cli_args.non_interactive
+    if not (cli_args.migrate_layout or cli_args.verify or cli_args.index or cli_args.search):  # NEU V2.29/V2.31/V2.32 ohne Browser
+        ensure_browser()
+    try:
+        run_downloader(cli_args)
+    except (Exception, KeyboardInterrupt) as e:
+        # NEU V2.37 Abbruch durch Fehler oder Strg+C -> Flugschreiber sichern
+        flight_dump(f"abort_{type(e).__name__}")
+        raise
+
+    # NEU V2.21 geplante Aufgaben: ohne Tastendruck beenden
+    if NON_INTERACTIVE:
+        sys.exit(0)
     
     # NEU V2.04b Download-Ordner zum öffnen anbieten
     print("="*30)
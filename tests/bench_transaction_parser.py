@@ -0,0 +1,50 @@
+"""
+Misst parse_batch und file_name von TransactionTextParser über synthetische Listenzeilen.
+Die Prüfsumme über alle Dateinamen ändert sich nur, wenn sich die Namensregeln ändern.
+
+    python tests/bench_transaction_parser.py [ZEILEN]
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from downloader import TRANSACTION_PARSER, __version__  # noqa: E402
+from test_transaction_parser import CORPUS, TODAY, WKN  # noqa: E402
+
+
+def parser_benchmark(rows=100000):
+    rnd = random.Random(2024)
+    corpus = [entry for entry in CORPUS if not entry[3]]
+    targets, urls = [], []
+    for i in range(rows):
+        keyword, text, pdf_url, _, _ = corpus[i % len(corpus)]
+        amount = f"{rnd.randint(-99999, 99999):,}".replace(',', '.') + f",{rnd.randint(0, 99):02d}"
+        targets.append((i, f"z{i}", f"{TRANSACTION_PARSER.AMOUNT_TAIL.sub('', text).rstrip()} {amount} €", keyword))
+        urls.append(pdf_url)
+
+    start = time.perf_counter()
+    records = TRANSACTION_PARSER.parse_batch(targets)
+    parse_seconds = time.perf_counter() - start
+    names = [TRANSACTION_PARSER.file_name(record, url, WKN, today=TODAY)
+             for record, url in zip(records, urls)]
+    total_seconds = time.perf_counter() - start
+
+    digest = hashlib.sha256("\n".join(names).encode('utf-8')).hexdigest()[:16]
+    print(f"[v{__version__}] Parser-Benchmark: {rows} Zeilen")
+    print(f"  parse_batch: {parse_seconds:.3f}s ({parse_seconds / rows * 1e6:.1f} µs/Zeile)")
+    print(f"  inkl. Dateiname: {total_seconds:.3f}s ({rows / total_seconds:,.0f} Zeilen/s)")
+    print(f"  Prüfsumme Dateinamen: {digest}")
+    return total_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laufzeit des Transaktions-Parsers messen")
+    parser.add_argument('rows', metavar='ZEILEN', type=int, nargs='?', default=100000,
+                        help="Anzahl synthetischer Zeilen (Standard: 100000)")
+    parser_benchmark(parser.parse_args().rows)
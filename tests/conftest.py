@@ -0,0 +1,5 @@
+import os
+import sys
+
+# downloader.py liegt im Hauptordner, nicht in einem Paket
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
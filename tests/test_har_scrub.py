@@ -0,0 +1,72 @@
+"""scrub_har gegen einen Mitschnitt mit Zugangsdaten und persönlichen Daten (fixtures/scrub_sample.har)."""
+import base64
+import json
+import os
+import re
+
+import pytest
+
+from downloader import HAR_PLACEHOLDER_PDF, scrub_har
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scrub_sample.har")
+
+SECRETS = [
+    "f3a9c1d2e8b7",                     # ?token= der PDF-URL (URL, queryString, HTML, JSON)
+    "eyJhbGciOiJIUzI1NiJ9.c2VjcmV0",    # X-Auth-Token
+    "c00k1e",                           # Cookie
+    "DE89370400440532013000",           # IBAN in <script> und data-Attribut
+    "max.li@example.com",
+    "4711",                             # numerische personId
+]
+SHORT_NAMES = ["Max", "Li", "Ulm"]      # kürzer als 4 Zeichen
+
+
+@pytest.fixture
+def scrubbed():
+    with open(FIXTURE, encoding='utf-8') as f:
+        har = json.load(f)
+    replaced = scrub_har(har)
+    return har, replaced, json.dumps(har, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("secret", SECRETS)
+def test_secret_removed(scrubbed, secret):
+    assert secret not in scrubbed[2]
+
+
+@pytest.mark.parametrize("name", SHORT_NAMES)
+def test_short_name_removed(scrubbed, name):
+    assert not re.search(rf"(?<!\w){name}(?!\w)", scrubbed[2])
+
+
+def test_words_containing_short_names_kept(scrubbed):
+    assert "Maximum Cockpit" in scrubbed[2]
+
+
+def test_auth_headers_masked(scrubbed):
+    har = scrubbed[0]
+    for entry in har['log']['entries']:
+        headers = {h['name']: h['value'] for h in entry['request']['headers']}
+        assert headers['X-Auth-Token'] == "***"
+        assert headers['Cookie'] == "***"
+        assert headers['Accept'] == "*/*"
+        assert entry['request']['cookies'] == []
+
+
+def test_token_replaced_consistently(scrubbed):
+    """Wiedergabe: URL des Requests und Link in der Antwort bekommen denselben Platzhalter"""
+    entries = scrubbed[0]['log']['entries']
+    pdf_request = entries[2]['request']
+    token = dict((p['name'], p['value']) for p in pdf_request['queryString'])['token']
+    assert token.startswith("x") and f"token={token}" in pdf_request['url']
+    assert f"token={token}&" in entries[0]['response']['content']['text']
+    assert f"token={token}&" in entries[1]['response']['content']['text']
+
+
+def test_pdf_replaced(scrubbed):
+    content = scrubbed[0]['log']['entries'][2]['response']['content']
+    assert base64.b64decode(content['text']) == HAR_PLACEHOLDER_PDF
+
+
+def test_replaced_count(scrubbed):
+    assert scrubbed[1] >= len(SECRETS) - 1 + len(SHORT_NAMES)  # Cookie wird geleert, nicht ersetzt
@@ -0,0 +1,150 @@
+"""S3Sink gegen eine Attrappe des S3-Clients (ohne boto3 und Netzwerk)."""
+import os
+
+import pytest
+
+from downloader import S3Sink
+
+
+class FakeS3Client:
+    """Minimaler S3-Client: Objekte im Speicher, Liste in Seiten zu page_size"""
+
+    def __init__(self, objects=None, page_size=1000, fail_part=None):
+        self.objects = dict(objects or {})  # Key -> Bytes
+        self.page_size = page_size
+        self.fail_part = fail_part
+        self.uploads = {}  # UploadId -> {PartNumber: Bytes}
+        self.aborted = []
+        self.list_calls = 0
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        self.list_calls += 1
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + self.page_size]
+        response = {'Contents': [{'Key': key, 'Size': len(self.objects[key])} for key in page]}
+        if start + self.page_size < len(keys):
+            response.update(IsTruncated=True, NextContinuationToken=str(start + self.page_size))
+        return response
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise IOError("Verbindung unterbrochen")
+        self.uploads[UploadId][PartNumber] = Body
+        return {'ETag': f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(Key)
+
+
+@pytest.fixture
+def roots(tmp_path):
+    transactions = tmp_path / "Scalable_Downloads"
+    mailbox = tmp_path / "Scalable_Mailbox"
+    transactions.mkdir()
+    mailbox.mkdir()
+    return transactions, mailbox
+
+
+def make_sink(client, roots, **kwargs):
+    transactions, mailbox = roots
+    return S3Sink(client, "bucket", "archiv", {str(transactions): "", str(mailbox): "mailbox/"}, **kwargs)
+
+
+def write_pdf(path, size=100):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF" + b"x" * (size - 4))
+    return str(path)
+
+
+def test_upload_puts_object_under_key(roots):
+    client = FakeS3Client()
+    sink = make_sink(client, roots)
+    path = write_pdf(roots[0] / "2024" / "2024-03-15-Kauf.pdf")
+    sink.submit(path)
+    assert sink.finish() == (1, 0)
+    assert client.objects["archiv/2024/2024-03-15-Kauf.pdf"] == open(path, 'rb').read()
+    assert sink.bytes == 100
+
+
+def test_existing_object_of_same_size_is_skipped(roots):
+    client = FakeS3Client({"archiv/2024/2024-03-15-Kauf.pdf": b"%PDF" + b"x" * 96})
+    sink = make_sink(client, roots)
+    sink.submit(write_pdf(roots[0] / "2024" / "2024-03-15-Kauf.pdf"))
+    assert sink.finish() == (0, 0)
+    assert sink.present == 1
+
+
+def test_local_copy_removed_without_keep_local(roots):
+    sink = make_sink(FakeS3Client(), roots, keep_local=False)
+    path = write_pdf(roots[0] / "2024-03-15-Kauf.pdf")
+    sink.submit(path)
+    sink.finish()
+    assert not os.path.exists(path)
+
+
+def test_multipart_upload_in_parts(roots):
+    client = FakeS3Client()
+    sink = make_sink(client, roots)
+    sink.PART_SIZE = 40
+    path = write_pdf(roots[1] / "2024" / "Depotauszug.pdf")
+    sink.submit(path)
+    assert sink.finish() == (1, 0)
+    assert client.objects["archiv/mailbox/2024/Depotauszug.pdf"] == open(path, 'rb').read()
+    assert not client.uploads
+
+
+def test_multipart_upload_aborted_on_error(roots):
+    client = FakeS3Client(fail_part=2)
+    sink = make_sink(client, roots)
+    sink.PART_SIZE = 40
+    path = write_pdf(roots[0] / "2024" / "2024-03-15-Kauf.pdf")
+    sink.submit(path)
+    assert sink.finish() == (0, 1)
+    assert client.aborted == ["archiv/2024/2024-03-15-Kauf.pdf"]
+    assert not client.uploads and not client.objects
+    assert os.path.exists(path)  # fehlgeschlagen -> lokale Kopie bleibt
+
+
+def test_listing_is_paginated(roots):
+    client = FakeS3Client({f"archiv/2024/{i:04d}.pdf": b"%PDF" for i in range(25)}, page_size=10)
+    sink = make_sink(client, roots)
+    assert client.list_calls == 3
+    assert len(sink.objects) == 25
+
+
+def test_exists_matches_key_of_target_path(roots):
+    transactions, mailbox = roots
+    client = FakeS3Client({"archiv/2024/2024-03-15-Kauf.pdf": b"%PDF",
+                           "archiv/mailbox/2024/Depotauszug.pdf": b"%PDF"})
+    sink = make_sink(client, roots)
+    assert sink.exists(str(transactions / "2024" / "2024-03-15-Kauf.pdf"))
+    assert sink.exists(str(mailbox / "2024" / "Depotauszug.pdf"))
+    # gleicher Dateiname in der anderen Ablage bzw. in einem anderen Ordner ist ein anderes Objekt
+    assert not sink.exists(str(mailbox / "2024" / "2024-03-15-Kauf.pdf"))
+    assert not sink.exists(str(transactions / "2023" / "2024-03-15-Kauf.pdf"))
+    assert not sink.exists(str(transactions / "2024" / "Depotauszug.pdf"))
+    # außerhalb der Ablage-Ordner
+    assert not sink.exists(str(transactions.parent / "2024-03-15-Kauf.pdf"))
+
+
+def test_exists_after_upload(roots):
+    sink = make_sink(FakeS3Client(), roots)
+    path = write_pdf(roots[0] / "2024-03-15-Kauf.pdf")
+    assert not sink.exists(path)
+    sink.submit(path)
+    sink.finish()
+    assert sink.exists(path)
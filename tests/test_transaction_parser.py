@@ -0,0 +1,74 @@
+"""Dateinamen-Regeln von TransactionTextParser gegen Beispiele aus der Transaktionsliste."""
+from datetime import datetime
+
+import pytest
+
+from downloader import TRANSACTION_PARSER
+
+# (keyword, Listentext, PDF-URL, Vorabpauschale, Dateiname)
+WKN = {'IE00B4L5Y983': 'A0RPWH'}
+TODAY = datetime(2024, 6, 1)
+CORPUS = [
+    ('Kauf', 'Kauf iShares Core MSCI World USD (Acc) -1.234,56 €',
+     'https://de.scalable.capital/broker/api/documents/2024-03-15-Wertpapierabrechnung-IE00B4L5Y983.pdf?token=abc123', False,
+     '2024-03-15-Kauf-A0RPWH-iShares_Core_MSCI_World_USD-1234_56.pdf'),
+    ('Sparplan', 'Sparplan iShares Core MSCI World USD (Acc) -100,00 €',
+     'https://de.scalable.capital/broker/api/documents/2024-04-02-Sparplan-IE00B4L5Y983.pdf?token=abc123', False,
+     '2024-04-02-Spar-A0RPWH-iShares_Core_MSCI_World_USD-100_00.pdf'),
+    ('Verkauf', 'Verkauf Vanguard FTSE All-World U.ETF Reg. Shs USD Dis. oN 2.345,67 €',
+     'https://de.scalable.capital/broker/api/documents/2023-11-30-Wertpapierabrechnung-IE00B3RBWM25.pdf?token=abc123', False,
+     '2023-11-30-Verk-IE00B3RBWM25-Vanguard_FTSE_All-World_UETF_Reg_Shs_USD_Dis_oN-2345_67.pdf'),
+    ('Ausschüttung', 'Ausschüttung Vanguard FTSE All-World 12,34 €',
+     'https://de.scalable.capital/broker/api/documents/2024-01-05-Ertragsabrechnung-IE00B3RBWM25.pdf?token=abc123', False,
+     '2024-01-05-Auss-IE00B3RBWM25-Vanguard_FTSE_All-World-12_34.pdf'),
+    ('Kauf', 'Kauf Apple Inc. 3 Stk. -512,34 €',
+     'https://de.scalable.capital/broker/api/documents/2024-02-20-Wertpapierabrechnung-US0378331005.pdf?token=abc123', False,
+     '2024-02-20-Kauf-US0378331005-Apple_Inc_3_Stk-512_34.pdf'),
+    ('Kauf', 'Kauf Amundi Prime Global: ETF, Acc / EUR 1.000,00 € -1.001,99 €',
+     'https://de.scalable.capital/broker/api/documents/2024-05-06-Wertpapierabrechnung-LU2089238203.pdf?token=abc123', False,
+     '2024-05-06-Kauf-LU2089238203-Amundi_Prime_Global_ETF_Acc_EUR-1001_99.pdf'),
+    ('Verkauf', 'Verkauf Xtrackers MSCI World (IE00BJ0KDQ92) 12.345,00 €',
+     'https://de.scalable.capital/broker/api/documents/2024-05-07-Wertpapierabrechnung-IE00BJ0KDQ92.pdf?token=abc123', False,
+     '2024-05-07-Verk-IE00BJ0KDQ92-Xtrackers_MSCI_World-12345_00.pdf'),
+    ('Wertpapierereignisse', 'Wertpapierereignisse Nvidia Corp. Aktiensplit 10:1',
+     'https://de.scalable.capital/broker/api/documents/2024-06-10-Kapitalmassnahme-US67066G1040.pdf?token=abc123', False,
+     '2024-06-10-Wert-US67066G1040-Nvidia_Corp_Aktiensplit_101-0_00.pdf'),
+    ('Kauf', 'Kauf Deutsche Telekom AG Nam.-Akt. -99,90 €',
+     'https://de.scalable.capital/broker/api/documents/kein-datum.pdf?token=abc123', False,
+     '2024-06-01-Kauf-UNKNOWN-Deutsche_Telekom_AG_Nam-Akt-99_90.pdf'),
+    ('Kauf', 'Kauf Siemens AG 0,5 Pkt. -- Teilausf. -250,00 €',
+     '', False,
+     '2024-06-01-Kauf-UNKNOWN-Siemens_AG_0-5_Pkt_Teilausf-250_00.pdf'),
+    ('Steuern', 'Steuern Vorabpauschale: Xtrackers MSCI World (IE00BJ0KDQ92) -1,23 €',
+     'https://de.scalable.capital/broker/api/documents/2024-01-02-Vorabpauschale-IE00BJ0KDQ92.pdf?token=abc123', True,
+     '2024-01-02-Vorabpauschale-IE00BJ0KDQ92-IE00BJ0KDQ92-Xtrackers_MSCI_World_1_23.pdf'),
+    ('Steuern', 'Steuern Vorabpauschale: iShares Core MSCI World USD (Acc) (IE00B4L5Y983)',
+     '', True,
+     '2024-01-02-Vorabpauschale-A0RPWH-iShares_Core_MSCI_World_USD.pdf'),
+    ('Steuern', 'Steuern Kapitalertragsteuer Apple Inc. -3,21 €',
+     'https://de.scalable.capital/broker/api/documents/2024-02-21-Steuerabrechnung-US0378331005.pdf?token=abc123', False,
+     '2024-02-21-Steu-US0378331005-Kapitalertragsteuer_Apple_Inc-3_21.pdf'),
+]
+
+
+@pytest.mark.parametrize("keyword, text, pdf_url, vorabpauschale, expected", CORPUS,
+                         ids=[entry[4] for entry in CORPUS])
+def test_file_name(keyword, text, pdf_url, vorabpauschale, expected):
+    record = TRANSACTION_PARSER.parse(text, keyword)
+    assert TRANSACTION_PARSER.file_name(record, pdf_url, WKN, vorabpauschale, TODAY) == expected
+
+
+def test_parse_batch_matches_parse():
+    targets = [(i, f"z{i}", text, keyword) for i, (keyword, text, _, _, _) in enumerate(CORPUS)]
+    records = TRANSACTION_PARSER.parse_batch(targets)
+    assert records == [TRANSACTION_PARSER.parse(text, keyword) for _, _, text, keyword in targets]
+
+
+@pytest.mark.parametrize("keyword, text, name", [
+    ('Kauf', 'Kauf iShares Core MSCI World USD (Acc) -1.234,56 €', 'iShares Core MSCI World USD'),
+    ('Verkauf', 'Verkauf Xtrackers MSCI World (IE00BJ0KDQ92) 12.345,00 €', 'Xtrackers MSCI World'),
+    ('Wertpapierereignisse', 'Wertpapierereignisse Nvidia Corp. Aktiensplit 10:1', 'Nvidia Corp. Aktiensplit 10:1'),
+])
+def test_record_name(keyword, text, name):
+    """Wertpapiername für Dateinamen und Fehler-Diagnose (capture_error)"""
+    assert TRANSACTION_PARSER.parse(text, keyword).name == name